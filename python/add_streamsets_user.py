@@ -7,12 +7,26 @@ DESCRIPTION: Adds a user to a StreamSets Platform Organization.
              If the user already exists in the Organization, no action is taken.
              (Users are identified by their email addresses).
 
+             In bulk mode, adds every user listed in a CSV file. The CSV file has a
+             header row with an "email" column and an optional "groups" column with
+             the user's groups separated by semicolons (for example "all;hol");
+             users without groups are added to the groups in the groups list
+             variable below. An email in more than one row is added once, with the
+             groups of its first row. The Organization's users and groups are read
+             once into lookup dicts (the groups only if there are users to invite),
+             and the missing users are invited in parallel, rate-limited to
+             MAX_INVITES_PER_SECOND.
+
 ARGS:
     - user_email  # The user's email address
+      or
+    - --csv users_csv  # A CSV file of users to add
 
 USAGE: $ python3 add_streamsets_user.py <user_email>
+       $ python3 add_streamsets_user.py --csv <users_csv>
 
 USAGE EXAMPLE: python3 add_streamsets_user.py mark.brooks@ibm.com
+               python3 add_streamsets_user.py --csv hol-class.csv
 
 
 PREREQUISITES:
@@ -33,7 +47,11 @@ PREREQUISITES:
 - Add any groups you want to add the new user to in the groups list variable below
 
 """
+import csv
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from streamsets.sdk import ControlHub
 import sys
 
@@ -41,10 +59,33 @@ import sys
 # to the "all" and "hol" (Hands On Lab) groups
 groups = ['all', 'hol']
 
+# How many invitations to send in parallel in bulk mode
+MAX_CONCURRENT_INVITES = 4
+
+# How many invitations to send per second at most in bulk mode
+MAX_INVITES_PER_SECOND = 2
+
+
+# Rate limiter that spaces out calls to at most max_per_second
+class RateLimiter:
+
+    def __init__(self, max_per_second):
+        self.interval_seconds = 1.0 / max_per_second
+        self.next_time_seconds = time.time()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.time()
+            wait_seconds = self.next_time_seconds - now
+            self.next_time_seconds = max(now, self.next_time_seconds) + self.interval_seconds
+        if wait_seconds > 0:
+            time.sleep(wait_seconds)
+
 
 # Method to add a user to an Organization
-def invite_user_to_org(control_hub, user_email, the_org_name):
-    print('Inviting user with email \'{}\' to the Org \'{}\''.format(email, the_org_name))
+def invite_user_to_org(control_hub, user_email, the_org_name, group_names, groups_by_name):
+    print('Inviting user with email \'{}\' to the Org \'{}\''.format(user_email, the_org_name))
 
     # Create a user_builder
     user_builder = control_hub.get_user_builder()
@@ -53,17 +94,41 @@ def invite_user_to_org(control_hub, user_email, the_org_name):
     user = user_builder.build(email_address=user_email)
 
     # Add the user to the desired groups
-    for group in groups:
-        try:
+    for group in group_names:
+        if group in groups_by_name:
             print('Adding the user to the group \'{}\''.format(group))
-            user.groups.append(sch.groups.get(display_name=group))
-        except ValueError:
+            user.groups.append(groups_by_name[group])
+        else:
             print('Error: the group \'{}\' does not exist'.format(group))
 
     # Send an email invite for the user to set their password
     control_hub.invite_user(user)
 
 
+# Method that reads the users to add from a CSV file; returns a list of (email, group names)
+def read_users_csv(users_csv):
+    users = []
+    with open(users_csv, newline='') as file:
+        for row in csv.DictReader(file):
+            user_email = (row.get('email') or '').strip()
+            if not user_email:
+                continue
+            user_groups = [group.strip() for group in (row.get('groups') or '').split(';') if group.strip()]
+            users.append((user_email, user_groups or groups))
+    return users
+
+
+# Method that invites one user in bulk mode; returns None or an error message
+def invite_user(user):
+    user_email, user_groups = user
+    rate_limiter.wait()
+    try:
+        invite_user_to_org(sch, user_email, org_name, user_groups, groups_by_name)
+        return None
+    except Exception as e:
+        return str(e)
+
+
 # Get Control Hub Credentials from the environment
 cred_id = os.getenv('CRED_ID')
 cred_token = os.getenv('CRED_TOKEN')
@@ -71,16 +136,20 @@ cred_token = os.getenv('CRED_TOKEN')
 
 def print_usage_and_exit():
     print('Usage: $ python3 add_streamsets_user.py <user_email>')
+    print('Usage: $ python3 add_streamsets_user.py --csv <users_csv>')
     print('Usage Example: python3 add_streamsets_user.py mark.brooks@ibm.com')
     sys.exit(1)
 
 
 # Check the number of command line args
-if len(sys.argv) != 2:
+users_csv = None
+if len(sys.argv) == 3 and sys.argv[1] == '--csv':
+    users_csv = sys.argv[2]
+elif len(sys.argv) != 2 or sys.argv[1].startswith('--'):
     print('Error: Wrong number of arguments')
     print_usage_and_exit()
-
-email = sys.argv[1]
+else:
+    email = sys.argv[1]
 
 # Connect to Control Hub
 sch = None
@@ -96,16 +165,54 @@ except Exception as e:
 # Get the Organization's name
 org_name = sch.organizations[0].name
 
-# See if user already exists
-try:
-    if sch.users.get(email_address=email):
-        print('User with email \'{}\' already exists in the Org \'{}\''.format(email, org_name))
-        print('No action will be taken')
-
-# If we get here, the user does not exist in the Org
-except ValueError:
-
-    # Add the user to the Organization
-    invite_user_to_org(sch, email, org_name)
+if users_csv is None:
+
+    # See if user already exists
+    try:
+        if sch.users.get(email_address=email):
+            print('User with email \'{}\' already exists in the Org \'{}\''.format(email, org_name))
+            print('No action will be taken')
+
+    # If we get here, the user does not exist in the Org
+    except ValueError:
+
+        # Read the groups and add the user to the Organization
+        groups_by_name = {group.display_name: group for group in sch.groups}
+        invite_user_to_org(sch, email, org_name, groups, groups_by_name)
+
+else:
+    # Read the users to add, keeping the first row for an email that is in the file more than once
+    users_to_add = {}
+    for user_email, user_groups in read_users_csv(users_csv):
+        if user_email.lower() in users_to_add:
+            print('Skipping duplicate row for email \'{}\''.format(user_email))
+        else:
+            users_to_add[user_email.lower()] = (user_email, user_groups)
+
+    # Read the users once and find the ones that don't exist in the Org yet
+    existing_emails = {user.email_address.lower() for user in sch.users}
+    missing_users = []
+    for user_email, user_groups in users_to_add.values():
+        if user_email.lower() in existing_emails:
+            print('User with email \'{}\' already exists in the Org \'{}\''.format(user_email, org_name))
+        else:
+            missing_users.append((user_email, user_groups))
+    print('Inviting {} of {} users to the Org \'{}\''.format(len(missing_users), len(users_to_add), org_name))
+
+    # Read the groups once, if there is anyone to invite
+    groups_by_name = {group.display_name: group for group in sch.groups} if missing_users else {}
+
+    # Invite the missing users in parallel, rate-limited
+    rate_limiter = RateLimiter(MAX_INVITES_PER_SECOND)
+    error_count = 0
+    start_time_seconds = time.time()
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_INVITES) as executor:
+        for (user_email, _), error in zip(missing_users, executor.map(invite_user, missing_users)):
+            if error is not None:
+                error_count += 1
+                print('Error inviting user with email \'{}\': {}'.format(user_email, error))
+    print('Invited {} users in {:.1f} seconds; {} already existed, {} errors'.format(
+        len(missing_users) - error_count, time.time() - start_time_seconds,
+        len(users_to_add) - len(missing_users), error_count))
 
 print('Done')
@@ -24,6 +24,7 @@ Prerequisites:
 
 import datetime,os,sys
 from streamsets.sdk import ControlHub
+from pipeline_linter import lint_pipeline
 
 # Data Collector URL
 SDC_URL= '<your SDC URL>'
@@ -59,6 +60,7 @@ pipeline_builder = sch.get_pipeline_builder(engine_type='data_collector', engine
 dev_raw_data_source = pipeline_builder.add_stage('Dev Raw Data Source')
 trash = pipeline_builder.add_stage('Trash')
 dev_raw_data_source >> trash
+pipeline_builder.add_error_stage('Discard')
 
 
 # See the section below for a more complex pipeline
@@ -94,6 +96,14 @@ pipeline_builder.add_error_stage('Discard')
 # Build the pipeline and add it to Control Hub
 pipeline = pipeline_builder.build('SDK-Pipeline')
 
+# Check the pipeline locally before publishing it
+problems = lint_pipeline(pipeline._pipeline_definition)
+if problems:
+    for problem in problems:
+        print_message('Error: [' + problem.rule + '] ' + problem.message)
+    print_message('Pipeline has ' + str(len(problems)) + ' problems; not publishing it')
+    sys.exit(-1)
+
 print_message('Adding pipeline to Control Hub')
 sch.publish_pipeline(pipeline, commit_message='First commit of SDK-Pipeline', draft=False)
 
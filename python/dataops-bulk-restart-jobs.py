@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+
+'''
+This script restarts many Jobs on StreamSets DataOps Platform in rolling waves,
+for example during engine maintenance
+
+The Jobs to restart are read from a file of Job IDs (one per line) or selected by a
+Data Collector label. Jobs that are ACTIVE are stopped, waited on until INACTIVE,
+started again and waited on until ACTIVE; Jobs with any other status are skipped.
+
+The Jobs are restarted in waves:
+
+ - MAX_CONCURRENT_RESTARTS caps how many Jobs are restarted at the same time
+
+ - MAX_UNAVAILABLE caps how many Jobs may be down at the same time. Jobs that fail to
+   come back to ACTIVE stay down, so each failure shrinks the following waves; once
+   MAX_UNAVAILABLE Jobs have failed the script stops without restarting more Jobs
+
+ - each Job must become INACTIVE within STOP_DEADLINE_SECONDS of being stopped, and
+   ACTIVE within START_DEADLINE_SECONDS of being started
+
+The statuses of all the Jobs being waited on are polled together by one watcher (see
+job_status_watcher.py), so a wave of N Jobs does not cost N status calls per poll.
+
+When all waves are done, the script prints a report of how long each Job took to
+stop and to start, and the outcome for each Job.
+
+Prerequisites:
+ - Python 3.9+
+
+ - StreamSets DataOps Platform SDK for Python v5.1+
+   See: https://docs.streamsets.com/platform-sdk/latest/learn/installation.html
+
+ - DataOps Platform API Credentials for a user with Organization Administrator role
+
+ - To avoid including API Credentials in the script, export these two environment variables
+   prior to running the script:
+
+        export CRED_ID=<your CRED_ID>>
+        export CRED_TOKEN=<your CRED_TOKEN>
+
+Usage:
+
+    $ python3 dataops-bulk-restart-jobs.py <job_ids_file>
+    $ python3 dataops-bulk-restart-jobs.py --label <label>
+
+Sample output looks like this:
+
+    $ python3 dataops-bulk-restart-jobs.py --label weather
+    2023-03-13 21:35:03 Connecting to Control Hub
+    2023-03-13 21:35:05 Found 3 Jobs to restart; 1 Jobs are not ACTIVE and will be skipped
+    2023-03-13 21:35:05 Starting wave 1 with 2 Jobs
+    2023-03-13 21:35:16 Job 'Weather to ADLS' restarted (stop 6.1s, start 4.2s)
+    2023-03-13 21:35:17 Job 'Weather to S3' restarted (stop 7.0s, start 4.5s)
+    2023-03-13 21:35:17 Starting wave 2 with 1 Jobs
+    2023-03-13 21:35:29 Job 'Get Weather Events' restarted (stop 5.8s, start 5.9s)
+    ----------
+    Job                                      Result         Stop (s)    Start (s)
+    Weather to ADLS                          RESTARTED           6.1          4.2
+    Weather to S3                            RESTARTED           7.0          4.5
+    Get Weather Events                       RESTARTED           5.8          5.9
+    Weather to Snowflake                     SKIPPED               -            -
+        Job status was 'INACTIVE'
+    ----------
+    2023-03-13 21:35:29 Restarted 3 of 4 Jobs in 24.1 seconds; 0 failed, 1 skipped
+    2023-03-13 21:35:29 Done
+
+'''
+
+import datetime, os, sys, time
+from concurrent.futures import ThreadPoolExecutor
+from streamsets.sdk import ControlHub
+from job_status_watcher import JobStatusWatcher, JobStatusTimeout
+
+# Get CRED_ID from the environment
+CRED_ID = os.getenv('CRED_ID')
+
+# Get CRED_TOKEN from the environment
+CRED_TOKEN = os.getenv('CRED_TOKEN')
+
+# How many Jobs to restart at the same time
+MAX_CONCURRENT_RESTARTS = 10
+
+# How many Jobs may be down at the same time, including Jobs that failed to restart
+MAX_UNAVAILABLE = 10
+
+# How long a stopped Job has to become INACTIVE
+STOP_DEADLINE_SECONDS = 5 * 60 # 5 minutes
+
+# How long a started Job has to become ACTIVE
+START_DEADLINE_SECONDS = 2 * 60 # 2 minutes
+
+# How often to poll Control Hub for Job status, before backing off
+POLLING_FREQUENCY_SECONDS = 5
+
+# print_message method which writes a timestamp message ot the console
+def print_message(message):
+    print(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S") + ' ' +   message)
+
+def print_usage_and_exit():
+    print('Usage: $ python3 dataops-bulk-restart-jobs.py <job_ids_file>')
+    print('Usage: $ python3 dataops-bulk-restart-jobs.py --label <label>')
+    sys.exit(1)
+
+# Method that waits for a Job to reach a status; returns True if it did before the deadline.
+# The Jobs of a wave share one watcher, which reads their statuses in batched calls
+def wait_for_job_status(job, status, deadline_seconds):
+    try:
+        watcher.watch(job, status, deadline_seconds).result()
+        return True
+    except JobStatusTimeout:
+        return False
+
+# Method that restarts one Job and returns its result
+def restart_job(job):
+    result = {'job_name': job.job_name, 'job_id': job.job_id, 'result': None,
+              'stop_seconds': None, 'start_seconds': None, 'message': None}
+    try:
+        start_time_seconds = time.time()
+        sch.stop_job(job)
+        if not wait_for_job_status(job, 'INACTIVE', STOP_DEADLINE_SECONDS):
+            result['result'] = 'STOP_TIMEOUT'
+            return result
+        result['stop_seconds'] = time.time() - start_time_seconds
+
+        start_time_seconds = time.time()
+        sch.start_job(job)
+        if not wait_for_job_status(job, 'ACTIVE', START_DEADLINE_SECONDS):
+            result['result'] = 'START_TIMEOUT'
+            return result
+        result['start_seconds'] = time.time() - start_time_seconds
+        result['result'] = 'RESTARTED'
+    except Exception as e:
+        result['result'] = 'ERROR'
+        result['message'] = str(e)
+    return result
+
+# Method that prints the final report
+def print_report(results):
+    def fmt(seconds):
+        return '-' if seconds is None else '{:.1f}'.format(seconds)
+    print('----------')
+    print('{:<40} {:<14} {:>8} {:>12}'.format('Job', 'Result', 'Stop (s)', 'Start (s)'))
+    for result in results:
+        print('{:<40} {:<14} {:>8} {:>12}'.format(
+            result['job_name'], result['result'], fmt(result['stop_seconds']), fmt(result['start_seconds'])))
+        if result['message']:
+            print('    ' + result['message'])
+    print('----------')
+
+# Check the command line args
+if len(sys.argv) == 3 and sys.argv[1] == '--label':
+    job_label = sys.argv[2]
+    job_ids = None
+elif len(sys.argv) == 2 and not sys.argv[1].startswith('--'):
+    job_label = None
+    with open(sys.argv[1]) as file:
+        job_ids = [line.strip() for line in file if line.strip() and not line.startswith('#')]
+else:
+    print('Error: Wrong arguments')
+    print_usage_and_exit()
+
+# Connect to Control Hub
+print_message('Connecting to Control Hub')
+sch = ControlHub(
+    credential_id=CRED_ID,
+    token=CRED_TOKEN)
+
+# Get the Jobs from a single listing
+if job_label is not None:
+    jobs = [job for job in sch.jobs if job_label in job.data_collector_labels]
+else:
+    jobs_by_id = {job.job_id: job for job in sch.jobs}
+    jobs = []
+    for job_id in job_ids:
+        if job_id in jobs_by_id:
+            jobs.append(jobs_by_id[job_id])
+        else:
+            print_message('Error: Job with ID \'' + job_id + '\' not found.')
+
+# Only ACTIVE Jobs are restarted
+jobs_to_restart = [job for job in jobs if job.currentJobStatus['status'] == 'ACTIVE']
+skipped_jobs = [job for job in jobs if job.currentJobStatus['status'] != 'ACTIVE']
+print_message('Found {} Jobs to restart; {} Jobs are not ACTIVE and will be skipped'.format(
+    len(jobs_to_restart), len(skipped_jobs)))
+
+watcher = JobStatusWatcher(sch, initial_interval_seconds=POLLING_FREQUENCY_SECONDS)
+results = []
+failed_count = 0
+wave_number = 0
+overall_start_time_seconds = time.time()
+remaining_jobs = list(jobs_to_restart)
+
+# Restart the Jobs in waves
+with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_RESTARTS) as executor:
+    while len(remaining_jobs) > 0:
+        wave_size = min(MAX_CONCURRENT_RESTARTS, MAX_UNAVAILABLE - failed_count)
+        if wave_size <= 0:
+            print_message('Error: {} Jobs failed to restart, which reaches MAX_UNAVAILABLE; not restarting the remaining {} Jobs'.format(
+                failed_count, len(remaining_jobs)))
+            break
+        wave, remaining_jobs = remaining_jobs[:wave_size], remaining_jobs[wave_size:]
+        wave_number += 1
+        print_message('Starting wave {} with {} Jobs'.format(wave_number, len(wave)))
+
+        for result in executor.map(restart_job, wave):
+            results.append(result)
+            if result['result'] == 'RESTARTED':
+                print_message('Job \'{}\' restarted (stop {:.1f}s, start {:.1f}s)'.format(
+                    result['job_name'], result['stop_seconds'], result['start_seconds']))
+            else:
+                failed_count += 1
+                print_message('Error: Job \'{}\' failed to restart: {}'.format(result['job_name'], result['result']))
+
+watcher.stop()
+
+for job in remaining_jobs:
+    results.append({'job_name': job.job_name, 'job_id': job.job_id, 'result': 'NOT_STARTED',
+                    'stop_seconds': None, 'start_seconds': None, 'message': None})
+for job in skipped_jobs:
+    results.append({'job_name': job.job_name, 'job_id': job.job_id, 'result': 'SKIPPED',
+                    'stop_seconds': None, 'start_seconds': None,
+                    'message': 'Job status was \'' + job.currentJobStatus['status'] + '\''})
+
+print_report(results)
+restarted_count = len([result for result in results if result['result'] == 'RESTARTED'])
+print_message('Restarted {} of {} Jobs in {:.1f} seconds; {} failed, {} skipped'.format(
+    restarted_count, len(results), time.time() - overall_start_time_seconds, failed_count, len(skipped_jobs)))
+print_message('Done')
@@ -0,0 +1,333 @@
+#!/usr/bin/env python
+
+'''
+This script generates many near-identical Pipelines and Jobs on StreamSets DataOps
+Platform from a declarative spec, for example one ingestion pipeline per source table
+
+The spec is a JSON file with one pipeline definition and a list of instances. Strings in
+the definition may refer to instance variables as {variable}:
+
+    {
+      "sdc_url": "https://sdc-1.example.com:18630",
+      "pipeline_name": "Ingest {table}",
+      "job_name": "Job for Ingest {table}",
+      "job_labels": ["DEV"],
+      "stages": [
+        {"name": "origin", "stage": "JDBC Multitable Consumer",
+         "config": {"jdbc_connection_string": "jdbc:mysql://warsaw:3306/{schema}",
+                    "table_configs": [{"schema": "{schema}", "tablePattern": "{table}"}]}},
+        {"name": "kafka", "stage": "Kafka Producer",
+         "library": "streamsets-datacollector-apache-kafka_3_3-lib",
+         "config": {"broker_uri": "portland:9092", "topic": "{table}"}}
+      ],
+      "links": [["origin", "kafka"]],
+      "error_stage": "Discard",
+      "instances": [
+        {"schema": "claims", "table": "CLAIMS_2022"},
+        {"schema": "claims", "table": "CLAIMS_2023"}
+      ]
+    }
+
+A pipeline builder is created once, with the stage definitions of the Data Collector,
+and copied for each instance, rather than fetching the stage definitions again for every
+pipeline. The pipelines are then published and their Jobs added in parallel, up to
+MAX_CONCURRENT_PUBLISHES at a time. Each pipeline is checked with pipeline_linter.py
+first, and is not published if the linter finds problems.
+
+Generation is idempotent. Each instance's rendered definition is hashed, and the hash is
+kept in a state file next to the spec (<spec_file>.state.json) with the IDs of the
+pipeline and Job it produced. When the script is run again:
+
+ - instances whose definition has not changed are skipped
+
+ - instances whose stage configuration changed, but not their stages or links, get a new
+   version of their pipeline, and their Job is upgraded to it. A new version is only
+   published if a stage config of the pipeline differs from the spec
+
+ - instances whose Job name or labels changed get their Job updated. A Job that is not
+   INACTIVE or INACTIVE_ERROR is not updated, and is reported instead; stop it and run
+   the script again
+
+ - instances whose stages or links changed are reported; delete their pipeline and Job
+   to generate them again
+
+ - new instances get a new pipeline and Job
+
+With --dry-run the script prints what it would do and stops.
+
+Prerequisites:
+ - Python 3.9+
+
+ - StreamSets DataOps Platform SDK for Python v5.1+
+   See: https://docs.streamsets.com/platform-sdk/latest/learn/installation.html
+
+ - DataOps Platform API Credentials for a user with Organization Administrator role
+
+ - To avoid including API Credentials in the script, export these two environment variables
+   prior to running the script:
+
+        export CRED_ID=<your CRED_ID>>
+        export CRED_TOKEN=<your CRED_TOKEN>
+
+Usage:
+
+    $ python3 dataops-generate-pipelines-and-jobs.py <spec_file> [--dry-run]
+
+Sample output looks like this:
+
+    $ python3 dataops-generate-pipelines-and-jobs.py claims.json
+    2023-03-14 15:02:10 Spec has 120 instances: 20 new, 2 changed, 98 unchanged, 0 with changed stages
+    2023-03-14 15:02:10 Connecting to Control Hub
+    2023-03-14 15:02:14 Created Pipeline 'Ingest CLAIMS_2023' and Job 'Job for Ingest CLAIMS_2023'
+    2023-03-14 15:02:14 Updated Pipeline 'Ingest CLAIMS_2021'
+    2023-03-14 15:02:15 Upgraded Job 'Job for Ingest CLAIMS_2021'
+    2023-03-14 15:02:15 Updated the name and labels of Job 'Job for Ingest CLAIMS_2022'
+    ...
+    2023-03-14 15:02:31 Generated 22 instances in 19.2 seconds; 0 errors
+    2023-03-14 15:02:31 Done
+
+'''
+
+import copy, datetime, hashlib, json, os, re, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from streamsets.sdk import ControlHub
+from pipeline_linter import lint_pipeline
+
+# Get CRED_ID from the environment
+CRED_ID = os.getenv('CRED_ID')
+
+# Get CRED_TOKEN from the environment
+CRED_TOKEN = os.getenv('CRED_TOKEN')
+
+# How many pipelines to publish at the same time
+MAX_CONCURRENT_PUBLISHES = 8
+
+# Job statuses in which a Job's name and labels can be updated
+STOPPED_STATUSES = ['INACTIVE', 'INACTIVE_ERROR']
+
+# Pattern of the instance variables in the spec
+VARIABLE_PATTERN = re.compile(r'\{(\w+)\}')
+
+# print_message method which writes a timestamp message ot the console
+def print_message(message):
+    print(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S") + ' ' +   message)
+
+# Method that replaces the {variable} references in a value with an instance's values
+def render(value, variables):
+    if isinstance(value, str):
+        return VARIABLE_PATTERN.sub(lambda match: str(variables.get(match.group(1), match.group(0))), value)
+    if isinstance(value, list):
+        return [render(item, variables) for item in value]
+    if isinstance(value, dict):
+        return {key: render(item, variables) for key, item in value.items()}
+    return value
+
+# Method that returns the rendered definition of an instance
+def render_instance(spec, variables):
+    definition = {key: render(spec.get(key), variables)
+                  for key in ('pipeline_name', 'job_name', 'job_labels', 'stages', 'links', 'error_stage')}
+    definition['job_labels'] = definition['job_labels'] or []
+    return definition
+
+# Method that returns a hash of a value
+def get_hash(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode('utf-8')).hexdigest()
+
+# Method that returns a hash of the stages and links of a definition, without their configuration
+def get_structure_hash(definition):
+    stages = [(stage['name'], stage['stage'], stage.get('library')) for stage in definition['stages']]
+    return get_hash([stages, definition['links'], definition['error_stage']])
+
+# Method that returns a pipeline builder for an instance, copied from the template builder
+def get_pipeline_builder():
+    try:
+        # Share the Control Hub connection rather than copying it
+        return copy.deepcopy(template_pipeline_builder, {id(sch): sch})
+    except Exception:
+        return sch.get_pipeline_builder(engine_type='data_collector', engine_id=sdc.id)
+
+# Method that sets the configuration of a stage from a definition; returns True if a config changed
+def configure_stage(stage, stage_definition):
+    changed = False
+    for key, value in (stage_definition.get('config') or {}).items():
+        if getattr(stage, key, None) != value:
+            setattr(stage, key, value)
+            changed = True
+    return changed
+
+# Method that raises an error if the linter finds problems in a pipeline
+def check_pipeline(pipeline):
+    problems = lint_pipeline(pipeline._pipeline_definition)
+    if problems:
+        raise ValueError('; '.join('[' + problem.rule + '] ' + problem.message for problem in problems))
+
+# Method that builds, publishes and adds the Job for a new instance; returns the state record
+def create_instance(definition):
+    pipeline_builder = get_pipeline_builder()
+    stages = {}
+    for stage_definition in definition['stages']:
+        if stage_definition.get('library'):
+            stage = pipeline_builder.add_stage(stage_definition['stage'], library=stage_definition['library'])
+        else:
+            stage = pipeline_builder.add_stage(stage_definition['stage'])
+        configure_stage(stage, stage_definition)
+        stages[stage_definition['name']] = stage
+    for source, target in definition['links']:
+        stages[source] >> stages[target]
+    if definition['error_stage']:
+        pipeline_builder.add_error_stage(definition['error_stage'])
+
+    # Build the pipeline and add it to Control Hub
+    pipeline = pipeline_builder.build(definition['pipeline_name'])
+    check_pipeline(pipeline)
+    sch.publish_pipeline(pipeline, commit_message='Generated from spec', draft=False)
+
+    # Create a job for the first version of the pipeline
+    pipeline_commit = pipeline.commits.get(version='1')
+    job = job_builder.build(definition['job_name'], pipeline=pipeline, pipeline_commit=pipeline_commit)
+    job.data_collector_labels = definition['job_labels']
+    sch.add_job(job)
+    print_message('Created Pipeline \'' + definition['pipeline_name'] + '\' and Job \'' + definition['job_name'] + '\'')
+    return {'pipeline_id': pipeline.pipeline_id, 'job_id': job.job_id,
+            'stage_instance_names': {name: stage.instance_name for name, stage in stages.items()}}
+
+# Method that applies the changes to an instance: publishes a new version of its pipeline
+# if a stage config changed and upgrades its Job to it, and updates the Job's name and
+# labels if they changed; returns the state record
+def update_instance(definition, record):
+    pipeline = sch.pipelines.get(pipeline_id=record['pipeline_id'])
+    pipeline_changed = False
+    for stage_definition in definition['stages']:
+        stage = pipeline.stages.get(instance_name=record['stage_instance_names'][stage_definition['name']])
+        pipeline_changed = configure_stage(stage, stage_definition) or pipeline_changed
+
+    # The Job's name and labels can only be updated while it is stopped
+    job = sch.jobs.get(job_id=record['job_id'])
+    job_changed = (job.job_name != definition['job_name']
+                   or sorted(job.data_collector_labels or []) != sorted(definition['job_labels']))
+    if job_changed and job.currentJobStatus['status'] not in STOPPED_STATUSES:
+        raise ValueError('the name or labels of Job \'' + job.job_name + '\' changed, but the Job is '
+                         + job.currentJobStatus['status'] + '; stop the Job and run the script again')
+
+    if pipeline_changed:
+        check_pipeline(pipeline)
+        sch.publish_pipeline(pipeline, commit_message='Generated from spec', draft=False)
+        print_message('Updated Pipeline \'' + definition['pipeline_name'] + '\'')
+    if job_changed:
+        job.job_name = definition['job_name']
+        job.data_collector_labels = definition['job_labels']
+        sch.update_job(job)
+        print_message('Updated the name and labels of Job \'' + definition['job_name'] + '\'')
+    if pipeline_changed:
+        job.commit_id = pipeline.commit_id
+        sch.upgrade_job(job)
+        print_message('Upgraded Job \'' + definition['job_name'] + '\'')
+    if not pipeline_changed and not job_changed:
+        print_message('Pipeline \'' + definition['pipeline_name'] + '\' and its Job already match the spec')
+    return {'pipeline_id': record['pipeline_id'], 'job_id': record['job_id'],
+            'stage_instance_names': record['stage_instance_names']}
+
+# Method that generates one instance and records it in the state file; returns None or an error message
+def generate_instance(action_and_definition):
+    action, definition = action_and_definition
+    key = definition['pipeline_name']
+    try:
+        if action == 'new':
+            record = create_instance(definition)
+        else:
+            record = update_instance(definition, state[key])
+    except Exception as e:
+        return str(e)
+    record['hash'] = get_hash(definition)
+    record['structure_hash'] = get_structure_hash(definition)
+    with state_lock:
+        state[key] = record
+        write_state()
+    return None
+
+# Method that writes the state file
+def write_state():
+    with open(state_file + '.tmp', 'w') as file:
+        json.dump(state, file, indent=2, sort_keys=True)
+    os.replace(state_file + '.tmp', state_file)
+
+# Check the command line args
+dry_run = '--dry-run' in sys.argv[1:]
+args = [arg for arg in sys.argv[1:] if arg != '--dry-run']
+if len(args) != 1:
+    print('Usage: $ python3 dataops-generate-pipelines-and-jobs.py <spec_file> [--dry-run]')
+    sys.exit(1)
+spec_file = args[0]
+state_file = spec_file + '.state.json'
+
+# Read the spec and the state of previous runs
+with open(spec_file) as file:
+    spec = json.load(file)
+state = {}
+if os.path.exists(state_file):
+    with open(state_file) as file:
+        state = json.load(file)
+
+# Render every instance and compare it with the state
+actions = []
+counts = {'new': 0, 'changed': 0, 'unchanged': 0, 'structure_changed': 0}
+for variables in spec['instances']:
+    definition = render_instance(spec, variables)
+    record = state.get(definition['pipeline_name'])
+    if record is None:
+        action = 'new'
+    elif record['hash'] == get_hash(definition):
+        action = 'unchanged'
+    elif record['structure_hash'] == get_structure_hash(definition):
+        action = 'changed'
+    else:
+        action = 'structure_changed'
+        print_message('Error: the stages or links of Pipeline \'' + definition['pipeline_name']
+                      + '\' changed; delete the Pipeline and its Job to generate them again')
+    counts[action] += 1
+    if action in ('new', 'changed'):
+        actions.append((action, definition))
+
+print_message('Spec has {} instances: {} new, {} changed, {} unchanged, {} with changed stages'.format(
+    len(spec['instances']), counts['new'], counts['changed'], counts['unchanged'], counts['structure_changed']))
+if dry_run:
+    for action, definition in actions:
+        print_message('Would ' + ('create' if action == 'new' else 'update') + ' Pipeline \'' + definition['pipeline_name'] + '\'')
+    print_message('Dry run; no changes made')
+    sys.exit(0)
+if len(actions) == 0:
+    print_message('Done')
+    sys.exit(-1 if counts['structure_changed'] > 0 else 0)
+
+# Connect to Control Hub
+print_message('Connecting to Control Hub')
+sch = ControlHub(
+    credential_id=CRED_ID,
+    token=CRED_TOKEN)
+
+# Get the SDC
+try:
+    sdc = sch.data_collectors.get(engine_url=spec['sdc_url'])
+except:
+    print_message('Error getting SDC with URL \''  + spec['sdc_url'] + '\'')
+    sys.exit(-1)
+
+# Get the pipeline and job builders once
+template_pipeline_builder = sch.get_pipeline_builder(engine_type='data_collector', engine_id=sdc.id)
+job_builder = sch.get_job_builder()
+
+# Generate the instances in parallel
+state_lock = threading.Lock()
+error_count = 0
+start_time_seconds = time.time()
+with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_PUBLISHES) as executor:
+    for (action, definition), error in zip(actions, executor.map(generate_instance, actions)):
+        if error is not None:
+            error_count += 1
+            print_message('Error generating Pipeline \'' + definition['pipeline_name'] + '\': ' + error)
+
+print_message('Generated {} instances in {:.1f} seconds; {} errors'.format(
+    len(actions) - error_count, time.time() - start_time_seconds, error_count + counts['structure_changed']))
+if error_count + counts['structure_changed'] > 0:
+    sys.exit(-1)
+print_message('Done')
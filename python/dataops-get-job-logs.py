@@ -19,10 +19,24 @@ Prerequisites:
 
 - Set the variable JOB_ID at the top of the script for the Job to get metrics for
 
+- The logs of a completed run (the Job is INACTIVE or INACTIVE_ERROR) don't change, so they are
+  cached on disk, gzip-compressed, in CACHE_DIR, by Job ID and run number; getting them
+  again reads the cache rather than downloading them
+
+- With --tail, the script follows the current run: it polls the logs every
+  TAIL_INTERVAL_SECONDS (backing off to TAIL_MAX_INTERVAL_SECONDS while nothing new is
+  logged), writes only the entries after the last one it has seen to stdout, and stops
+  when the Job is no longer active, caching the completed run. Press Ctrl-C to stop
+  earlier
+
+Usage:
+
+    $ python3 dataops-get-job-logs.py [--tail]
+
  
 '''
 
-import datetime,os,sys
+import datetime,gzip,json,os,sys,time
 from streamsets.sdk import ControlHub
 
 # Job to get logs for
@@ -34,10 +48,132 @@ CRED_ID = os.getenv('CRED_ID')
 # Get CRED_TOKEN from the environment
 CRED_TOKEN = os.getenv('CRED_TOKEN')
 
+# Directory for the cached logs of completed runs
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.streamsets', 'job-logs')
+
+# How often to poll for new log entries with --tail, and how far to back off while there are none
+TAIL_INTERVAL_SECONDS = 2
+TAIL_MAX_INTERVAL_SECONDS = 30
+
+# Job statuses of a run that is still in progress
+ACTIVE_STATUSES = ['ACTIVATING', 'ACTIVE', 'ACTIVE_ERROR', 'DEACTIVATING']
+
+# Job statuses of a completed run, whose logs can be cached
+FINISHED_STATUSES = ['INACTIVE', 'INACTIVE_ERROR']
+
 # print_message method which writes a timestamp message ot the console
 def print_message(message):
     print(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S") + ' ' +   message)
 
+# Method that returns the status and run number of the Job's current run
+def get_job_status(job):
+    job.refresh()
+    job_status = job.history[0]
+    return job_status.status, job_status.run_count
+
+# Method that returns the cache file for a run of a Job
+def get_cache_file(job_id, run_count):
+    return os.path.join(CACHE_DIR, job_id.replace(':', '_'), 'run-' + str(run_count) + '.json.gz')
+
+# Method that reads the cached logs of a run; returns None if they are not cached
+def read_cache(job_id, run_count):
+    cache_file = get_cache_file(job_id, run_count)
+    if not os.path.exists(cache_file):
+        return None
+    with gzip.open(cache_file, 'rt', encoding='utf-8') as file:
+        return json.load(file)
+
+# Method that writes the logs of a completed run to the cache
+def write_cache(job_id, run_count, entries):
+    cache_file = get_cache_file(job_id, run_count)
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    with gzip.open(cache_file + '.tmp', 'wt', encoding='utf-8') as file:
+        json.dump(entries, file)
+    os.replace(cache_file + '.tmp', cache_file)
+
+# Method that fetches the logs of the Job's current run as a list of entries
+def fetch_logs(job):
+    logs = job.get_run_logs()
+    if logs is None:
+        return []
+    if isinstance(logs, str):
+        return logs.splitlines()
+    return [getattr(entry, '_data', entry) for entry in logs]
+
+# Method that formats a log entry as one line
+def format_entry(entry):
+    if isinstance(entry, dict):
+        return ' '.join(str(entry[key]) for key in ('timestamp', 'severity', 'category', 'stage', 'message') if entry.get(key))
+    return str(entry)
+
+# Method that returns a key that identifies a log entry
+def get_entry_key(entry):
+    return json.dumps(entry, sort_keys=True, default=str)
+
+# Method that returns the entries after the last entry seen, searching from the end. If the
+# last entry seen is no longer in the logs, all of the entries are new
+def get_new_entries(entries, last_entry_key):
+    if last_entry_key is None:
+        return entries
+    for i in range(len(entries) - 1, -1, -1):
+        if get_entry_key(entries[i]) == last_entry_key:
+            return entries[i + 1:]
+    return entries
+
+# Method that writes log entries to stdout
+def print_entries(entries):
+    for entry in entries:
+        print(format_entry(entry), flush=True)
+
+# Method that writes the logs of the Job's current run, from the cache if the run has completed
+def print_logs(job):
+    status, run_count = get_job_status(job)
+    if status in FINISHED_STATUSES:
+        entries = read_cache(job.job_id, run_count)
+        if entries is not None:
+            print_message('Read logs of run ' + str(run_count) + ' from the cache')
+            print_entries(entries)
+            return
+    entries = fetch_logs(job)
+    print_entries(entries)
+    if status in FINISHED_STATUSES:
+        write_cache(job.job_id, run_count, entries)
+
+# Method that follows the logs of the Job's current run until the Job is no longer active
+def tail_logs(job):
+    status, run_count = get_job_status(job)
+    if status not in ACTIVE_STATUSES:
+        print_logs(job)
+        return
+    last_entry_key = None
+    interval_seconds = TAIL_INTERVAL_SECONDS
+    while True:
+        entries = fetch_logs(job)
+        new_entries = get_new_entries(entries, last_entry_key)
+        print_entries(new_entries)
+        if entries:
+            last_entry_key = get_entry_key(entries[-1])
+        if status not in ACTIVE_STATUSES:
+            if status in FINISHED_STATUSES:
+                write_cache(job.job_id, run_count, entries)
+            print_message('Job status is \'' + status + '\'; run ' + str(run_count) + ' is complete')
+            return
+
+        # Back off while nothing new is logged
+        interval_seconds = TAIL_INTERVAL_SECONDS if new_entries else min(interval_seconds * 2, TAIL_MAX_INTERVAL_SECONDS)
+        time.sleep(interval_seconds)
+        status, new_run_count = get_job_status(job)
+        if new_run_count != run_count:
+            print_message('Job started run ' + str(new_run_count))
+            run_count = new_run_count
+            last_entry_key = None
+
+# Check the command line args
+tail = '--tail' in sys.argv[1:]
+if len([arg for arg in sys.argv[1:] if arg != '--tail']) > 0:
+    print('Usage: $ python3 dataops-get-job-logs.py [--tail]')
+    sys.exit(1)
+
 # Connect to Control Hub
 print_message('Connecting to Control Hub')
 sch = ControlHub(
@@ -54,7 +190,12 @@ except:
 print_message('Found Job with name \'' + job.job_name + '\'')
 
 ## Get the Job logs
-job.refresh()
-print(job.get_run_logs())
+if tail:
+    try:
+        tail_logs(job)
+    except KeyboardInterrupt:
+        pass
+else:
+    print_logs(job)
 
 print_message('Done')
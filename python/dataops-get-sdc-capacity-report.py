@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+
+'''
+This script writes a capacity report for all Data Collectors on StreamSets DataOps Platform
+
+The CPU load, memory used and running pipeline count of every Data Collector are read
+in parallel and aggregated for the whole fleet, per deployment and per engine label.
+For each group the report includes:
+
+ - totals, means and maximums of CPU load, memory used and running pipelines
+
+ - headroom: the CPU load left below each engine's max CPU load resource threshold
+   (100% if none is set), and the pipeline slots left below each engine's max running
+   pipelines threshold (for engines that have one)
+
+ - imbalance: the coefficient of variation (standard deviation / mean) of the running
+   pipelines per engine and of the CPU load per engine; 0 means perfectly balanced
+
+ - hotspots: engines at or above HOTSPOT_CPU_LOAD_PERCENT CPU load, or running at least
+   HOTSPOT_PIPELINES_FACTOR times the mean number of pipelines of their deployment
+
+The report is written as JSON to stdout, or to a file if one is given on the command
+line. Progress messages are written to stderr so stdout can be piped to other tools.
+
+Prerequisites:
+ - Python 3.9+
+
+ - StreamSets DataOps Platform SDK for Python v5.1+
+   See: https://docs.streamsets.com/platform-sdk/latest/learn/installation.html
+
+ - DataOps Platform API Credentials for a user with Organization Administrator role
+
+ - To avoid including API Credentials in the script, export these two environment variables
+   prior to running the script:
+
+        export CRED_ID=<your CRED_ID>>
+        export CRED_TOKEN=<your CRED_TOKEN>
+
+Usage:
+
+    $ python3 dataops-get-sdc-capacity-report.py [<report_file>]
+
+Sample output looks like this:
+
+    $ python3 dataops-get-sdc-capacity-report.py capacity.json
+    2023-03-13 22:01:56 Connecting to Control Hub
+    2023-03-13 22:01:57 Reading metrics for 112 Data Collectors
+    2023-03-13 22:02:00 Wrote capacity report for 112 Data Collectors to capacity.json in 3.1 seconds
+
+    $ python3 -c "import json; print(json.dumps(json.load(open('capacity.json'))['fleet'], indent=2))"
+    {
+      "engine_count": 112,
+      "cpu_load_mean": 41.3,
+      "cpu_load_max": 93.5,
+      "cpu_load_cv": 0.52,
+      "cpu_headroom_mean": 58.7,
+      "memory_used_mb_total": 331012.4,
+      "memory_used_mb_mean": 2955.5,
+      "memory_used_mb_max": 7840.2,
+      "running_pipelines_total": 948,
+      "running_pipelines_mean": 8.46,
+      "running_pipelines_max": 31,
+      "running_pipelines_cv": 0.87,
+      "pipeline_slots_free": 1292
+    }
+
+'''
+
+import datetime, json, os, statistics, sys, time
+from concurrent.futures import ThreadPoolExecutor
+from streamsets.sdk import ControlHub
+
+# Get CRED_ID from the environment
+CRED_ID = os.getenv('CRED_ID')
+
+# Get CRED_TOKEN from the environment
+CRED_TOKEN = os.getenv('CRED_TOKEN')
+
+# How many Data Collectors to read metrics from in parallel
+MAX_CONCURRENT_REQUESTS = 32
+
+# Engines at or above this CPU load are hotspots
+HOTSPOT_CPU_LOAD_PERCENT = 80
+
+# Engines running at least this many times the mean number of pipelines of their
+# deployment are hotspots
+HOTSPOT_PIPELINES_FACTOR = 1.5
+
+# print_message method which writes a timestamp message to stderr
+def print_message(message):
+    print(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S") + ' ' +   message, file=sys.stderr)
+
+# Method that reads the metrics of one engine into a dict
+def read_engine_metrics(sdc):
+    engine = {}
+    engine['engine_id'] = sdc.id
+    engine['engine_url'] = sdc.engine_url
+    engine['deployment_id'] = getattr(sdc, 'deployment_id', None)
+    engine['labels'] = list(getattr(sdc, 'labels', None) or [])
+    try:
+        engine['cpu_load'] = float(sdc.cpu_load)
+        engine['memory_used_mb'] = float(sdc.memory_used_mb)
+        engine['running_pipelines_count'] = int(sdc.running_pipelines_count)
+        engine['running_pipelines'] = [p.get('pipeline') for p in (sdc.running_pipelines or [])]
+        engine['max_cpu_load'] = getattr(sdc, 'max_cpu_load', None)
+        engine['max_pipelines_running'] = getattr(sdc, 'max_pipelines_running', None)
+        engine['error'] = None
+    except Exception as e:
+        engine['error'] = str(e)
+    return engine
+
+# Method that returns the coefficient of variation of a list of values
+def coefficient_of_variation(values):
+    if len(values) < 2:
+        return 0.0
+    mean = statistics.mean(values)
+    if mean == 0:
+        return 0.0
+    return round(statistics.pstdev(values) / mean, 3)
+
+# Method that summarizes the capacity of a group of engines
+def summarize(engines):
+    engines = [engine for engine in engines if engine['error'] is None]
+    summary = {'engine_count': len(engines)}
+    if len(engines) == 0:
+        return summary
+    cpu_loads = [engine['cpu_load'] for engine in engines]
+    memory = [engine['memory_used_mb'] for engine in engines]
+    pipelines = [engine['running_pipelines_count'] for engine in engines]
+    summary['cpu_load_mean'] = round(statistics.mean(cpu_loads), 2)
+    summary['cpu_load_max'] = round(max(cpu_loads), 2)
+    summary['cpu_load_cv'] = coefficient_of_variation(cpu_loads)
+    summary['cpu_headroom_mean'] = round(statistics.mean(
+        max((engine['max_cpu_load'] or 100) - engine['cpu_load'], 0) for engine in engines), 2)
+    summary['memory_used_mb_total'] = round(sum(memory), 2)
+    summary['memory_used_mb_mean'] = round(statistics.mean(memory), 2)
+    summary['memory_used_mb_max'] = round(max(memory), 2)
+    summary['running_pipelines_total'] = sum(pipelines)
+    summary['running_pipelines_mean'] = round(statistics.mean(pipelines), 2)
+    summary['running_pipelines_max'] = max(pipelines)
+    summary['running_pipelines_cv'] = coefficient_of_variation(pipelines)
+    summary['pipeline_slots_free'] = sum(
+        max(engine['max_pipelines_running'] - engine['running_pipelines_count'], 0)
+        for engine in engines if engine['max_pipelines_running'])
+    return summary
+
+# Method that returns the hotspot engines and the reasons they are hotspots
+def find_hotspots(engines, engines_by_deployment):
+    hotspots = []
+    for engine in engines:
+        if engine['error'] is not None:
+            continue
+        reasons = []
+        if engine['cpu_load'] >= HOTSPOT_CPU_LOAD_PERCENT:
+            reasons.append('cpu_load {:.1f}% >= {}%'.format(engine['cpu_load'], HOTSPOT_CPU_LOAD_PERCENT))
+        peers = [peer['running_pipelines_count'] for peer in engines_by_deployment[engine['deployment']] if peer['error'] is None]
+        mean_pipelines = statistics.mean(peers) if peers else 0
+        if len(peers) > 1 and mean_pipelines > 0 and engine['running_pipelines_count'] >= HOTSPOT_PIPELINES_FACTOR * mean_pipelines:
+            reasons.append('running_pipelines {} >= {} x deployment mean {:.1f}'.format(
+                engine['running_pipelines_count'], HOTSPOT_PIPELINES_FACTOR, mean_pipelines))
+        if reasons:
+            hotspots.append({'engine_url': engine['engine_url'], 'deployment': engine['deployment'], 'reasons': reasons})
+    return hotspots
+
+# Get the optional report file from the command line
+if len(sys.argv) > 2:
+    print('Usage: $ python3 dataops-get-sdc-capacity-report.py [<report_file>]')
+    sys.exit(1)
+report_file = sys.argv[1] if len(sys.argv) == 2 else None
+
+# Connect to Control Hub
+print_message('Connecting to Control Hub')
+sch = ControlHub(
+    credential_id=CRED_ID,
+    token=CRED_TOKEN)
+
+start_time_seconds = time.time()
+
+# List the SDCs and deployments once
+sdcs = list(sch.data_collectors)
+deployment_names = {}
+try:
+    deployment_names = {deployment.deployment_id: deployment.deployment_name for deployment in sch.deployments}
+except Exception as e:
+    print_message('Warning: could not list deployments: ' + str(e))
+
+# Read every SDC's metrics in parallel
+print_message('Reading metrics for ' + str(len(sdcs)) + ' Data Collectors')
+with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
+    engines = list(executor.map(read_engine_metrics, sdcs))
+
+for engine in engines:
+    engine['deployment'] = deployment_names.get(engine['deployment_id'], engine['deployment_id'] or 'none')
+    if engine['error'] is not None:
+        print_message('Error reading metrics for SDC ' + engine['engine_url'] + ': ' + engine['error'])
+
+# Group the engines by deployment and by label
+engines_by_deployment = {}
+engines_by_label = {}
+for engine in engines:
+    engines_by_deployment.setdefault(engine['deployment'], []).append(engine)
+    for label in engine['labels']:
+        engines_by_label.setdefault(label, []).append(engine)
+
+report = {}
+report['generated_at'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+report['fleet'] = summarize(engines)
+report['deployments'] = {name: summarize(group) for name, group in sorted(engines_by_deployment.items())}
+report['labels'] = {label: summarize(group) for label, group in sorted(engines_by_label.items())}
+report['hotspots'] = find_hotspots(engines, engines_by_deployment)
+report['engines'] = engines
+report['elapsed_seconds'] = round(time.time() - start_time_seconds, 2)
+
+# Write the report
+data = json.dumps(report, indent=2)
+if report_file is None:
+    print(data)
+else:
+    with open(report_file, 'w') as file:
+        file.write(data)
+    print_message('Wrote capacity report for ' + str(len(engines)) + ' Data Collectors to ' + report_file
+                  + ' in ' + str(report['elapsed_seconds']) + ' seconds')
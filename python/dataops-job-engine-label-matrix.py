@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+
+'''
+This script finds the Data Collectors each Job on StreamSets DataOps Platform can run on,
+based on labels, and flags Jobs that have no or only one eligible engine
+
+A Job can only run on engines that have all of its data_collector_labels; when no engine
+has them all, the Job can't start. The script lists all Jobs and all Data Collectors once,
+reads the load of up to MAX_CONCURRENT_REQUESTS Data Collectors in parallel, and encodes
+label sets as bitsets: for each label, an integer with one bit per engine that has the
+label. The eligible engines of a Job are then the AND of the bitsets of its labels, and
+Jobs with the same labels share the result, so 10,000 Jobs by 500 engines are matched in a
+fraction of a second.
+
+For each flagged Job the script prints its labels, the labels no engine has (if any), and
+the eligible engine with its current CPU load and running pipelines. Optionally the full
+matrix (every Job with its eligible engines) is written as JSON to a file.
+
+Prerequisites:
+ - Python 3.9+
+
+ - StreamSets DataOps Platform SDK for Python v5.1+
+   See: https://docs.streamsets.com/platform-sdk/latest/learn/installation.html
+
+ - DataOps Platform API Credentials for a user with Organization Administrator role
+
+ - To avoid including API Credentials in the script, export these two environment variables
+   prior to running the script:
+
+        export CRED_ID=<your CRED_ID>>
+        export CRED_TOKEN=<your CRED_TOKEN>
+
+Usage:
+
+    $ python3 dataops-job-engine-label-matrix.py [<matrix_file>]
+
+Sample output looks like this:
+
+    $ python3 dataops-job-engine-label-matrix.py matrix.json
+    2023-03-14 13:40:02 Connecting to Control Hub
+    2023-03-14 13:40:09 Loaded 4812 Jobs and 112 Data Collectors with 57 distinct labels
+    2023-03-14 13:40:09 Matched 4812 Jobs against 112 Data Collectors in 0.02 seconds
+    2023-03-14 13:40:09 Jobs with no eligible engine: 2; Jobs with one eligible engine: 1
+    ----------
+    Job 'Weather to ADLS' has no eligible engine
+        labels: azure, weather
+        no engine has the labels: azure
+    Job 'Orders CDC' has no eligible engine
+        labels: oracle-cdc, us-east
+        no engine has all of the labels
+    Job 'Get Weather Events' has one eligible engine
+        labels: weather, edge
+        http://sdc-edge-1:18630 (CPU load 71.0%, 14 running pipelines)
+    ----------
+    2023-03-14 13:40:09 Wrote matrix for 4812 Jobs to matrix.json
+
+'''
+
+import datetime, json, os, sys, time
+from concurrent.futures import ThreadPoolExecutor
+from streamsets.sdk import ControlHub
+
+# Get CRED_ID from the environment
+CRED_ID = os.getenv('CRED_ID')
+
+# Get CRED_TOKEN from the environment
+CRED_TOKEN = os.getenv('CRED_TOKEN')
+
+# How many Data Collectors to read the load of in parallel
+MAX_CONCURRENT_REQUESTS = 32
+
+# print_message method which writes a timestamp message ot the console
+def print_message(message):
+    print(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S") + ' ' +   message)
+
+# Method that returns, for each label, an int with bit i set if engine i has the label
+def get_label_bitsets(engine_labels):
+    bitsets = {}
+    for i, labels in enumerate(engine_labels):
+        bit = 1 << i
+        for label in labels:
+            bitsets[label] = bitsets.get(label, 0) | bit
+    return bitsets
+
+# Method that returns, for each Job's labels, the bitset of the engines that have all of them.
+# Jobs with the same labels are matched once
+def get_eligible_engines(job_labels, label_bitsets, engine_count):
+    all_engines = (1 << engine_count) - 1
+    cache = {}
+    eligible = []
+    for labels in job_labels:
+        key = frozenset(labels)
+        if key not in cache:
+            bitset = all_engines
+            for label in key:
+                bitset &= label_bitsets.get(label, 0)
+                if bitset == 0:
+                    break
+            cache[key] = bitset
+        eligible.append(cache[key])
+    return eligible
+
+# Method that returns the indexes of the bits set in a bitset
+def get_engine_indexes(bitset):
+    indexes = []
+    while bitset:
+        low_bit = bitset & -bitset
+        indexes.append(low_bit.bit_length() - 1)
+        bitset ^= low_bit
+    return indexes
+
+# Method that reads the labels and load of one engine into a dict
+def read_engine(sdc):
+    engine = {'engine_id': sdc.id, 'engine_url': sdc.engine_url,
+              'labels': list(getattr(sdc, 'labels', None) or []), 'cpu_load': None, 'running_pipelines_count': None}
+    try:
+        engine['cpu_load'] = float(sdc.cpu_load)
+        engine['running_pipelines_count'] = int(sdc.running_pipelines_count)
+    except Exception:
+        pass
+    return engine
+
+# Method that formats an engine with its load
+def format_engine(engine):
+    if engine['cpu_load'] is None:
+        return engine['engine_url'] + ' (load unknown)'
+    return '{} (CPU load {:.1f}%, {} running pipelines)'.format(
+        engine['engine_url'], engine['cpu_load'], engine['running_pipelines_count'])
+
+# Get the optional matrix file from the command line
+if len(sys.argv) > 2:
+    print('Usage: $ python3 dataops-job-engine-label-matrix.py [<matrix_file>]')
+    sys.exit(1)
+matrix_file = sys.argv[1] if len(sys.argv) == 2 else None
+
+# Connect to Control Hub
+print_message('Connecting to Control Hub')
+sch = ControlHub(
+    credential_id=CRED_ID,
+    token=CRED_TOKEN)
+
+# List the Jobs and the SDCs once
+jobs = [{'job_id': job.job_id, 'job_name': job.job_name, 'labels': list(job.data_collector_labels or [])}
+        for job in sch.jobs]
+
+# Read every SDC's labels and load in parallel
+with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
+    engines = list(executor.map(read_engine, sch.data_collectors))
+engine_labels = [engine['labels'] for engine in engines]
+all_labels = set(label for labels in engine_labels for label in labels) | set(label for job in jobs for label in job['labels'])
+print_message('Loaded {} Jobs and {} Data Collectors with {} distinct labels'.format(len(jobs), len(engines), len(all_labels)))
+
+# Match every Job against every engine
+start_time_seconds = time.time()
+label_bitsets = get_label_bitsets(engine_labels)
+eligible = get_eligible_engines([job['labels'] for job in jobs], label_bitsets, len(engines))
+print_message('Matched {} Jobs against {} Data Collectors in {:.2f} seconds'.format(
+    len(jobs), len(engines), time.time() - start_time_seconds))
+
+# Flag the Jobs with no or one eligible engine
+no_engine = [(job, bitset) for job, bitset in zip(jobs, eligible) if bitset == 0]
+one_engine = [(job, bitset) for job, bitset in zip(jobs, eligible) if bitset != 0 and bitset & (bitset - 1) == 0]
+print_message('Jobs with no eligible engine: {}; Jobs with one eligible engine: {}'.format(len(no_engine), len(one_engine)))
+
+if no_engine or one_engine:
+    print('----------')
+    for job, _ in no_engine:
+        print('Job \'' + job['job_name'] + '\' has no eligible engine')
+        print('    labels: ' + ', '.join(job['labels']))
+        missing_labels = [label for label in job['labels'] if label not in label_bitsets]
+        if missing_labels:
+            print('    no engine has the labels: ' + ', '.join(missing_labels))
+        else:
+            print('    no engine has all of the labels')
+    for job, bitset in one_engine:
+        print('Job \'' + job['job_name'] + '\' has one eligible engine')
+        print('    labels: ' + ', '.join(job['labels']))
+        print('    ' + format_engine(engines[get_engine_indexes(bitset)[0]]))
+    print('----------')
+
+# Write the full matrix
+if matrix_file is not None:
+    matrix = {'generated_at': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'engines': engines, 'jobs': []}
+    for job, bitset in zip(jobs, eligible):
+        matrix['jobs'].append({'job_id': job['job_id'], 'job_name': job['job_name'], 'labels': job['labels'],
+                               'eligible_engine_ids': [engines[i]['engine_id'] for i in get_engine_indexes(bitset)]})
+    with open(matrix_file, 'w') as file:
+        json.dump(matrix, file, indent=2)
+    print_message('Wrote matrix for ' + str(len(jobs)) + ' Jobs to ' + matrix_file)
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+
+'''
+This script launches a large number of Job Template instances on StreamSets DataOps
+Platform from a CSV file of runtime parameters
+
+The CSV file has a header row with the runtime parameter names, and one row of parameter
+values per instance. Instances are named using the value of the first column (see
+INSTANCE_NAME_PARAMETER to use another column).
+
+The file is read as a stream, CHUNK_SIZE rows at a time, and each chunk is passed to one
+sch.start_job_template call. Up to MAX_CONCURRENT_CHUNKS chunks are submitted in
+parallel, and no more than that many chunks are read ahead of the submissions, so memory
+use does not grow with the size of the file.
+
+Every instance is then tracked until it is ACTIVE or fails (see job_status_watcher.py;
+the statuses of all the instances are read together), with a deadline of
+MAX_WAIT_SECONDS_FOR_INSTANCE_TO_BECOME_ACTIVE from its submission.
+
+Progress is appended to a ledger file, one JSON record per line, keyed by the CSV row
+number. If the script is interrupted, run it again with the same ledger file to resume:
+
+ - rows that already have an instance are not submitted again; instances that did not
+   reach ACTIVE yet are tracked again
+
+ - rows whose submission failed, or that were never submitted, are submitted
+
+At the end the script prints the launch throughput: instances submitted per second and
+the time it took instances to become ACTIVE.
+
+Prerequisites:
+ - Python 3.9+
+
+ - StreamSets DataOps Platform SDK for Python v5.1+
+   See: https://docs.streamsets.com/platform-sdk/latest/learn/installation.html
+
+ - DataOps Platform API Credentials for a user with Organization Administrator role
+
+ - To avoid including API Credentials in the script, export these two environment variables
+   prior to running the script:
+
+        export CRED_ID=<your CRED_ID>>
+        export CRED_TOKEN=<your CRED_TOKEN>
+
+Usage:
+
+    $ python3 dataops-launch-job-template-instances.py <job_template_id> <parameters_csv> <ledger_file>
+
+Sample output looks like this:
+
+    $ python3 dataops-launch-job-template-instances.py 9d8c...:8030c2e9-... tables.csv tables.ledger
+    2023-03-14 09:12:01 Connecting to Control Hub
+    2023-03-14 09:12:03 Found Job Template with name 'Table Ingest'
+    2023-03-14 09:12:03 Ledger has 0 rows
+    2023-03-14 09:12:05 Submitted rows 1-100 (100 instances)
+    2023-03-14 09:12:06 Submitted rows 101-200 (100 instances)
+    ...
+    2023-03-14 09:14:40 Submitted rows 2901-2950 (50 instances)
+    2023-03-14 09:15:31 2950 instances ACTIVE, 0 failed
+    2023-03-14 09:15:31 Submitted 2950 instances in 157.2 seconds (18.8 instances/second)
+    2023-03-14 09:15:31 Seconds to ACTIVE after submission: p50 21.4, p95 48.0, max 61.7
+    2023-03-14 09:15:31 Done
+
+'''
+
+import csv, datetime, json, os, statistics, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
+from streamsets.sdk import ControlHub
+from job_status_watcher import JobStatusWatcher, JobStatusTimeout, JobStatusFailure
+
+# Get CRED_ID from the environment
+CRED_ID = os.getenv('CRED_ID')
+
+# Get CRED_TOKEN from the environment
+CRED_TOKEN = os.getenv('CRED_TOKEN')
+
+# How many instances to start with each start_job_template call
+CHUNK_SIZE = 100
+
+# How many start_job_template calls to make in parallel
+MAX_CONCURRENT_CHUNKS = 4
+
+# The parameter whose value is appended to the instance names; None for the first column
+INSTANCE_NAME_PARAMETER = None
+
+# How often to poll Control Hub for instance status, before backing off
+POLLING_FREQUENCY_SECONDS = 10
+
+# How long a submitted instance has to become ACTIVE
+MAX_WAIT_SECONDS_FOR_INSTANCE_TO_BECOME_ACTIVE = 10 * 60 # 10 minutes
+
+# Instance statuses that count as failures
+FAILED_STATUSES = ('INACTIVE_ERROR', 'ACTIVE_ERROR')
+
+# print_message method which writes a timestamp message ot the console
+def print_message(message):
+    print(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S") + ' ' +   message)
+
+def print_usage_and_exit():
+    print('Usage: $ python3 dataops-launch-job-template-instances.py <job_template_id> <parameters_csv> <ledger_file>')
+    sys.exit(1)
+
+# Method that reads the ledger and returns the latest record for each row
+def read_ledger(ledger_file):
+    records = {}
+    if os.path.exists(ledger_file):
+        with open(ledger_file) as file:
+            for line in file:
+                if line.strip():
+                    record = json.loads(line)
+                    records[record['row']] = record
+    return records
+
+# Method that appends a record to the ledger
+def write_ledger(record):
+    record['timestamp'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    with ledger_lock:
+        ledger.write(json.dumps(record) + '\n')
+        ledger.flush()
+
+# Method that yields lists of (row number, runtime parameters) for the rows to submit
+def read_chunks(parameters_csv, rows_to_skip):
+    with open(parameters_csv, newline='') as file:
+        rows = ((row_number, parameters) for row_number, parameters in enumerate(csv.DictReader(file), start=1)
+                if row_number not in rows_to_skip)
+        while True:
+            chunk = list(islice(rows, CHUNK_SIZE))
+            if len(chunk) == 0:
+                return
+            yield chunk
+
+# Method that records the outcome of a tracked instance
+def on_instance_done(row_number, job, future):
+    if future.cancelled():
+        return
+    record = {'row': row_number, 'job_id': job.job_id, 'job_name': job.job_name}
+    try:
+        result = future.result()
+        record['status'] = result.status
+        with ledger_lock:
+            seconds_to_active.append(result.elapsed_seconds)
+    except (JobStatusTimeout, JobStatusFailure) as e:
+        record['status'] = 'FAILED'
+        record['message'] = str(e)
+    write_ledger(record)
+
+# Method that tracks an instance until it is ACTIVE or fails
+def track_instance(row_number, job, deadline_seconds):
+    future = watcher.watch(job, 'ACTIVE', deadline_seconds, failure_statuses=FAILED_STATUSES)
+    future.add_done_callback(lambda future: on_instance_done(row_number, job, future))
+    return future
+
+# Method that submits one chunk of rows and starts tracking its instances
+def submit_chunk(chunk):
+    runtime_parameters = [parameters for _, parameters in chunk]
+    parameter_name = INSTANCE_NAME_PARAMETER or list(runtime_parameters[0].keys())[0]
+    try:
+        instances = sch.start_job_template(job_template,
+                                           instance_name_suffix='PARAM_VALUE',
+                                           parameter_name=parameter_name,
+                                           runtime_parameters=runtime_parameters,
+                                           attach_to_template=True,
+                                           delete_after_completion=False)
+    except Exception as e:
+        for row_number, _ in chunk:
+            write_ledger({'row': row_number, 'job_id': None, 'status': 'ERROR', 'message': str(e)})
+        return []
+
+    # The instances are returned in the order of their runtime parameters
+    futures = []
+    for (row_number, _), job in zip(chunk, instances):
+        write_ledger({'row': row_number, 'job_id': job.job_id, 'job_name': job.job_name, 'status': 'SUBMITTED'})
+        futures.append(track_instance(row_number, job, MAX_WAIT_SECONDS_FOR_INSTANCE_TO_BECOME_ACTIVE))
+    return futures
+
+# Check the command line args
+if len(sys.argv) != 4:
+    print('Error: Wrong arguments')
+    print_usage_and_exit()
+job_template_id, parameters_csv, ledger_file = sys.argv[1:]
+
+# Connect to Control Hub
+print_message('Connecting to Control Hub')
+sch = ControlHub(
+    credential_id=CRED_ID,
+    token=CRED_TOKEN)
+
+# Get the Job Template
+job_template = None
+try:
+    job_template = sch.jobs.get(job_id = job_template_id)
+except:
+    sys.exit('Error: Job Template with ID \'' + job_template_id + '\' not found.')
+
+print_message('Found Job Template with name \'' + job_template.job_name + '\'')
+
+# Read the ledger; rows that already have an instance are not submitted again
+ledger_records = read_ledger(ledger_file)
+print_message('Ledger has ' + str(len(ledger_records)) + ' rows')
+rows_with_instances = {row_number: record for row_number, record in ledger_records.items() if record.get('job_id')}
+
+ledger_lock = threading.Lock()
+ledger = open(ledger_file, 'a')
+watcher = JobStatusWatcher(sch, initial_interval_seconds=POLLING_FREQUENCY_SECONDS)
+seconds_to_active = []
+tracking_futures = []
+
+# Track the instances from a previous run that did not reach ACTIVE
+rows_to_track = {row_number: record for row_number, record in rows_with_instances.items() if record['status'] != 'ACTIVE'}
+if len(rows_to_track) > 0:
+    print_message('Tracking ' + str(len(rows_to_track)) + ' instances from a previous run')
+    jobs_by_id = {job.job_id: job for job in sch.jobs}
+    for row_number, record in rows_to_track.items():
+        if record['job_id'] in jobs_by_id:
+            tracking_futures.append(track_instance(row_number, jobs_by_id[record['job_id']],
+                                                   MAX_WAIT_SECONDS_FOR_INSTANCE_TO_BECOME_ACTIVE))
+        else:
+            write_ledger({'row': row_number, 'job_id': record['job_id'], 'job_name': record.get('job_name'),
+                          'status': 'FAILED', 'message': 'Instance not found'})
+
+# Submit the chunks in parallel, reading no more chunks than can be submitted at once
+submitted_count = 0
+start_time_seconds = time.time()
+with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_CHUNKS) as executor:
+    pending = {}
+    for chunk in read_chunks(parameters_csv, rows_with_instances):
+        if len(pending) >= MAX_CONCURRENT_CHUNKS:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                tracking_futures.extend(future.result())
+                print_message(pending.pop(future))
+        submitted_count += len(chunk)
+        pending[executor.submit(submit_chunk, chunk)] = 'Submitted rows {}-{} ({} instances)'.format(
+            chunk[0][0], chunk[-1][0], len(chunk))
+    for future in pending:
+        tracking_futures.extend(future.result())
+        print_message(pending[future])
+submit_seconds = time.time() - start_time_seconds
+
+# Wait for every instance to become ACTIVE or fail
+for future in tracking_futures:
+    try:
+        future.result()
+    except (JobStatusTimeout, JobStatusFailure):
+        pass
+watcher.stop()
+ledger.close()
+
+# Report the outcome and the throughput
+final_records = read_ledger(ledger_file)
+active_count = len([record for record in final_records.values() if record['status'] == 'ACTIVE'])
+failed_rows = sorted(row_number for row_number, record in final_records.items() if record['status'] in ('FAILED', 'ERROR'))
+print_message('{} instances ACTIVE, {} failed'.format(active_count, len(failed_rows)))
+if len(failed_rows) > 0:
+    print_message('Failed rows: ' + ', '.join(str(row_number) for row_number in failed_rows[:20])
+                  + (' ...' if len(failed_rows) > 20 else '') + '; see ' + ledger_file)
+if submitted_count > 0:
+    print_message('Submitted {} instances in {:.1f} seconds ({:.1f} instances/second)'.format(
+        submitted_count, submit_seconds, submitted_count / submit_seconds if submit_seconds > 0 else 0))
+if len(seconds_to_active) > 1:
+    quantiles = statistics.quantiles(seconds_to_active, n=20)
+    print_message('Seconds to ACTIVE after submission: p50 {:.1f}, p95 {:.1f}, max {:.1f}'.format(
+        statistics.median(seconds_to_active), quantiles[18], max(seconds_to_active)))
+print_message('Done')
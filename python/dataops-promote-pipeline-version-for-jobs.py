@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+
+'''
+This script promotes a pipeline version to every Job that runs the pipeline on
+StreamSets DataOps Platform, in rolling waves
+
+The Jobs for the pipeline are found in one pass over the Jobs, and the commit of the
+pipeline version to promote is looked up once. Jobs that already run that version are
+skipped. The other Jobs are upgraded with sch.upgrade_job in waves:
+
+ - the first wave is a canary of CANARY_COUNT Jobs
+
+ - the following waves upgrade up to MAX_CONCURRENT_UPGRADES Jobs in parallel
+
+After each wave, the Jobs of the wave that were ACTIVE before the upgrade must become
+ACTIVE again within MAX_WAIT_SECONDS_FOR_JOB_TO_BECOME_ACTIVE (see job_status_watcher.py;
+the statuses of all the Jobs of a wave are read together). Right after the upgrade a Job's
+status can still be ACTIVE from the run before it, so ACTIVE is only accepted once the
+Job's run number differs from the one before the upgrade. If any Job of a wave fails to
+upgrade or to return to ACTIVE, the script stops without upgrading the remaining Jobs.
+
+Prerequisites:
+ - Python 3.9+
+
+ - StreamSets DataOps Platform SDK for Python v5.1+
+   See: https://docs.streamsets.com/platform-sdk/latest/learn/installation.html
+
+ - DataOps Platform API Credentials for a user with Organization Administrator role
+
+ - To avoid including API Credentials in the script, export these two environment variables
+   prior to running the script:
+
+        export CRED_ID=<your CRED_ID>>
+        export CRED_TOKEN=<your CRED_TOKEN>
+
+Usage:
+
+    $ python3 dataops-promote-pipeline-version-for-jobs.py <pipeline_id> <pipeline_version>
+
+Sample output looks like this:
+
+    $ python3 dataops-promote-pipeline-version-for-jobs.py 5b4b...:8030c2e9-... 7
+    2023-03-14 10:02:11 Connecting to Control Hub
+    2023-03-14 10:02:12 Found version '7' of pipeline 'Weather Raw to Refined'
+    2023-03-14 10:02:14 Found 200 Jobs for the pipeline; 200 to upgrade, 0 already on version '7'
+    2023-03-14 10:02:14 Starting wave 1 (canary) with 1 Jobs
+    2023-03-14 10:02:29 Wave 1: 1 Jobs upgraded
+    2023-03-14 10:02:29 Starting wave 2 with 20 Jobs
+    2023-03-14 10:02:47 Wave 2: 20 Jobs upgraded
+    ...
+    2023-03-14 10:05:03 Upgraded 200 of 200 Jobs to version '7' in 169.2 seconds; 0 failed, 0 not started
+    2023-03-14 10:05:03 Done
+
+'''
+
+import datetime, os, sys, time
+from concurrent.futures import ThreadPoolExecutor
+from streamsets.sdk import ControlHub
+from job_status_watcher import JobStatusWatcher, JobStatusTimeout, JobStatusFailure
+
+# Get CRED_ID from the environment
+CRED_ID = os.getenv('CRED_ID')
+
+# Get CRED_TOKEN from the environment
+CRED_TOKEN = os.getenv('CRED_TOKEN')
+
+# How many Jobs to upgrade in the first wave
+CANARY_COUNT = 1
+
+# How many Jobs to upgrade at the same time in the following waves
+MAX_CONCURRENT_UPGRADES = 20
+
+# How often to poll Control Hub for Job status, before backing off
+POLLING_FREQUENCY_SECONDS = 5
+
+# How long an upgraded Job that was ACTIVE has to become ACTIVE again
+MAX_WAIT_SECONDS_FOR_JOB_TO_BECOME_ACTIVE = 5 * 60 # 5 minutes
+
+# Job statuses that fail an upgraded Job
+FAILURE_STATUSES = ('INACTIVE_ERROR', 'ACTIVE_ERROR')
+
+# print_message method which writes a timestamp message ot the console
+def print_message(message):
+    print(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S") + ' ' +   message)
+
+# Method that upgrades one Job to the new commit; returns None or an error message
+def upgrade_job(job):
+    try:
+        job.commit_id = new_version_of_pipeline.commit_id
+        sch.upgrade_job(job)
+        return None
+    except Exception as e:
+        return str(e)
+
+# Method that returns the run number of the Job's latest run, or None if it has never run
+def get_run_count(job):
+    history = job.history
+    return history[0].run_count if len(history) > 0 else None
+
+# Method that waits for an upgraded Job to be ACTIVE in a run that started after the upgrade
+def wait_for_new_run(job, future, run_count, deadline):
+    while True:
+        future.result()
+        if get_run_count(job) != run_count:
+            return
+        remaining_seconds = deadline - time.time()
+        if remaining_seconds <= 0:
+            raise JobStatusTimeout('Timeout waiting for Job \'{}\' to start a new run; run {} is still ACTIVE'.format(
+                job.job_name, run_count))
+        time.sleep(min(POLLING_FREQUENCY_SECONDS, remaining_seconds))
+        future = watcher.watch(job, 'ACTIVE', deadline - time.time(), failure_statuses=FAILURE_STATUSES)
+
+# Method that upgrades a wave of Jobs and waits for the ACTIVE ones to become ACTIVE
+# again; returns a list of (job, error message) for the Jobs that failed
+def upgrade_wave(wave):
+    was_active = {job.job_id: job.currentJobStatus['status'] == 'ACTIVE' for job in wave}
+    active_jobs = [job for job in wave if was_active[job.job_id]]
+    run_counts = dict(zip([job.job_id for job in active_jobs], executor.map(get_run_count, active_jobs)))
+    deadline = time.time() + MAX_WAIT_SECONDS_FOR_JOB_TO_BECOME_ACTIVE
+    failures = []
+    futures = []
+    for job, error in zip(wave, executor.map(upgrade_job, wave)):
+        if error is not None:
+            failures.append((job, error))
+        elif was_active[job.job_id]:
+            futures.append((job, watcher.watch(job, 'ACTIVE', deadline - time.time(),
+                                               failure_statuses=FAILURE_STATUSES)))
+    for job, future in futures:
+        try:
+            wait_for_new_run(job, future, run_counts[job.job_id], deadline)
+        except (JobStatusTimeout, JobStatusFailure) as e:
+            failures.append((job, str(e)))
+    return failures
+
+# Check the command line args
+if len(sys.argv) != 3:
+    print('Usage: $ python3 dataops-promote-pipeline-version-for-jobs.py <pipeline_id> <pipeline_version>')
+    sys.exit(1)
+pipeline_id, pipeline_version = sys.argv[1:]
+
+# Connect to Control Hub
+print_message('Connecting to Control Hub')
+sch = ControlHub(
+    credential_id=CRED_ID,
+    token=CRED_TOKEN)
+
+# Get the pipeline version to promote, once
+try:
+    new_version_of_pipeline = sch.pipelines.get_all(pipeline_id=pipeline_id, version=pipeline_version)[0]
+except:
+    print_message('Error: Version \'' + pipeline_version + '\' not found for pipeline \'' + pipeline_id + '\'')
+    sys.exit(-1)
+
+print_message('Found version \'' + pipeline_version + '\' of pipeline \'' + new_version_of_pipeline.name + '\'')
+
+# Find the Jobs for the pipeline in one pass
+jobs = [job for job in sch.jobs if job.pipeline_id == pipeline_id]
+jobs_to_upgrade = [job for job in jobs if job.commit_id != new_version_of_pipeline.commit_id]
+print_message('Found {} Jobs for the pipeline; {} to upgrade, {} already on version \'{}\''.format(
+    len(jobs), len(jobs_to_upgrade), len(jobs) - len(jobs_to_upgrade), pipeline_version))
+
+watcher = JobStatusWatcher(sch, initial_interval_seconds=POLLING_FREQUENCY_SECONDS)
+upgraded_count = 0
+failures = []
+wave_number = 0
+start_time_seconds = time.time()
+remaining_jobs = list(jobs_to_upgrade)
+
+# Upgrade the Jobs in a canary wave and then in parallel waves
+with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_UPGRADES) as executor:
+    while len(remaining_jobs) > 0:
+        wave_size = CANARY_COUNT if wave_number == 0 else MAX_CONCURRENT_UPGRADES
+        wave, remaining_jobs = remaining_jobs[:wave_size], remaining_jobs[wave_size:]
+        wave_number += 1
+        print_message('Starting wave {}{} with {} Jobs'.format(wave_number, ' (canary)' if wave_number == 1 else '', len(wave)))
+
+        wave_failures = upgrade_wave(wave)
+        upgraded_count += len(wave) - len(wave_failures)
+        print_message('Wave {}: {} Jobs upgraded'.format(wave_number, len(wave) - len(wave_failures)))
+        if len(wave_failures) > 0:
+            failures.extend(wave_failures)
+            for job, error in wave_failures:
+                print_message('Error: Job \'' + job.job_name + '\': ' + error)
+            print_message('Error: wave {} had {} failures; not upgrading the remaining {} Jobs'.format(
+                wave_number, len(wave_failures), len(remaining_jobs)))
+            break
+
+watcher.stop()
+print_message('Upgraded {} of {} Jobs to version \'{}\' in {:.1f} seconds; {} failed, {} not started'.format(
+    upgraded_count, len(jobs_to_upgrade), pipeline_version, time.time() - start_time_seconds,
+    len(failures), len(remaining_jobs)))
+if len(failures) > 0 or len(remaining_jobs) > 0:
+    sys.exit(-1)
+print_message('Done')
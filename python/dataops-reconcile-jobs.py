@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+
+'''
+This script reconciles Jobs on StreamSets DataOps Platform with a desired state kept in a
+JSON file, making only the API calls needed to bring the Jobs to that state
+
+The desired state file lists Jobs by name (or by ID) with the settings to enforce. Every
+setting is optional; settings that are left out are not changed:
+
+    {
+      "jobs": [
+        {
+          "job_name": "Weather to S3",
+          "labels": ["weather", "us-east"],
+          "runtime_parameters": {"BUCKET": "weather-raw", "BATCH_SIZE": 1000},
+          "number_of_instances": 2,
+          "pipeline_version": "7",
+          "status": "ACTIVE"
+        }
+      ]
+    }
+
+The current state of all Jobs is read from one listing of the Jobs, and the commit of
+each pipeline version is looked up once. The script then compares each Job with its
+desired state and plans the calls it needs:
+
+ - update: sch.update_job, if the labels, runtime parameters or number of instances differ
+
+ - upgrade: sch.upgrade_job, if the Job does not run the desired pipeline version
+
+ - stop and start: sch.stop_job and sch.start_job, if the Job's status differs from the
+   desired status, and around an update of an ACTIVE Job, as only INACTIVE Jobs can be
+   updated
+
+Jobs that are already in their desired state cost no calls. The plan is printed with the
+number of API calls it will make; with --dry-run the script stops there. Otherwise the
+Jobs are reconciled in parallel, up to MAX_CONCURRENT_JOBS at a time, waiting for stopped
+Jobs to become INACTIVE and started Jobs to become ACTIVE (see job_status_watcher.py).
+
+Prerequisites:
+ - Python 3.9+
+
+ - StreamSets DataOps Platform SDK for Python v5.1+
+   See: https://docs.streamsets.com/platform-sdk/latest/learn/installation.html
+
+ - DataOps Platform API Credentials for a user with Organization Administrator role
+
+ - To avoid including API Credentials in the script, export these two environment variables
+   prior to running the script:
+
+        export CRED_ID=<your CRED_ID>>
+        export CRED_TOKEN=<your CRED_TOKEN>
+
+Usage:
+
+    $ python3 dataops-reconcile-jobs.py <desired_state_file> [--dry-run]
+
+Sample output looks like this:
+
+    $ python3 dataops-reconcile-jobs.py jobs.json --dry-run
+    2023-03-14 11:20:41 Connecting to Control Hub
+    2023-03-14 11:20:43 Read desired state for 48 Jobs
+    2023-03-14 11:20:45 Job 'Weather to S3': stop, update (labels, number_of_instances), start
+    2023-03-14 11:20:45 Job 'Weather to ADLS': upgrade (version 6 -> 7)
+    2023-03-14 11:20:45 Job 'Get Weather Events': start
+    2023-03-14 11:20:45 Plan: 3 of 48 Jobs to change with 5 API calls (1 stop, 1 update, 1 upgrade, 2 start)
+    2023-03-14 11:20:45 Dry run; no changes made
+
+'''
+
+import datetime, json, os, sys, time
+from concurrent.futures import ThreadPoolExecutor
+from streamsets.sdk import ControlHub
+from job_status_watcher import JobStatusWatcher, JobStatusTimeout, JobStatusFailure
+
+# Get CRED_ID from the environment
+CRED_ID = os.getenv('CRED_ID')
+
+# Get CRED_TOKEN from the environment
+CRED_TOKEN = os.getenv('CRED_TOKEN')
+
+# How many Jobs to reconcile at the same time
+MAX_CONCURRENT_JOBS = 10
+
+# How often to poll Control Hub for Job status, before backing off
+POLLING_FREQUENCY_SECONDS = 5
+
+# How long a stopped Job has to become INACTIVE
+MAX_WAIT_SECONDS_FOR_JOB_TO_BECOME_INACTIVE = 5 * 60 # 5 minutes
+
+# How long a started Job has to become ACTIVE
+MAX_WAIT_SECONDS_FOR_JOB_TO_BECOME_ACTIVE = 2 * 60 # 2 minutes
+
+# The order in which a Job's calls are made
+ACTIONS = ['stop', 'update', 'upgrade', 'start']
+
+# print_message method which writes a timestamp message ot the console
+def print_message(message):
+    print(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S") + ' ' +   message)
+
+# Method that returns the commit ID of a pipeline version, looking each version up once
+def get_commit_id(pipeline_id, version):
+    key = (pipeline_id, version)
+    if key not in commit_ids:
+        try:
+            commit_ids[key] = sch.pipelines.get_all(pipeline_id=pipeline_id, version=version)[0].commit_id
+        except Exception:
+            commit_ids[key] = None
+    return commit_ids[key]
+
+# Method that returns the settings of a Job that differ from its desired state
+def get_changed_settings(job, desired):
+    changed = {}
+    if 'labels' in desired and sorted(job.data_collector_labels or []) != sorted(desired['labels']):
+        changed['labels'] = desired['labels']
+    if 'runtime_parameters' in desired and dict(job.runtime_parameters or {}) != desired['runtime_parameters']:
+        changed['runtime_parameters'] = desired['runtime_parameters']
+    if 'number_of_instances' in desired and job.number_of_instances != desired['number_of_instances']:
+        changed['number_of_instances'] = desired['number_of_instances']
+    return changed
+
+# Method that plans the calls for one Job; returns a dict with the actions to take
+def plan_job(job, desired):
+    plan = {'job': job, 'actions': [], 'settings': {}, 'commit_id': None, 'notes': []}
+    status = job.currentJobStatus['status']
+    desired_status = desired.get('status', status)
+
+    plan['settings'] = get_changed_settings(job, desired)
+    if plan['settings']:
+        plan['actions'].append('update')
+
+    if 'pipeline_version' in desired:
+        commit_id = get_commit_id(job.pipeline_id, desired['pipeline_version'])
+        if commit_id is None:
+            plan['notes'].append('version \'' + desired['pipeline_version'] + '\' not found')
+        elif commit_id != job.commit_id:
+            plan['commit_id'] = commit_id
+            plan['actions'].append('upgrade')
+            plan['notes'].append('version {} -> {}'.format(getattr(job, 'pipeline_commit_label', '?'), desired['pipeline_version']))
+
+    # Only INACTIVE Jobs can be updated, so an ACTIVE Job is stopped and started around an update
+    if status == 'ACTIVE' and (desired_status == 'INACTIVE' or 'update' in plan['actions']):
+        plan['actions'].append('stop')
+    if desired_status == 'ACTIVE' and (status != 'ACTIVE' or 'stop' in plan['actions']):
+        plan['actions'].append('start')
+    plan['actions'].sort(key=ACTIONS.index)
+    return plan
+
+# Method that formats the actions of a plan
+def format_plan(plan):
+    actions = []
+    for action in plan['actions']:
+        if action == 'update':
+            actions.append('update (' + ', '.join(plan['settings']) + ')')
+        elif action == 'upgrade':
+            actions.append('upgrade (' + plan['notes'][-1] + ')')
+        else:
+            actions.append(action)
+    return 'Job \'' + plan['job'].job_name + '\': ' + ', '.join(actions)
+
+# Method that waits for a Job to reach a status; raises an Exception if it does not
+def wait_for_job_status(job, status, deadline_seconds):
+    watcher.watch(job, status, deadline_seconds, failure_statuses=('INACTIVE_ERROR', 'ACTIVE_ERROR')).result()
+
+# Method that executes the plan for one Job; returns None or an error message
+def reconcile_job(plan):
+    job = plan['job']
+    try:
+        for action in plan['actions']:
+            if action == 'stop':
+                sch.stop_job(job)
+                wait_for_job_status(job, 'INACTIVE', MAX_WAIT_SECONDS_FOR_JOB_TO_BECOME_INACTIVE)
+            elif action == 'update':
+                if 'labels' in plan['settings']:
+                    job.data_collector_labels = plan['settings']['labels']
+                if 'runtime_parameters' in plan['settings']:
+                    job.runtime_parameters = plan['settings']['runtime_parameters']
+                if 'number_of_instances' in plan['settings']:
+                    job.number_of_instances = plan['settings']['number_of_instances']
+                sch.update_job(job)
+            elif action == 'upgrade':
+                job.commit_id = plan['commit_id']
+                sch.upgrade_job(job)
+            elif action == 'start':
+                sch.start_job(job)
+                wait_for_job_status(job, 'ACTIVE', MAX_WAIT_SECONDS_FOR_JOB_TO_BECOME_ACTIVE)
+        return None
+    except (JobStatusTimeout, JobStatusFailure) as e:
+        return str(e)
+    except Exception as e:
+        return 'Error during ' + action + ': ' + str(e)
+
+# Check the command line args
+dry_run = '--dry-run' in sys.argv[1:]
+args = [arg for arg in sys.argv[1:] if arg != '--dry-run']
+if len(args) != 1:
+    print('Usage: $ python3 dataops-reconcile-jobs.py <desired_state_file> [--dry-run]')
+    sys.exit(1)
+
+# Read the desired state
+with open(args[0]) as file:
+    desired_jobs = json.load(file)['jobs']
+
+# Connect to Control Hub
+print_message('Connecting to Control Hub')
+sch = ControlHub(
+    credential_id=CRED_ID,
+    token=CRED_TOKEN)
+
+print_message('Read desired state for ' + str(len(desired_jobs)) + ' Jobs')
+
+# Get the current state of all Jobs from one listing
+jobs_by_id = {}
+jobs_by_name = {}
+for job in sch.jobs:
+    jobs_by_id[job.job_id] = job
+    jobs_by_name.setdefault(job.job_name, []).append(job)
+
+# Plan the calls for each Job
+commit_ids = {}
+plans = []
+error_count = 0
+for desired in desired_jobs:
+    if 'job_id' in desired:
+        matches = [jobs_by_id[desired['job_id']]] if desired['job_id'] in jobs_by_id else []
+    else:
+        matches = jobs_by_name.get(desired.get('job_name'), [])
+    key = desired.get('job_id', desired.get('job_name'))
+    if len(matches) != 1:
+        error_count += 1
+        print_message('Error: {} Jobs found for \'{}\''.format(len(matches), key))
+        continue
+    plan = plan_job(matches[0], desired)
+    for note in plan['notes']:
+        if note.endswith('not found'):
+            error_count += 1
+            print_message('Error: Job \'' + plan['job'].job_name + '\': ' + note)
+    if plan['actions']:
+        plans.append(plan)
+        print_message(format_plan(plan))
+
+# Print the plan's API call count
+action_counts = {action: len([plan for plan in plans if action in plan['actions']]) for action in ACTIONS}
+print_message('Plan: {} of {} Jobs to change with {} API calls ({})'.format(
+    len(plans), len(desired_jobs), sum(action_counts.values()),
+    ', '.join('{} {}'.format(count, action) for action, count in action_counts.items())))
+
+if dry_run:
+    print_message('Dry run; no changes made')
+    sys.exit(0)
+
+# Reconcile the Jobs in parallel
+start_time_seconds = time.time()
+watcher = JobStatusWatcher(sch, initial_interval_seconds=POLLING_FREQUENCY_SECONDS)
+with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_JOBS) as executor:
+    for plan, error in zip(plans, executor.map(reconcile_job, plans)):
+        if error is not None:
+            error_count += 1
+            print_message('Error: Job \'' + plan['job'].job_name + '\': ' + error)
+watcher.stop()
+
+print_message('Reconciled {} Jobs in {:.1f} seconds; {} errors'.format(
+    len(plans), time.time() - start_time_seconds, error_count))
+if error_count > 0:
+    sys.exit(-1)
+print_message('Done')
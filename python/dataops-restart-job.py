@@ -26,7 +26,7 @@ Prerequisites:
 
 import datetime,os,sys
 from streamsets.sdk import ControlHub
-from time import sleep
+from job_status_watcher import JobStatusWatcher, JobStatusTimeout
 
 # Job to start
 JOB_ID= '<your-job-id>'
@@ -78,6 +78,9 @@ if job_status not in ('ACTIVE','INACTIVE'):
     print_message('Error: Job must have status of either \'ACTIVE\' or \'INACTIVE\' for this script to run')
     sys.exit(-1)
 
+# One watcher waits for the Job to stop and to start
+watcher = JobStatusWatcher(sch, initial_interval_seconds=POLLING_FREQUENCY_SECONDS)
+
 # Stop the Job if it is active
 if job_status == 'ACTIVE':
     print_message('Attempting to stop Job...')
@@ -86,20 +89,15 @@ if job_status == 'ACTIVE':
     except:
         print_message('Error occurred while trying to stop the Job') 
         sys.exit(-1) 
-        
-    while job_status != 'INACTIVE':
-        wait_seconds = 0
-        job.refresh()
-        job_status = job.status.status
-        print_message('Waiting for Job to become INACTIVE')
-
-        if wait_seconds > MAX_WAIT_SECONDS_FOR_JOB_TO_BECOME_INACTIVE:
-            print_message('Error: Timeout waiting for Job to become INACTIVE') 
-            sys.exit(-1) 
-        
-        sleep(POLLING_FREQUENCY_SECONDS)
-        wait_seconds += POLLING_FREQUENCY_SECONDS
-        
+
+    print_message('Waiting for Job to become INACTIVE')
+    try:
+        watcher.watch(job, 'INACTIVE', MAX_WAIT_SECONDS_FOR_JOB_TO_BECOME_INACTIVE).result()
+    except JobStatusTimeout:
+        print_message('Error: Timeout waiting for Job to become INACTIVE')
+        watcher.stop()
+        sys.exit(-1)
+
     print_message('Job status is INACTIVE')
 
 ## Set the Job's Runtime Parameters
@@ -112,17 +110,15 @@ print_message('Starting Job...')
 sch.start_job(job)
 
 ## Wait for the Job to become Active
-job.refresh()  
-wait_seconds = 0
-while job.status.status != 'ACTIVE':
-    job.refresh()
-    print_message('Waiting for Job to become ACTIVE...')
-    sleep(POLLING_FREQUENCY_SECONDS)
-    wait_seconds += POLLING_FREQUENCY_SECONDS
-    if wait_seconds > MAX_WAIT_SECONDS_FOR_JOB_TO_BEOME_ACTIVE:
-        # Exit if Job did not become ACTIVE within the specified time
-        print_message('Error: Timeout waiting for Job to become ACTIVE')
-        sys.exit(-1) 
+print_message('Waiting for Job to become ACTIVE...')
+try:
+    watcher.watch(job, 'ACTIVE', MAX_WAIT_SECONDS_FOR_JOB_TO_BECOME_ACTIVE).result()
+except JobStatusTimeout:
+    # Exit if Job did not become ACTIVE within the specified time
+    print_message('Error: Timeout waiting for Job to become ACTIVE')
+    sys.exit(-1)
+finally:
+    watcher.stop()
 
 print_message('Job status is ACTIVE')
 print_message('Done')
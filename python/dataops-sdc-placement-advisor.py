@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+
+'''
+This script proposes Job moves between Data Collectors that reduce the load of the
+busiest Data Collectors on StreamSets DataOps Platform
+
+The script works in two steps so that the advice can be produced, reviewed and tested
+offline, without a live Organization:
+
+ 1) Capture a snapshot of the fleet from Control Hub:
+
+        $ python3 dataops-sdc-placement-advisor.py --capture <snapshot_file>
+
+    The snapshot records each engine's labels, CPU load, memory used and running
+    pipelines, and for each running Job its Data Collector labels and the input
+    record count of its current run from the Job's metrics history. The engines are
+    read in parallel. Running pipelines are mapped to the IDs of the Jobs that run
+    them by the JOB_ID parameter of the pipelines on each engine (see
+    sdc_pipeline_index.py), so Jobs are identified by ID rather than by name.
+
+ 2) Compute the advice from the snapshot:
+
+        $ python3 dataops-sdc-placement-advisor.py <snapshot_file> [<advice_file>]
+
+    The CPU load and memory used of each engine are apportioned to its running Jobs in
+    proportion to each Job's input record count (evenly if no counts are known) to
+    estimate the resources of each Job. A greedy rebalancing then repeatedly takes the
+    most loaded engine and moves the Job whose move to an eligible engine
+    lowers the higher of the two engines' loads the most, until no move lowers the peak
+    load or MAX_MOVES is reached. An engine is eligible for a Job if the engine has all
+    of the Job's labels; engines with no capacity left for more pipelines are skipped.
+
+    The load of an engine is the larger of its CPU load as a fraction of its max CPU
+    load (100% if none is set) and its memory used as a fraction of MEMORY_CAPACITY_MB
+    (if set).
+
+    Each proposed move is a restart of the Job: Control Hub places a restarted Job on
+    the least loaded engine that has the Job's labels. If the Job's labels also match
+    other engines, the advice suggests adding a label that only the target engine has,
+    so the restart lands on the target.
+
+Running pipelines that don't belong to a running Job count towards their engine's load
+but are never moved. A Job is never moved to an engine that already runs an instance of it.
+
+Prerequisites:
+ - Python 3.9+
+
+ - StreamSets DataOps Platform SDK for Python v5.1+ (only to capture a snapshot)
+   See: https://docs.streamsets.com/platform-sdk/latest/learn/installation.html
+
+ - DataOps Platform API Credentials for a user with Organization Administrator role
+
+ - To avoid including API Credentials in the script, export these two environment variables
+   prior to running the script:
+
+        export CRED_ID=<your CRED_ID>>
+        export CRED_TOKEN=<your CRED_TOKEN>
+
+Sample output looks like this:
+
+    $ python3 dataops-sdc-placement-advisor.py snapshot.json
+    2023-03-13 22:10:02 Loaded snapshot with 3 engines and 9 running Jobs
+    2023-03-13 22:10:02 Peak engine load before: 91.0% (http://sdc-1:18630)
+    2023-03-13 22:10:02 Move 'Weather to ADLS' from http://sdc-1:18630 to http://sdc-2:18630 (est. CPU 22.8%, memory 812.0 MB): restart the Job after adding the label 'sdc-2'
+    2023-03-13 22:10:02 Move 'Weather to S3' from http://sdc-1:18630 to http://sdc-3:18630 (est. CPU 22.8%, memory 812.0 MB): restart the Job after adding the label 'edge'
+    2023-03-13 22:10:02 Peak engine load after: 45.5% (http://sdc-1:18630) with 2 moves
+
+'''
+
+import datetime, json, os, sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Get CRED_ID from the environment
+CRED_ID = os.getenv('CRED_ID')
+
+# Get CRED_TOKEN from the environment
+CRED_TOKEN = os.getenv('CRED_TOKEN')
+
+# How many Data Collectors and Jobs to read in parallel when capturing a snapshot
+MAX_CONCURRENT_REQUESTS = 32
+
+# The most moves to propose
+MAX_MOVES = 20
+
+# The memory available to each engine, in MB; set to None to balance on CPU load only
+MEMORY_CAPACITY_MB = None
+
+# print_message method which writes a timestamp message ot the console
+def print_message(message):
+    print(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S") + ' ' +   message)
+
+def print_usage_and_exit():
+    print('Usage: $ python3 dataops-sdc-placement-advisor.py --capture <snapshot_file>')
+    print('Usage: $ python3 dataops-sdc-placement-advisor.py <snapshot_file> [<advice_file>]')
+    sys.exit(1)
+
+
+# Method that reads one engine for the snapshot
+def capture_engine(sdc):
+    engine = {}
+    engine['engine_id'] = sdc.id
+    engine['engine_url'] = sdc.engine_url
+    engine['labels'] = list(sdc.labels or [])
+    engine['cpu_load'] = float(sdc.cpu_load)
+    engine['memory_used_mb'] = float(sdc.memory_used_mb)
+    engine['running_pipelines'] = [p.get('pipeline') for p in (sdc.running_pipelines or [])]
+    engine['max_cpu_load'] = getattr(sdc, 'max_cpu_load', None)
+    engine['max_pipelines_running'] = getattr(sdc, 'max_pipelines_running', None)
+    return engine
+
+# Method that reads one running Job for the snapshot
+def capture_job(job):
+    input_count = None
+    try:
+        input_count = job.metrics[0].input_count
+    except Exception:
+        pass
+    return job.job_id, {'job_name': job.job_name, 'labels': list(job.data_collector_labels or []), 'input_count': input_count}
+
+# Method that finds the Jobs running on an engine. Control Hub reports the titles of an
+# engine's running pipelines; the pipelines on the engine carry the ID of the Job that
+# runs them in their JOB_ID parameter. Running pipelines that don't belong to a running
+# Job are returned separately
+def get_running_jobs(engine, index_entries, running_job_ids):
+    job_ids_by_title = {}
+    for entry in index_entries:
+        job_ids_by_title.setdefault(entry.pipeline.title, []).append(entry.pipeline.parameters['JOB_ID'])
+    running_jobs = []
+    other_pipelines = []
+    for title in engine['running_pipelines']:
+        job_ids = [job_id for job_id in job_ids_by_title.get(title, [])
+                   if job_id in running_job_ids and job_id not in running_jobs]
+        if job_ids:
+            running_jobs.append(job_ids[0])
+        else:
+            other_pipelines.append(title)
+    return running_jobs, other_pipelines
+
+# Method that captures a snapshot of the fleet from Control Hub
+def capture_snapshot():
+    from streamsets.sdk import ControlHub
+    from sdc_pipeline_index import SdcPipelineIndex
+
+    print_message('Connecting to Control Hub')
+    sch = ControlHub(
+        credential_id=CRED_ID,
+        token=CRED_TOKEN)
+
+    sdcs = list(sch.data_collectors)
+    active_jobs = [job for job in sch.jobs if job.currentJobStatus['status'] == 'ACTIVE']
+    print_message('Capturing ' + str(len(sdcs)) + ' engines and ' + str(len(active_jobs)) + ' running Jobs')
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS) as executor:
+        engines = list(executor.map(capture_engine, sdcs))
+        jobs = dict(executor.map(capture_job, active_jobs))
+
+    # Map each engine's running pipelines to the Jobs that run them
+    index = SdcPipelineIndex(sch, max_concurrent_requests=MAX_CONCURRENT_REQUESTS)
+    index.refresh()
+    for engine in engines:
+        engine['running_jobs'], engine['other_pipelines'] = get_running_jobs(
+            engine, index.engine_entries.get(engine['engine_id'], []), jobs)
+
+    snapshot = {}
+    snapshot['captured_at'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    snapshot['engines'] = engines
+    snapshot['jobs'] = jobs
+    return snapshot
+
+
+# Method that returns the load of an engine from its estimated CPU load and memory used
+def get_engine_load(engine, cpu_load, memory_used_mb):
+    load = cpu_load / (engine.get('max_cpu_load') or 100.0)
+    if MEMORY_CAPACITY_MB:
+        load = max(load, memory_used_mb / MEMORY_CAPACITY_MB)
+    return load
+
+# Method that returns what runs on an engine: the IDs of its running Jobs, and a
+# 'pipeline:<title>' item for each running pipeline that doesn't belong to a Job
+def get_engine_items(engine):
+    return list(engine.get('running_jobs') or []) + ['pipeline:' + title for title in engine.get('other_pipelines') or []]
+
+# Method that estimates the CPU load and memory used of everything running on each engine,
+# keyed by (engine URL, item), by apportioning each engine's usage to its Jobs by their
+# input record counts. A Job running on several engines is counted evenly on each
+def estimate_job_resources(snapshot):
+    jobs = snapshot.get('jobs', {})
+    instances = {}
+    for engine in snapshot['engines']:
+        for job_id in engine.get('running_jobs') or []:
+            instances[job_id] = instances.get(job_id, 0) + 1
+    estimates = {}
+    for engine in snapshot['engines']:
+        if engine.get('error'):
+            continue
+        items = get_engine_items(engine)
+        counts = [(jobs.get(item) or {}).get('input_count') for item in items]
+        if any(count is None for count in counts) or sum(counts) == 0:
+            weights = [1.0 / len(items)] * len(items) if items else []
+        else:
+            counts = [count / instances[item] for item, count in zip(items, counts)]
+            weights = [count / sum(counts) for count in counts]
+        for item, weight in zip(items, weights):
+            estimates[(engine['engine_url'], item)] = {
+                'cpu_load': engine['cpu_load'] * weight,
+                'memory_used_mb': engine['memory_used_mb'] * weight}
+    return estimates
+
+# Method that computes the proposed moves for a snapshot. Returns the moves and the
+# peak load (and engine URL) before and after the moves.
+def compute_moves(snapshot):
+    jobs = snapshot.get('jobs', {})
+    engines = {engine['engine_url']: engine for engine in snapshot['engines'] if not engine.get('error')}
+    estimates = estimate_job_resources(snapshot)
+
+    # The current placement and usage of each engine
+    placement = {url: get_engine_items(engine) for url, engine in engines.items()}
+    cpu = {url: engine['cpu_load'] for url, engine in engines.items()}
+    memory = {url: engine['memory_used_mb'] for url, engine in engines.items()}
+    labels = {url: set(engine.get('labels') or []) for url, engine in engines.items()}
+
+    def load(url):
+        return get_engine_load(engines[url], cpu[url], memory[url])
+
+    def peak():
+        url = max(engines, key=load)
+        return load(url), url
+
+    def has_room(url):
+        limit = engines[url].get('max_pipelines_running')
+        return not limit or len(placement[url]) < limit
+
+    before = peak()
+    moves = []
+    while len(moves) < MAX_MOVES and len(engines) > 1:
+        peak_load, source = peak()
+        best = None
+        for job_id in placement[source]:
+            # Only Jobs can be moved, and only with their labels known
+            if job_id not in jobs:
+                continue
+            estimate = estimates[(source, job_id)]
+            job_labels = set(jobs[job_id].get('labels') or [])
+            for target in engines:
+                # An engine that already runs an instance of the Job can't take another
+                if (target == source or job_id in placement[target]
+                        or not job_labels <= labels[target] or not has_room(target)):
+                    continue
+                new_source = get_engine_load(engines[source], cpu[source] - estimate['cpu_load'], memory[source] - estimate['memory_used_mb'])
+                new_target = get_engine_load(engines[target], cpu[target] + estimate['cpu_load'], memory[target] + estimate['memory_used_mb'])
+                worst = max(new_source, new_target)
+                if worst < peak_load - 1e-9 and (best is None or worst < best[0]):
+                    best = (worst, job_id, target, estimate, job_labels)
+        if best is None:
+            break
+
+        _, job_id, target, estimate, job_labels = best
+        placement[source].remove(job_id)
+        placement[target].append(job_id)
+        cpu[source] -= estimate['cpu_load']
+        cpu[target] += estimate['cpu_load']
+        memory[source] -= estimate['memory_used_mb']
+        memory[target] += estimate['memory_used_mb']
+        estimates[(target, job_id)] = estimates.pop((source, job_id))
+
+        # A restart lands on the target only if no other engine has all of the Job's labels
+        other_matches = [url for url in engines if url != target and job_labels <= labels[url]]
+        unique_labels = sorted(labels[target] - set().union(*(labels[url] for url in other_matches)))
+        move = {'job_name': jobs[job_id].get('job_name'), 'job_id': job_id,
+                'from': source, 'to': target,
+                'estimated_cpu_load': round(estimate['cpu_load'], 2),
+                'estimated_memory_used_mb': round(estimate['memory_used_mb'], 2)}
+        if len(other_matches) == 0:
+            move['action'] = 'restart'
+        elif len(unique_labels) > 0:
+            move['action'] = 'add_label_and_restart'
+            move['label'] = unique_labels[0]
+        else:
+            move['action'] = 'restart'
+            move['note'] = 'other engines also match the Job\'s labels; Control Hub may place the Job elsewhere'
+        moves.append(move)
+
+    return moves, before, peak()
+
+# Method that formats a move for the console
+def format_move(move):
+    message = 'Move \'{}\' from {} to {} (est. CPU {:.1f}%, memory {:.1f} MB): '.format(
+        move['job_name'], move['from'], move['to'], move['estimated_cpu_load'], move['estimated_memory_used_mb'])
+    if move['action'] == 'add_label_and_restart':
+        return message + 'restart the Job after adding the label \'{}\''.format(move['label'])
+    if 'note' in move:
+        return message + 'restart the Job ({})'.format(move['note'])
+    return message + 'restart the Job'
+
+
+# Check the command line args
+if len(sys.argv) == 3 and sys.argv[1] == '--capture':
+    snapshot = capture_snapshot()
+    with open(sys.argv[2], 'w') as file:
+        json.dump(snapshot, file, indent=2)
+    print_message('Wrote snapshot to ' + sys.argv[2])
+    sys.exit(0)
+
+if len(sys.argv) not in (2, 3) or sys.argv[1].startswith('--'):
+    print('Error: Wrong arguments')
+    print_usage_and_exit()
+
+# Load the snapshot
+with open(sys.argv[1]) as file:
+    snapshot = json.load(file)
+running_jobs = len(set(job_id for engine in snapshot['engines'] for job_id in engine.get('running_jobs') or []))
+print_message('Loaded snapshot with {} engines and {} running Jobs'.format(len(snapshot['engines']), running_jobs))
+if len(snapshot['engines']) == 0:
+    print_message('Error: the snapshot has no engines')
+    sys.exit(1)
+
+moves, before, after = compute_moves(snapshot)
+
+print_message('Peak engine load before: {:.1f}% ({})'.format(before[0] * 100, before[1]))
+for move in moves:
+    print_message(format_move(move))
+print_message('Peak engine load after: {:.1f}% ({}) with {} moves'.format(after[0] * 100, after[1], len(moves)))
+
+# Write the advice as JSON if requested
+if len(sys.argv) == 3:
+    advice = {'peak_load_before': round(before[0], 4), 'peak_engine_before': before[1],
+              'peak_load_after': round(after[0], 4), 'peak_engine_after': after[1], 'moves': moves}
+    with open(sys.argv[2], 'w') as file:
+        json.dump(advice, file, indent=2)
+    print_message('Wrote advice to ' + sys.argv[2])
@@ -26,6 +26,7 @@ Prerequisites:
 
 import datetime,os,sys
 from streamsets.sdk import ControlHub
+from job_status_watcher import JobStatusWatcher, JobStatusTimeout
 
 # Job to start
 JOB_ID= '<your-job-id>'
@@ -43,7 +44,7 @@ CRED_TOKEN = os.getenv('CRED_TOKEN')
 POLLING_FREQUENCY_SECONDS = 10
 
 # How long to wait for a started Job to become active
-MAX_WAIT_SECONDS_FOR_JOB_TO_BEOME_ACTIVE = 120
+MAX_WAIT_SECONDS_FOR_JOB_TO_BECOME_ACTIVE = 120
 
 # print_message method which writes a timestamp message ot the console
 def print_message(message):
@@ -81,20 +82,19 @@ sch.update_job(job)
 
 ## Start the Job
 print_message('Starting Job...')
+watcher = JobStatusWatcher(sch, initial_interval_seconds=POLLING_FREQUENCY_SECONDS)
 sch.start_job(job)
 
 ## Wait for the Job to become Active
-job.refresh()  
-wait_seconds = 0
-while job.status.status != 'ACTIVE':
-    job.refresh()
-    print_message('Waiting for Job to become ACTIVE...')
-    sleep(POLLING_FREQUENCY_SECONDS)
-    wait_seconds += POLLING_FREQUENCY_SECONDS
-    if wait_seconds > MAX_WAIT_SECONDS_FOR_JOB_TO_BEOME_ACTIVE:
-        # Exit if Job did not become ACTIVE within the specified time
-        print_message('Error: Timeout waiting for Job to become ACTIVE')
-        sys.exit(-1) 
+print_message('Waiting for Job to become ACTIVE...')
+try:
+    watcher.watch(job, 'ACTIVE', MAX_WAIT_SECONDS_FOR_JOB_TO_BECOME_ACTIVE).result()
+except JobStatusTimeout:
+    # Exit if Job did not become ACTIVE within the specified time
+    print_message('Error: Timeout waiting for Job to become ACTIVE')
+    sys.exit(-1)
+finally:
+    watcher.stop()
 
 print_message('Job status is ACTIVE')
 print_message('Done')
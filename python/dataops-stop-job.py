@@ -24,6 +24,7 @@ Prerequisites:
 
 import datetime,os,sys
 from streamsets.sdk import ControlHub
+from job_status_watcher import JobStatusWatcher, JobStatusTimeout
 
 # Job to start
 JOB_ID= '<your-job-id>'
@@ -38,7 +39,7 @@ CRED_TOKEN = os.getenv('CRED_TOKEN')
 POLLING_FREQUENCY_SECONDS = 10
 
 # How long to wait for a stopped Job to become inactive
-MAX_WAIT_SECONDS_FOR_JOB_TO_BEOME_INACTIVE = 5 * 60 # Five minutes
+MAX_WAIT_SECONDS_FOR_JOB_TO_BECOME_INACTIVE = 5 * 60 # Five minutes
 
 # print_message method which writes a timestamp message ot the console
 def print_message(message):
@@ -71,20 +72,19 @@ if job_status != 'ACTIVE':
 
 ## Stop the Job
 print_message('Stopping Job...')
+watcher = JobStatusWatcher(sch, initial_interval_seconds=POLLING_FREQUENCY_SECONDS)
 sch.stop_job(job)
 
 ## Wait for the Job to become inactive
-job.refresh()  
-wait_seconds = 0
-while job.status.status != 'INACTIVE':
-    job.refresh()
-    print_message('Waiting for Job to become INACTIVE...')
-    sleep(POLLING_FREQUENCY_SECONDS)
-    wait_seconds += POLLING_FREQUENCY_SECONDS
-    if wait_seconds > MAX_WAIT_SECONDS_FOR_JOB_TO_BEOME_INACTIVE:
-        # Exit if Job did not become ACTIVE within the specified time
-        print_message('Error: Timeout waiting for Job to become INACTIVE')
-        sys.exit(-1) 
+print_message('Waiting for Job to become INACTIVE...')
+try:
+    watcher.watch(job, 'INACTIVE', MAX_WAIT_SECONDS_FOR_JOB_TO_BECOME_INACTIVE).result()
+except JobStatusTimeout:
+    # Exit if Job did not become INACTIVE within the specified time
+    print_message('Error: Timeout waiting for Job to become INACTIVE')
+    sys.exit(-1)
+finally:
+    watcher.stop()
 
 print_message('Job status is INACTIVE')
 print_message('Done')
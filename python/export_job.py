@@ -3,15 +3,33 @@
 """
 FILE: export_job.py
 
-DESCRIPTION: A script to export a StreamSets Job
+DESCRIPTION: A script to export one or more StreamSets Jobs
 
-ARGS:  job_id
+ARGS:  job_ids (a Job ID, or a comma-separated list of Job IDs)
+           or --selector <selector> (a label selector; see label_selector.py)
        export_dir
+       --combined <archive_name> (optional)
 
-USAGE: $ python3 export_job.py <job_id> <export-dir>
+USAGE: $ python3 export_job.py <job_id>[,<job_id>...] <export-dir> [--combined <archive_name>]
+       $ python3 export_job.py --selector <selector> <export-dir> [--combined <archive_name>]
 
 EXAMPLE USAGE: $ python3 export_job.py 12ba1a0f-997c-4a8b-954c-66ab6be2a565:8030c2e9-1a39-11ec-a5fe-97c8d4369386 /Users/mark/data/jobs
+               $ python3 export_job.py --selector 'env=prod,!canary' /Users/mark/data/jobs --combined prod_jobs
 
+- Up to DIRECT_LOOKUP_MAX Job IDs are looked up directly by ID; more Job IDs, or a
+  selector, are resolved from one listing of the Jobs.
+
+- The Jobs are exported in batches of up to EXPORT_BATCH_SIZE Jobs per sch.export_jobs
+  call, with up to MAX_CONCURRENT_EXPORTS batches in parallel. By default each batch
+  archive is split into a zip file per Job: each entry goes to the Job whose ID it
+  contains, and an entry with a JSON list of several Jobs is split by item. If a batch
+  archive can't be split that way, the Jobs of the batch are exported one at a time.
+
+- With --combined, the batches are written to one archive, <archive_name>.zip, which can
+  be imported with import_job.py. Entries with the same name in several batches are
+  written once if they are the same, and merged if they are JSON lists; any other
+  collision is an error, rather than an entry silently left out. If a batch fails to
+  export, its Jobs are reported and the archive is not written.
 
 PREREQUISITES:
 
@@ -36,13 +54,34 @@ PREREQUISITES:
           Connecting to Control Hub
           Found Job 'Job for Weather to Snowflake'
           Exported the file '/Users/mark/data/jobs/Job_for_Weather_to_Snowflake.zip'
+          Exported 1 Jobs with 1 export calls
+          Done
+
+        $ python3 export_job.py --selector 'env=prod,!canary' '/Users/mark/data/jobs' --combined prod_jobs
+          Connecting to Control Hub
+          Found 240 Jobs
+          Exported 240 Jobs in 3 batches to the file '/Users/mark/data/jobs/prod_jobs.zip'
           Done
 """
 
+import io
+import json
 import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from streamsets.sdk import ControlHub
+from label_selector import LabelInventory
 import sys
 
+# Up to this many Job IDs are looked up directly rather than from a listing of the Jobs
+DIRECT_LOOKUP_MAX = 10
+
+# How many Jobs to export per sch.export_jobs call
+EXPORT_BATCH_SIZE = 50
+
+# How many sch.export_jobs calls to make in parallel
+MAX_CONCURRENT_EXPORTS = 8
+
 # mkdir method
 def mkdir(the_dir):
     if not os.path.exists(the_dir):
@@ -62,15 +101,174 @@ def export_resource(export_dir, resource_name, data):
         print('Exported the file \'{}\''.format(file_name))
 
 
-# Check the number of command line args
-if len(sys.argv) != 3:
+# Method that returns the Jobs for a list of Job IDs
+def get_jobs_by_id(job_ids):
+    jobs = []
+    if len(job_ids) <= DIRECT_LOOKUP_MAX:
+        for job_id in job_ids:
+            try:
+                jobs.append(sch.jobs.get(job_id=job_id))
+            except Exception:
+                print('Error: could not find Job for job_id: \'{}\''.format(job_id))
+        return jobs
+
+    jobs_by_id = {job.job_id: job for job in sch.jobs}
+    for job_id in job_ids:
+        if job_id in jobs_by_id:
+            jobs.append(jobs_by_id[job_id])
+        else:
+            print('Error: could not find Job for job_id: \'{}\''.format(job_id))
+    return jobs
+
+
+# Method that writes a list of (zip info, data) entries to a zip archive
+def write_archive(entries):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for info, data in entries:
+            archive.writestr(info, data)
+    return buffer.getvalue()
+
+
+# Method that returns the JSON list in an entry, or None if the entry is not a JSON list
+def read_json_list(data):
+    try:
+        items = json.loads(data)
+    except ValueError:
+        return None
+    return items if isinstance(items, list) else None
+
+
+# Method that merges the zip archives of several export_jobs calls into one archive.
+# Raises ValueError for entries with the same name and different contents that can't be merged
+def merge_archives(archives):
+    if len(archives) == 1:
+        return archives[0]
+    entries = {}
+    collisions = []
+    for archive in archives:
+        with zipfile.ZipFile(io.BytesIO(archive)) as batch:
+            for info in batch.infolist():
+                data = batch.read(info.filename)
+                if info.filename not in entries:
+                    entries[info.filename] = (info, data)
+                    continue
+                merged_info, merged_data = entries[info.filename]
+                if data == merged_data:
+                    continue
+                merged_items, items = read_json_list(merged_data), read_json_list(data)
+                if merged_items is None or items is None:
+                    collisions.append(info.filename)
+                else:
+                    entries[info.filename] = (merged_info, json.dumps(merged_items + items).encode('utf-8'))
+    if collisions:
+        raise ValueError('entries with the same name and different contents in several batches: ' +
+                         ', '.join('\'{}\''.format(name) for name in sorted(set(collisions))))
+    return write_archive(entries.values())
+
+
+# Method that splits the archive of an export_jobs call into an archive per Job; returns a
+# dict of Job ID to archive, or None if an entry can't be assigned to exactly one Job
+def split_archive(archive, jobs):
+    entries_by_job_id = {job.job_id: [] for job in jobs}
+    with zipfile.ZipFile(io.BytesIO(archive)) as batch:
+        for info in batch.infolist():
+            data = batch.read(info.filename)
+            text = info.filename + data.decode('utf-8', errors='replace')
+            job_ids = [job_id for job_id in entries_by_job_id if job_id in text]
+            if len(job_ids) == 1:
+                entries_by_job_id[job_ids[0]].append((info, data))
+                continue
+
+            # An entry with several Jobs must be a JSON list with one Job per item
+            items = read_json_list(data) if len(job_ids) > 1 else None
+            if items is None:
+                return None
+            items_by_job_id = {}
+            for item in items:
+                item_job_ids = [job_id for job_id in job_ids if job_id in json.dumps(item)]
+                if len(item_job_ids) != 1:
+                    return None
+                items_by_job_id.setdefault(item_job_ids[0], []).append(item)
+            for job_id, job_items in items_by_job_id.items():
+                entries_by_job_id[job_id].append((info, json.dumps(job_items).encode('utf-8')))
+    if any(len(entries) == 0 for entries in entries_by_job_id.values()):
+        return None
+    return {job_id: write_archive(entries) for job_id, entries in entries_by_job_id.items()}
+
+
+# Method that returns a file name for each Job, adding the Job ID to duplicate Job names
+def get_resource_names(jobs):
+    name_counts = {}
+    for job in jobs:
+        name_counts[job.job_name] = name_counts.get(job.job_name, 0) + 1
+    return [job.job_name if name_counts[job.job_name] == 1 else job.job_name + '_' + job.job_id.split(':')[0]
+            for job in jobs]
+
+
+# Method that exports a batch of Jobs for a combined archive; returns (archive, None) or (None, error message)
+def export_combined_batch(jobs):
+    try:
+        return sch.export_jobs(jobs), None
+    except Exception as e:
+        return None, str(e)
+
+
+# Method that exports one Job to its own zip file; returns the number of export calls made
+def export_one_job(job, resource_name):
+    try:
+        export_resource(output_dir, resource_name, sch.export_jobs([job]))
+    except Exception as e:
+        print('Error exporting Job \'{}\': {}'.format(job.job_name, str(e)))
+    return 1
+
+
+# Method that exports a batch of Jobs and writes a zip file per Job; returns the number of
+# export calls made
+def export_batch(jobs_and_names):
+    jobs = [job for job, _ in jobs_and_names]
+    try:
+        archives = split_archive(sch.export_jobs(jobs), jobs)
+    except Exception as e:
+        print('Error exporting a batch of {} Jobs: {}; exporting them one at a time'.format(len(jobs), str(e)))
+        archives = None
+    if archives is None:
+        return 1 + sum(export_one_job(job, resource_name) for job, resource_name in jobs_and_names)
+    for job, resource_name in jobs_and_names:
+        export_resource(output_dir, resource_name, archives[job.job_id])
+    return 1
+
+
+# Check the command line args
+args = sys.argv[1:]
+archive_name = None
+if '--combined' in args:
+    index = args.index('--combined')
+    if index + 1 >= len(args):
+        args = []
+    else:
+        archive_name = args[index + 1]
+        args = args[:index] + args[index + 2:]
+selector = None
+if len(args) > 0 and args[0] == '--selector':
+    if len(args) == 3 and not args[1].startswith('--'):
+        selector = args[1]
+        args = args[2:]
+    else:
+        args = []
+elif len(args) == 2 and not args[0].startswith('--'):
+    job_ids = [job_id.strip() for job_id in args[0].split(',') if job_id.strip()]
+    args = args[1:]
+else:
+    args = []
+if len(args) != 1 or args[0].startswith('--'):
     print('Error: Wrong number of arguments')
-    print('Usage: $ python3 export_job.py <job_id> <export-dir>')
+    print('Usage: $ python3 export_job.py <job_id>[,<job_id>...] <export-dir> [--combined <archive_name>]')
+    print('Usage: $ python3 export_job.py --selector <selector> <export-dir> [--combined <archive_name>]')
     sys.exit(1)
 
 # Get command line args
-job_id = sys.argv[1]
-output_dir = sys.argv[2]
+output_dir = args[0]
 
 # Get Control Hub Credentials from the environment
 cred_id = os.getenv('CRED_ID')
@@ -89,21 +287,52 @@ except Exception as e:
 # Make the output dir
 mkdir(output_dir)
 
-# Get the Job
-the_job = None
-for job in sch.jobs:
-    if job.job_id == job_id:
-        the_job = job
-        break
-
-if the_job is not None:
-    print('Found Job \'{}\''.format(the_job.job_name))
+# Get the Jobs
+if selector is not None:
+    inventory = LabelInventory.from_jobs(sch.jobs)
+    jobs = [inventory.get(job_id) for job_id in sorted(inventory.select(selector))]
 else:
-    print('Error: could not find Job for job_id: \'{}\''.format(job_id))
+    jobs = get_jobs_by_id(job_ids)
+
+if len(jobs) == 0:
+    print('Error: no Jobs to export')
     sys.exit(1)
+elif len(jobs) == 1:
+    print('Found Job \'{}\''.format(jobs[0].job_name))
+else:
+    print('Found {} Jobs'.format(len(jobs)))
 
-# Export the Job
-data = sch.export_jobs([the_job])
-export_resource(output_dir, the_job.job_name, data)
+# Export the Jobs
+if archive_name is not None:
+    batches = [jobs[i:i + EXPORT_BATCH_SIZE] for i in range(0, len(jobs), EXPORT_BATCH_SIZE)]
+    archives = []
+    failed_jobs = []
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_EXPORTS) as executor:
+        for batch, (archive, error) in zip(batches, executor.map(export_combined_batch, batches)):
+            if error is None:
+                archives.append(archive)
+                continue
+            failed_jobs.extend(batch)
+            print('Error exporting a batch of {} Jobs: {}'.format(len(batch), error))
+            for job in batch:
+                print('Error: Job \'{}\' ({}) was not exported'.format(job.job_name, job.job_id))
+    if failed_jobs:
+        print('Error: {} of {} Jobs could not be exported; the archive was not written'.format(len(failed_jobs), len(jobs)))
+        sys.exit(1)
+    try:
+        data = merge_archives(archives)
+    except ValueError as e:
+        print('Error: could not combine the batches: {}'.format(str(e)))
+        sys.exit(1)
+    file_name = output_dir + '/' + archive_name + '.zip'
+    with open(file_name, 'wb') as file:
+        file.write(data)
+    print('Exported {} Jobs in {} batches to the file \'{}\''.format(len(jobs), len(batches), file_name))
+else:
+    jobs_and_names = list(zip(jobs, get_resource_names(jobs)))
+    batches = [jobs_and_names[i:i + EXPORT_BATCH_SIZE] for i in range(0, len(jobs_and_names), EXPORT_BATCH_SIZE)]
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_EXPORTS) as executor:
+        export_calls = sum(executor.map(export_batch, batches))
+    print('Exported {} Jobs with {} export calls'.format(len(jobs), export_calls))
 
-print('Done')
\ No newline at end of file
+print('Done')
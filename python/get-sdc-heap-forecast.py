@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+
+'''
+This script forecasts JVM heap exhaustion for every Data Collector registered with
+StreamSets Platform and writes a time-to-exhaustion metric per Data Collector to a
+rolling log file, with a user definable refresh interval.
+
+On each poll cycle the script reads the JMX metrics of every Data Collector in parallel
+and records the heap usage left behind by the most recent garbage collection (the
+"post-GC low") of each tenured memory pool. A rolling regression is then fitted over the
+most recent samples for all Data Collectors at once, as a single set of numpy array
+operations, and the fitted trend is extrapolated to the maximum heap size. A steadily
+rising post-GC low is the classic signature of a leak that will end in an OutOfMemoryError
+hours later; a sawtooth that returns to the same low after each GC is healthy and reports
+no exhaustion time.
+
+If a JVM does not expose post-GC pool usage, the current heap usage is used instead.
+The default Theil-Sen regression is robust to the resulting GC spikes.
+
+Prerequisites:
+
+ - Python 3.9+
+
+ -  StreamSets Platform SDK for Python v5 or v6
+    See: https://docs.streamsets.com/platform-sdk/latest/learn/installation.html
+
+ - numpy
+
+ - Control Hub API Credentials
+
+ - Set the following variables in the script:
+
+        # Set to True if WebSocket Communication is enabled
+        # Set to False if Direct REST APIs are used
+        websockets_enabled = True
+
+        # A pre-existing directory to write the forecasts to
+        output_dir = '/path/to/sdc-metrics'
+
+        # How frequently to capture heap metrics
+        metrics_capture_interval_seconds = 60
+
+        # How many of the most recent samples per Data Collector the regression is fitted over
+        forecast_window_samples = 60
+
+        # 'theil-sen' (robust) or 'linear' (ordinary least squares)
+        regression_method = 'theil-sen'
+
+ - To avoid including API credentials in the script, export these environment variables
+   prior to running the script:
+
+          export CRED_ID="e9745d07...."
+          export CRED_TOKEN="eyd..."
+
+ - Run the script without arguments:
+
+            $ python get-sdc-heap-forecast.py
+
+- Sample console output looks like this (heap_exhaustion_seconds is null until enough
+  samples have been collected, or when the post-GC heap usage is not growing):
+
+$ python get-sdc-heap-forecast.py
+
+Forecasting heap exhaustion for 3 Data Collectors
+
+{"sdc_url": "http://sequoia.onefoursix.com:11111", "timestamp": "2023-09-01 14:32:49",
+"heap_post_gc_used": 2935726360, "heap_memory_max": 4216455168, "samples": 60,
+"heap_growth_bytes_per_hour": 301989888, "heap_exhaustion_seconds": 15268,
+"heap_exhaustion_time": "2023-09-01 18:47:17"}
+
+{"sdc_url": "http://10.10.10.169:18992", "timestamp": "2023-09-01 14:32:49",
+"heap_post_gc_used": 468823488, "heap_memory_max": 4216455168, "samples": 60,
+"heap_growth_bytes_per_hour": 0, "heap_exhaustion_seconds": null,
+"heap_exhaustion_time": null}
+
+...
+
+'''
+
+# Imports
+import os, sys, json, time, logging, warnings
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from logging.handlers import RotatingFileHandler
+import numpy as np
+from streamsets.sdk import ControlHub
+
+# Get Control Hub API credentials from the environment
+cred_id = os.getenv('CRED_ID')
+cred_token = os.getenv('CRED_TOKEN')
+
+# Set to True if WebSocket Communication is enabled
+# Set to False if Direct REST APIs are used
+websockets_enabled = True
+
+# The directory and name for the rolling log file
+output_dir = '/Users/mark/data/sdc-metrics'
+log_file_name = 'sdc-heap-forecast.log'
+
+# How often to capture SDC heap metrics
+metrics_capture_interval_seconds = 60
+
+# How many recent samples per SDC to fit the regression over
+forecast_window_samples = 60
+
+# The minimum number of samples needed before a forecast is made
+min_samples_for_forecast = 10
+
+# 'theil-sen' (robust to GC spikes and outliers) or 'linear' (ordinary least squares)
+regression_method = 'theil-sen'
+
+# How many SDCs to read JMX metrics from in parallel
+max_concurrent_requests = 16
+
+# Whether or not to print forecasts to the console
+print_metrics_to_console = True
+
+# Rolling Logfile config
+log_file = output_dir + '/' + log_file_name
+max_bytes_pre_log_file = 100 * 1024 * 1024  # 100MB
+number_of_rolling_logfiles = 5
+
+# Tenured memory pool names for the common garbage collectors. The CollectionUsage
+# of these pools is the heap that survived the most recent collection.
+tenured_pool_names = ['G1 Old Gen', 'PS Old Gen', 'CMS Old Gen', 'Tenured Gen', 'ZHeap', 'Shenandoah']
+
+
+# Method to create a rolling log file
+def create_rotating_log():
+    logger = logging.getLogger("Rotating Log")
+    logger.setLevel(logging.INFO)
+    handler = RotatingFileHandler(log_file, maxBytes=max_bytes_pre_log_file, backupCount=number_of_rolling_logfiles)
+    logger.addHandler(handler)
+    return logger
+
+
+# Method that returns (post_gc_heap_used, heap_max) from an SDC's JMX metrics
+def get_post_gc_heap_usage(jmx_metrics):
+    heap_metrics = jmx_metrics.get('java.lang:type=Memory')['HeapMemoryUsage']
+    post_gc_used = None
+    for pool_name in tenured_pool_names:
+        try:
+            pool = jmx_metrics.get('java.lang:type=MemoryPool,name=' + pool_name)
+        except Exception:
+            pool = None
+        if pool and pool.get('CollectionUsage'):
+            post_gc_used = (post_gc_used or 0) + pool['CollectionUsage']['used']
+
+    # Fall back to the current heap usage if no tenured pool reports post-GC usage
+    if post_gc_used is None:
+        post_gc_used = heap_metrics['used']
+    return post_gc_used, heap_metrics['max']
+
+
+# Method that reads the heap usage for one SDC; returns None on failure
+def read_heap_usage(sdc_url, sdc):
+    try:
+        return get_post_gc_heap_usage(sdc.get_jmx_metrics())
+    except Exception as e:
+        print('Exception occurred while reading metrics for SDC ' + sdc_url + ': ' + str(e))
+        return None
+
+
+# Method that fits a trend to every row of a (num_sdcs, num_samples) array at once.
+# Times are seconds relative to now and missing samples are NaN. Returns the fitted
+# slope (bytes per second) and the fitted value now (bytes) for each row.
+def fit_heap_trends(times, values, method):
+    with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        if method == 'theil-sen':
+            # Median of the slopes between every pair of samples, per row
+            dt = times[:, :, None] - times[:, None, :]
+            dv = values[:, :, None] - values[:, None, :]
+            pair_slopes = np.where(dt > 0, dv / dt, np.nan)
+            slopes = np.nanmedian(pair_slopes.reshape(len(times), -1), axis=1)
+            intercepts = np.nanmedian(values - slopes[:, None] * times, axis=1)
+        else:
+            mean_t = np.nanmean(times, axis=1, keepdims=True)
+            mean_v = np.nanmean(values, axis=1, keepdims=True)
+            dt = times - mean_t
+            slopes = np.nansum(dt * (values - mean_v), axis=1) / np.nansum(dt * dt, axis=1)
+            intercepts = mean_v[:, 0] - slopes * mean_t[:, 0]
+    return slopes, intercepts
+
+
+# Method that returns the seconds until each row's trend reaches heap_max,
+# or NaN where there are too few samples or the trend is not rising
+def forecast_time_to_exhaustion(times, values, heap_max, method):
+    slopes, current = fit_heap_trends(times, values, method)
+    sample_counts = np.count_nonzero(~np.isnan(values), axis=1)
+    rising = (slopes > 0) & (sample_counts >= min_samples_for_forecast)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        seconds = np.where(rising, np.maximum(heap_max - current, 0) / slopes, np.nan)
+    return seconds, slopes, sample_counts
+
+
+# Confirm the logging directory exists
+if not os.path.isdir(output_dir):
+    print('Error: the directory \'' + output_dir + '\' does not exist')
+    print('Please create that directory in advance')
+    sys.exit(-1)
+
+# Create the log file
+logger = create_rotating_log()
+
+# Connect to Control Hub
+sch = None
+try:
+    sch = ControlHub(credential_id=cred_id, token=cred_token, use_websocket_tunneling=websockets_enabled)
+except Exception as e:
+    print('Error: Could not connect to Control Hub.')
+    print('Check your API credentials and the Control Hub URL')
+    print('Exception: ' + str(e))
+    sys.exit(-1)
+
+# Connect to every Data Collector
+sdcs = {}
+for data_collector in sch.data_collectors:
+    try:
+        sdcs[data_collector.engine_url] = data_collector._instance
+    except Exception as e:
+        print('Error: Could not connect to Data Collector at ' + data_collector.engine_url)
+        print('Error; ' + str(e))
+
+if len(sdcs) == 0:
+    print('Error: No Data Collectors found')
+    sys.exit(-1)
+
+print('Forecasting heap exhaustion for ' + str(len(sdcs)) + ' Data Collectors')
+
+# One row per SDC; the sample columns are used as a ring buffer
+sdc_urls = list(sdcs.keys())
+sample_times = np.full((len(sdc_urls), forecast_window_samples), np.nan)
+sample_values = np.full((len(sdc_urls), forecast_window_samples), np.nan)
+heap_max = np.full(len(sdc_urls), np.nan)
+column = 0
+
+executor = ThreadPoolExecutor(max_workers=max_concurrent_requests)
+
+# Forecast in an endless loop until this script is stopped
+while (True):
+    start_time_seconds = time.time()
+
+    # Read the heap usage of every SDC in parallel
+    results = list(executor.map(lambda url: read_heap_usage(url, sdcs[url]), sdc_urls))
+    now = time.time()
+    for row, result in enumerate(results):
+        if result is None:
+            sample_times[row, column] = np.nan
+            sample_values[row, column] = np.nan
+        else:
+            sample_times[row, column] = now
+            sample_values[row, column] = result[0]
+            heap_max[row] = result[1]
+    latest_column = column
+    column = (column + 1) % forecast_window_samples
+
+    # Fit every SDC's trend in one pass, with times relative to now
+    seconds, slopes, sample_counts = forecast_time_to_exhaustion(
+        sample_times - now, sample_values, heap_max, regression_method)
+
+    timestamp = datetime.now()
+    for row, sdc_url in enumerate(sdc_urls):
+        if results[row] is None:
+            continue
+        metrics = {}
+        metrics['sdc_url'] = sdc_url
+        metrics['timestamp'] = timestamp.strftime('%Y-%m-%d %H:%M:%S')
+        metrics['heap_post_gc_used'] = int(sample_values[row, latest_column])
+        metrics['heap_memory_max'] = int(heap_max[row])
+        metrics['samples'] = int(sample_counts[row])
+        metrics['heap_growth_bytes_per_hour'] = int(max(slopes[row], 0) * 3600) if not np.isnan(slopes[row]) else None
+        if np.isnan(seconds[row]):
+            metrics['heap_exhaustion_seconds'] = None
+            metrics['heap_exhaustion_time'] = None
+        else:
+            metrics['heap_exhaustion_seconds'] = int(seconds[row])
+            metrics['heap_exhaustion_time'] = (timestamp + timedelta(seconds=float(seconds[row]))).strftime('%Y-%m-%d %H:%M:%S')
+
+        # Convert the metrics to JSON
+        data = json.dumps(metrics)
+
+        # Print messages to the console if needed
+        if print_metrics_to_console:
+            print(data)
+
+        # Write metrics to the rolling logfile
+        logger.info(data)
+
+    # Sleep until the next poll cycle
+    sleep_time_seconds = metrics_capture_interval_seconds - (time.time() - start_time_seconds)
+    if sleep_time_seconds > 0:
+        time.sleep(sleep_time_seconds)
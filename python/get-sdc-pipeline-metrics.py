@@ -5,11 +5,24 @@ Example of how to get pipeline metrics for a running Job
 directly from an SDC on StreamSets Platform as well as the
 time of last record received
 
+The Data Collector(s) running the Job do not need to be known in advance:
+the script builds an index of the pipelines on every Data Collector, in
+parallel, that maps each pipeline's JOB_ID parameter to the Data Collector
+and pipeline that run it (see sdc_pipeline_index.py), then looks up the Job
+in the index. A Job with more than one instance reports metrics for each
+Data Collector it runs on. Stopped copies of the Job's pipeline, left on
+Data Collectors where the Job ran before, are skipped.
+
+Set stage_breakdown to True to also find a slow Job's bottleneck: the script
+samples the per-stage batch processing timers, input/output/error meters and
+queue depth gauges (for stages that publish one) from the same pipeline
+metrics payload over a window, and prints the stages ranked by their share of
+batch processing time.
+
 Set the following variables in the script:
 
     - cred_id
     - cred_token
-    - sdc_url
     - job_name
 
 Sample output looks like this:
@@ -17,26 +30,32 @@ Sample output looks like this:
     $ python get-sdc-pipeline-metrics.py
     Connected to Control Hub
     Found Job 'Job for Weather Raw to Refined'
-    Connected to SDC at http://localhost:18888
-    Found pipeline 'Weather Raw to Refined'
+    Indexed 212 pipelines on 14 Data Collectors
+    Found pipeline 'Weather Raw to Refined' on SDC at http://localhost:18888
     Pipeline input record count: 1419
     Pipeline output record count: 1419
     Time of Last Record Received: 2023-12-21 11:08:48.629000
 
+With stage_breakdown set to True the output continues like this:
+
+    Stage breakdown over 60 seconds (7 samples):
+    Stage                                     Batch %      Mean ms       p99 ms       In/s      Out/s   Errors    Queue
+    Snowflake_01                                74.2%        702.4       1398.0      118.2      118.2        0        -
+    JDBCMultitableConsumer_01                   20.1%        190.3        402.7        0.0      118.3        0        -
+    ExpressionEvaluator_01                       5.7%         54.1         97.5      118.3      118.3        0        -
+
 '''
 
 # Imports
-import sys
+import re, sys, time
 from datetime import datetime
 from streamsets.sdk import ControlHub
+from sdc_pipeline_index import SdcPipelineIndex
 
 # Control Hub API credentials
 cred_id = ''
 cred_token = ''
 
-# SDC URL
-sdc_url = ''
-
 # Job name
 job_name = ''
 
@@ -44,6 +63,102 @@ job_name = ''
 # Set to False if Direct REST APIs are used
 websockets_enabled = True
 
+# Set to True to sample per-stage metrics over a window and rank the stages
+# by their share of batch processing time
+stage_breakdown = False
+
+# The stage breakdown window and how often to sample within it
+stage_breakdown_window_seconds = 60
+stage_breakdown_sample_interval_seconds = 10
+
+# Patterns for the per-stage metrics in the pipeline metrics payload
+stage_timer_pattern = re.compile(r'^stage\.(.+)\.batchProcessing\.timer$')
+stage_meter_pattern = re.compile(r'^stage\.(.+)\.(inputRecords|outputRecords|errorRecords|stageErrors)\.meter$')
+stage_queue_gauge_pattern = re.compile(r'^(?:custom\.)?(?:stage\.)?([^.]+)\..*[Qq]ueue.*\.gauge$')
+
+# Method that returns the multiplier to convert a timer's values to milliseconds
+def get_milliseconds_multiplier(timer):
+    units = timer.get('duration_units', 'seconds')
+    return {'seconds': 1000.0, 'milliseconds': 1.0, 'microseconds': 0.001}.get(units, 1000.0)
+
+# Method that extracts per-stage timers, meters and queue depths from one metrics sample
+def get_stage_metrics_sample(metrics_data):
+    stages = {}
+    for key, timer in metrics_data.get('timers', {}).items():
+        match = stage_timer_pattern.match(key)
+        if match:
+            multiplier = get_milliseconds_multiplier(timer)
+            stage = stages.setdefault(match.group(1), {})
+            stage['batch_count'] = timer.get('count', 0)
+            stage['mean_batch_ms'] = timer.get('mean', 0) * multiplier
+            stage['p99_batch_ms'] = timer.get('p99', 0) * multiplier
+    for key, meter in metrics_data.get('meters', {}).items():
+        match = stage_meter_pattern.match(key)
+        if match:
+            stages.setdefault(match.group(1), {})[match.group(2)] = meter.get('count', 0)
+    for key, gauge in metrics_data.get('gauges', {}).items():
+        match = stage_queue_gauge_pattern.match(key)
+        if match and match.group(1) in stages and isinstance(gauge.get('value'), (int, float)):
+            stages[match.group(1)]['queue_depth'] = gauge['value']
+    return stages
+
+# Method that samples the stage metrics of a pipeline over the breakdown window and
+# returns a list of per-stage summaries ranked by share of batch processing time
+def get_stage_breakdown(sdc, pipeline):
+    samples = []
+    sample_times = []
+    deadline = time.time() + stage_breakdown_window_seconds
+    while True:
+        samples.append(get_stage_metrics_sample(sdc.get_pipeline_metrics(pipeline).pipeline._data))
+        sample_times.append(time.time())
+        if time.time() + stage_breakdown_sample_interval_seconds > deadline:
+            break
+        time.sleep(stage_breakdown_sample_interval_seconds)
+
+    elapsed_seconds = max(sample_times[-1] - sample_times[0], 1e-9)
+    first, last = samples[0], samples[-1]
+    summaries = []
+    for stage_name in last:
+        means = [sample[stage_name]['mean_batch_ms'] for sample in samples if 'mean_batch_ms' in sample.get(stage_name, {})]
+        queue_depths = [sample[stage_name]['queue_depth'] for sample in samples if 'queue_depth' in sample.get(stage_name, {})]
+        start, end = first.get(stage_name, {}), last[stage_name]
+        summary = {}
+        summary['stage'] = stage_name
+        summary['mean_batch_ms'] = sum(means) / len(means) if means else 0.0
+        summary['p99_batch_ms'] = end.get('p99_batch_ms', 0.0)
+        for meter in ('inputRecords', 'outputRecords', 'errorRecords', 'stageErrors'):
+            delta = end.get(meter, 0) - start.get(meter, 0)
+            summary[meter] = delta if len(samples) > 1 else end.get(meter, 0)
+        summary['input_records_per_second'] = summary['inputRecords'] / elapsed_seconds if len(samples) > 1 else None
+        summary['output_records_per_second'] = summary['outputRecords'] / elapsed_seconds if len(samples) > 1 else None
+        summary['max_queue_depth'] = max(queue_depths) if queue_depths else None
+        summaries.append(summary)
+
+    # Each stage's share of the time a batch spends in the pipeline's stages
+    total_ms = sum(summary['mean_batch_ms'] for summary in summaries)
+    for summary in summaries:
+        summary['batch_time_share'] = summary['mean_batch_ms'] / total_ms if total_ms > 0 else 0.0
+    summaries.sort(key=lambda summary: summary['batch_time_share'], reverse=True)
+    return summaries, len(samples)
+
+# Method that prints a stage breakdown as a table
+def print_stage_breakdown(summaries, sample_count):
+    def fmt(value, pattern):
+        return '-' if value is None else pattern.format(value)
+    print('Stage breakdown over {} seconds ({} samples):'.format(stage_breakdown_window_seconds, sample_count))
+    print('{:<40} {:>8} {:>12} {:>12} {:>10} {:>10} {:>8} {:>8}'.format(
+        'Stage', 'Batch %', 'Mean ms', 'p99 ms', 'In/s', 'Out/s', 'Errors', 'Queue'))
+    for summary in summaries:
+        print('{:<40} {:>8} {:>12} {:>12} {:>10} {:>10} {:>8} {:>8}'.format(
+            summary['stage'],
+            fmt(summary['batch_time_share'] * 100, '{:.1f}%'),
+            fmt(summary['mean_batch_ms'], '{:.1f}'),
+            fmt(summary['p99_batch_ms'], '{:.1f}'),
+            fmt(summary['input_records_per_second'], '{:.1f}'),
+            fmt(summary['output_records_per_second'], '{:.1f}'),
+            summary['errorRecords'] + summary['stageErrors'],
+            fmt(summary['max_queue_depth'], '{}')))
+
 # Connect to Control Hub
 sch = None
 try:
@@ -66,43 +181,49 @@ except Exception as e:
 
 print('Found Job \'{}\''.format(job_name))
 
-# Connect to the Data Collector
-sdc = None
+# Build the index of Job IDs to the Data Collectors and pipelines that run them
+index = SdcPipelineIndex(sch)
 try:
-    sdc = sch.data_collectors.get(engine_url=sdc_url)._instance
+    index.refresh()
 except Exception as e:
-    print('Error: Could not connect to Data Collector')
+    print('Error: Could not list Data Collectors')
     print(str(e))
     sys.exit(-1)
 
-print('Connected to SDC at {}'.format(sdc_url))
+print('Indexed {} pipelines on {} Data Collectors'.format(len(index), len(index.engine_entries)))
 
-# Get the pipeline by its JOB_ID parameter
-pipeline = None
-try:
-    pipelines = sdc.pipelines
-    for p in pipelines:
-        if p.parameters['JOB_ID'] == job.job_id:
-            pipeline = p
-            print('Found pipeline \'{}\''.format(p.title))
-            break
-    if pipeline is None:
-        print('Error: Could not find pipeline for Job \'{}\''.format(job_name))
-        sys.exit(-1)
-except Exception as e:
-    print('Error: Could not find pipeline for Job \'{}\''.format(job_name))
-    print(str(e))
+# Get the running pipeline(s) by the Job ID
+entries = index.get_running(job.job_id)
+if len(entries) == 0:
+    print('Error: Could not find a running pipeline for Job \'{}\''.format(job_name))
     sys.exit(-1)
 
-pipeline_metrics = sdc.get_pipeline_metrics(pipeline).pipeline
-
-# Pipeline Metrics
-print('Pipeline input record count: {}'.format(pipeline_metrics.input_record_count))
-print('Pipeline output record count: {}'.format(pipeline_metrics.output_record_count))
-
-# Time of Last Record Received
-gauges = pipeline_metrics._data['gauges']
-runtime_stats_gauge = gauges['RuntimeStatsGauge.gauge']
-millis = runtime_stats_gauge['value']['timeOfLastReceivedRecord']
-time_of_last_record_received = datetime.fromtimestamp(millis/1000.0)
-print('Time of Last Record Received: {}'.format(time_of_last_record_received))
+error_count = 0
+for entry in entries:
+    print('Found pipeline \'{}\' on SDC at {}'.format(entry.pipeline.title, entry.sdc_url))
+
+    try:
+        pipeline_metrics = entry.sdc.get_pipeline_metrics(entry.pipeline).pipeline
+
+        # Pipeline Metrics
+        print('Pipeline input record count: {}'.format(pipeline_metrics.input_record_count))
+        print('Pipeline output record count: {}'.format(pipeline_metrics.output_record_count))
+
+        # Time of Last Record Received
+        gauges = pipeline_metrics._data['gauges']
+        runtime_stats_gauge = gauges['RuntimeStatsGauge.gauge']
+        millis = runtime_stats_gauge['value']['timeOfLastReceivedRecord']
+        time_of_last_record_received = datetime.fromtimestamp(millis/1000.0)
+        print('Time of Last Record Received: {}'.format(time_of_last_record_received))
+
+        # Per-stage bottleneck breakdown
+        if stage_breakdown:
+            summaries, sample_count = get_stage_breakdown(entry.sdc, entry.pipeline)
+            print_stage_breakdown(summaries, sample_count)
+    except Exception as e:
+        error_count += 1
+        print('Error: Could not get metrics for pipeline \'{}\' on SDC at {}'.format(entry.pipeline.title, entry.sdc_url))
+        print(str(e))
+
+if error_count == len(entries):
+    sys.exit(-1)
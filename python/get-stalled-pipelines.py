@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+
+'''
+This script continuously detects stalled pipelines across every Data Collector
+registered with StreamSets Platform.
+
+On each cycle the script lists the ACTIVE Jobs, looks up the engine-side pipelines that
+run them in an index of all Data Collectors (see sdc_pipeline_index.py; the index is
+refreshed incrementally each cycle), and reads the pipeline metrics of every one of
+those pipelines in parallel. Only pipelines that their Data Collector reports as running
+are checked; stopped copies left on engines where a Job ran before are skipped. For each
+pipeline it computes the time since the last record was received, from the
+timeOfLastReceivedRecord value of the RuntimeStatsGauge gauge, and flags the pipeline as
+stalled if that exceeds the Job's threshold.
+
+With the default of 32 parallel requests a fleet of about 1,000 pipelines is covered
+well within a one-minute cycle. If a cycle takes longer than the cycle interval, a
+warning is printed and the next cycle starts immediately.
+
+Prerequisites:
+
+ - Python 3.9+
+
+ - StreamSets Platform SDK for Python v5 or v6
+   See: https://docs.streamsets.com/platform-sdk/latest/learn/installation.html
+
+ - StreamSets Platform API Credentials for a user with Organization Administrator role
+
+ - To avoid including API Credentials in the script, export these two environment variables
+   prior to running the script:
+
+        export CRED_ID=<your CRED_ID>>
+        export CRED_TOKEN=<your CRED_TOKEN>
+
+ - Set the following variables in the script:
+
+        # How long a pipeline may go without receiving a record before it is flagged
+        default_stall_threshold_seconds = 5 * 60
+
+        # Per-Job thresholds, keyed by Job name or Job ID, for Jobs that
+        # legitimately receive records less often
+        stall_thresholds_seconds = {'Nightly Oracle extract': 6 * 60 * 60}
+
+Sample output looks like this:
+
+    $ python get-stalled-pipelines.py
+    2023-12-21 11:08:02 Connecting to Control Hub
+    2023-12-21 11:08:03 Checking for stalled pipelines every 60 seconds
+    {"timestamp": "2023-12-21 11:08:17", "job_name": "Job for Weather Raw to Refined", "job_id": "5c2e...", "sdc_url": "http://localhost:18888", "pipeline": "Weather Raw to Refined", "time_of_last_record_received": "2023-12-21 10:51:48", "seconds_since_last_record": 989, "threshold_seconds": 300}
+    2023-12-21 11:08:17 Checked 1012 pipelines on 38 Data Collectors in 13.8 seconds; 1 stalled
+    ...
+
+'''
+
+import datetime, json, os, sys, time
+from concurrent.futures import ThreadPoolExecutor
+from streamsets.sdk import ControlHub
+from sdc_pipeline_index import SdcPipelineIndex
+
+# Get CRED_ID from the environment
+CRED_ID = os.getenv('CRED_ID')
+
+# Get CRED_TOKEN from the environment
+CRED_TOKEN = os.getenv('CRED_TOKEN')
+
+# Set to True if WebSocket Communication is enabled
+# Set to False if Direct REST APIs are used
+websockets_enabled = True
+
+# How often to check for stalled pipelines
+cycle_interval_seconds = 60
+
+# How many pipeline metrics requests to make in parallel
+max_concurrent_requests = 32
+
+# How long a pipeline may go without receiving a record before it is flagged as stalled
+default_stall_threshold_seconds = 5 * 60
+
+# Per-Job stall thresholds, keyed by Job name or Job ID
+stall_thresholds_seconds = {}
+
+# print_message method which writes a timestamp message ot the console
+def print_message(message):
+    print(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S") + ' ' +   message)
+
+# Method that returns the stall threshold for a Job
+def get_stall_threshold(job):
+    if job.job_id in stall_thresholds_seconds:
+        return stall_thresholds_seconds[job.job_id]
+    return stall_thresholds_seconds.get(job.job_name, default_stall_threshold_seconds)
+
+# Method that returns the time of the last record received by a pipeline in epoch
+# seconds, or None if the pipeline has not received a record yet
+def get_time_of_last_record_received(entry):
+    pipeline_metrics = entry.sdc.get_pipeline_metrics(entry.pipeline).pipeline
+    gauges = pipeline_metrics._data['gauges']
+    millis = gauges['RuntimeStatsGauge.gauge']['value'].get('timeOfLastReceivedRecord')
+    if not millis:
+        return None
+    return millis / 1000.0
+
+# Method that checks one pipeline and returns a stalled record, or None if it is
+# not stalled or its metrics can't be read
+def check_pipeline(job_and_entry):
+    job, entry = job_and_entry
+    try:
+        last_record_seconds = get_time_of_last_record_received(entry)
+    except Exception as e:
+        print_message('Error getting metrics for pipeline \'' + entry.pipeline.title + '\' on ' + entry.sdc_url + ': ' + str(e))
+        return None
+
+    threshold = get_stall_threshold(job)
+    now = time.time()
+    seconds_since_last_record = None if last_record_seconds is None else int(now - last_record_seconds)
+    if seconds_since_last_record is not None and seconds_since_last_record <= threshold:
+        return None
+
+    record = {}
+    record['timestamp'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    record['job_name'] = job.job_name
+    record['job_id'] = job.job_id
+    record['sdc_url'] = entry.sdc_url
+    record['pipeline'] = entry.pipeline.title
+    if last_record_seconds is None:
+        record['time_of_last_record_received'] = None
+    else:
+        record['time_of_last_record_received'] = datetime.datetime.fromtimestamp(last_record_seconds).strftime('%Y-%m-%d %H:%M:%S')
+    record['seconds_since_last_record'] = seconds_since_last_record
+    record['threshold_seconds'] = threshold
+    return record
+
+# Connect to Control Hub
+print_message('Connecting to Control Hub')
+sch = None
+try:
+    sch = ControlHub(credential_id=CRED_ID, token=CRED_TOKEN, use_websocket_tunneling=websockets_enabled)
+except Exception as e:
+    print('Error: Could not connect to Control Hub.')
+    print(str(e))
+    sys.exit(-1)
+
+index = SdcPipelineIndex(sch, max_concurrent_requests=max_concurrent_requests)
+executor = ThreadPoolExecutor(max_workers=max_concurrent_requests)
+
+print_message('Checking for stalled pipelines every ' + str(cycle_interval_seconds) + ' seconds')
+
+# Check for stalled pipelines in an endless loop until this script is stopped
+while True:
+    start_time_seconds = time.time()
+    try:
+        # Refresh the index of engine-side pipelines and get the pipelines of the ACTIVE Jobs
+        index.refresh()
+        active_jobs = [job for job in sch.jobs if job.currentJobStatus['status'] == 'ACTIVE']
+        pipelines_to_check = [(job, entry) for job in active_jobs for entry in index.get_running(job.job_id)]
+
+        # Check every pipeline in parallel
+        stalled_count = 0
+        for record in executor.map(check_pipeline, pipelines_to_check):
+            if record is not None:
+                stalled_count += 1
+                print(json.dumps(record))
+
+        elapsed_seconds = time.time() - start_time_seconds
+        print_message('Checked {} pipelines on {} Data Collectors in {:.1f} seconds; {} stalled'.format(
+            len(pipelines_to_check), len(index.engine_entries), elapsed_seconds, stalled_count))
+        if elapsed_seconds > cycle_interval_seconds:
+            print_message('Warning: the check took longer than the cycle interval; consider raising max_concurrent_requests')
+
+    except Exception as e:
+        print_message('Error checking for stalled pipelines: ' + str(e))
+
+    # Sleep until the next cycle
+    sleep_time_seconds = cycle_interval_seconds - (time.time() - start_time_seconds)
+    if sleep_time_seconds > 0:
+        time.sleep(sleep_time_seconds)
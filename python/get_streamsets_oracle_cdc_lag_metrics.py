@@ -1,11 +1,35 @@
 """
 get_streamsets_oracle_cdc_lag_metrics.py
 
-This script retrieves StreamSets Oracle CDC lag metrics for a running Job.
+This script retrieves StreamSets Oracle CDC lag metrics for one or more running Jobs.
 
 The script will run forever until stopped.
 
-Set the sleep_time_seconds to control the refresh frequency
+When more than one Job is monitored, all of the Jobs are polled concurrently on each
+tick from a thread pool, and one timestamped lag record is printed per Job per tick.
+
+The lag gauges of every Oracle CDC (or older Oracle CDC Client) origin in a Job's pipeline
+are discovered by name from the Job's realtime summary, whatever the origin's stage instance
+number, and the discovered gauge keys are cached until the Job's run changes. For pipelines
+with more than one Oracle CDC origin, the lag of the slowest origin is reported along with
+the lag of each origin.
+
+Each lag value is also parsed into seconds and added to a bounded sliding-window histogram
+per Job, and the p50/p95/p99 lag in seconds over the last 5, 15 and 60 minutes is printed
+alongside the raw value.
+Set percentile_windows_minutes and lag_percentiles to change the summaries.
+
+While a Job stays ACTIVE, each tick costs a single Control Hub API call: the Job's realtime
+summary is read directly, and a summary that still contains the lag gauges of the Job's
+current run means the Job is still ACTIVE. The Job is fully refreshed to read its status
+and run when that check fails, for example after the Job stops, when the pipeline's batch
+count goes down (the pipeline was restarted), and every run_check_interval_polls polls,
+so that a restart is detected even if it went unnoticed in between. The number of
+API calls made is printed after each tick; set report_api_calls_per_tick to False to
+turn this off.
+
+Set the sleep_time_seconds to control the refresh frequency and max_concurrent_requests
+to control how many Jobs are polled at the same time
 
 Prerequisites
 -------------
@@ -21,16 +45,21 @@ Prerequisites
 
 Command Line Arguments
 ----------------------
-The script requires one command line arguments:
+The script requires either one or more Job IDs or a Job label:
 
-- job_id - The Job ID for a running Oracle CDC Job
+- job_id [job_id ...] - The Job IDs of running Oracle CDC Jobs
 
+- --label <label> - Monitor every Job that has the given Data Collector label
 
 
 Example Usage
 -------------
 $ python3 get_streamsets_oracle_cdc_lag_metrics.py 35c675ae-665b-4129-b22b-2bf8e491f197:8030c2e9-1a39-11ec-a5fe-97c8d4369386
 
+$ python3 get_streamsets_oracle_cdc_lag_metrics.py 35c675ae-...:8030c2e9-... 9f1b3c22-...:8030c2e9-...
+
+$ python3 get_streamsets_oracle_cdc_lag_metrics.py --label oracle-cdc
+
 
 Sample Output
 -------------
@@ -41,56 +70,309 @@ Connected to Control Hub
 -------------------------------------
 Found Job 'Oracle CDC to Snowflake (new origin)'
 -------------------------------------
-2024-09-30 16:19:16 Oracle CDC Lag metric: 59 seconds
-2024-09-30 16:19:48 Oracle CDC Lag metric: 14 seconds
-2024-09-30 16:20:20 Oracle CDC Lag metric: 19 seconds
-2024-09-30 16:20:51 Oracle CDC Lag metric: 23 seconds
-2024-09-30 16:21:23 Oracle CDC Lag metric: 54 seconds
-2024-09-30 16:21:55 Oracle CDC Lag metric: 28 seconds
+2024-09-30 16:19:16 Oracle CDC Lag metric: 59 seconds | 5m p50/p95/p99: 64.0/64.0/64.0 | 15m p50/p95/p99: 64.0/64.0/64.0 | 60m p50/p95/p99: 64.0/64.0/64.0
+2024-09-30 16:19:16 Polled 1 Job(s) with 3 Control Hub API calls
+2024-09-30 16:19:48 Oracle CDC Lag metric: 14 seconds | 5m p50/p95/p99: 14.7/64.0/64.0 | 15m p50/p95/p99: 14.7/64.0/64.0 | 60m p50/p95/p99: 14.7/64.0/64.0
+2024-09-30 16:19:48 Polled 1 Job(s) with 1 Control Hub API calls
+2024-09-30 16:20:20 Oracle CDC Lag metric: 19 seconds | 5m p50/p95/p99: 19.0/64.0/64.0 | 15m p50/p95/p99: 19.0/64.0/64.0 | 60m p50/p95/p99: 19.0/64.0/64.0
+2024-09-30 16:20:20 Polled 1 Job(s) with 1 Control Hub API calls
+2024-09-30 16:20:51 Oracle CDC Lag metric: 23 seconds | 5m p50/p95/p99: 19.0/64.0/64.0 | 15m p50/p95/p99: 19.0/64.0/64.0 | 60m p50/p95/p99: 19.0/64.0/64.0
+2024-09-30 16:20:51 Polled 1 Job(s) with 1 Control Hub API calls
+2024-09-30 16:21:23 Oracle CDC Lag metric: 54 seconds | 5m p50/p95/p99: 24.7/64.0/64.0 | 15m p50/p95/p99: 24.7/64.0/64.0 | 60m p50/p95/p99: 24.7/64.0/64.0
+2024-09-30 16:21:23 Polled 1 Job(s) with 1 Control Hub API calls
+2024-09-30 16:21:55 Oracle CDC Lag metric: 28 seconds | 5m p50/p95/p99: 24.7/64.0/64.0 | 15m p50/p95/p99: 24.7/64.0/64.0 | 60m p50/p95/p99: 24.7/64.0/64.0
+2024-09-30 16:21:55 Polled 1 Job(s) with 1 Control Hub API calls
+...
+
+With more than one Job, each record includes the Job name:
+
+$ python3 get_streamsets_oracle_cdc_lag_metrics.py --label oracle-cdc
+-------------------------------------
+Connected to Control Hub
+-------------------------------------
+Found Job 'Oracle CDC to Snowflake (new origin)'
+Found Job 'Oracle CDC to Kafka'
+-------------------------------------
+2024-09-30 16:19:16 Job 'Oracle CDC to Snowflake (new origin)' Oracle CDC Lag metric: 59 seconds | 5m p50/p95/p99: 64.0/64.0/64.0 | 15m p50/p95/p99: 64.0/64.0/64.0 | 60m p50/p95/p99: 64.0/64.0/64.0
+2024-09-30 16:19:16 Job 'Oracle CDC to Kafka' Oracle CDC Lag metric: 3 seconds | 5m p50/p95/p99: 3.1/3.1/3.1 | 15m p50/p95/p99: 3.1/3.1/3.1 | 60m p50/p95/p99: 3.1/3.1/3.1
+2024-09-30 16:19:16 Polled 2 Job(s) with 6 Control Hub API calls
+2024-09-30 16:19:46 Job 'Oracle CDC to Snowflake (new origin)' Oracle CDC Lag metric: 14 seconds | 5m p50/p95/p99: 14.7/64.0/64.0 | 15m p50/p95/p99: 14.7/64.0/64.0 | 60m p50/p95/p99: 14.7/64.0/64.0
+2024-09-30 16:19:46 Job 'Oracle CDC to Kafka' Oracle CDC Lag metric: 4 seconds | 5m p50/p95/p99: 3.1/4.0/4.0 | 15m p50/p95/p99: 3.1/4.0/4.0 | 60m p50/p95/p99: 3.1/4.0/4.0
+2024-09-30 16:19:46 Polled 2 Job(s) with 2 Control Hub API calls
 ...
 """
 
+import bisect
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from time import sleep
+import time
 import sys
 from streamsets.sdk import ControlHub
 
 # How long to sleep between calls to get the metrics
 sleep_time_seconds = 30
 
+# How many Jobs to poll at the same time
+max_concurrent_requests = 16
+
+# How many polls of the realtime summary alone before the Job's status and run are checked again
+run_check_interval_polls = 10
+
+# Whether to print the number of Control Hub API calls made on each tick
+report_api_calls_per_tick = True
+
+# The windows, in minutes, and the percentiles of the lag summaries
+percentile_windows_minutes = [5, 15, 60]
+lag_percentiles = [50, 95, 99]
+
 def print_usage_and_exit():
-    print('Usage: $ python3 get_streamsets_oracle_cdc_lag_metrics.py <job_id>')
+    print('Usage: $ python3 get_streamsets_oracle_cdc_lag_metrics.py <job_id> [<job_id> ...]')
+    print('Usage: $ python3 get_streamsets_oracle_cdc_lag_metrics.py --label <label>')
     sys.exit(1)
 
 def print_message(message):
     print(datetime.now().strftime("%Y-%m-%d %H:%M:%S") + ' ' +   message)
 
-def get_oracle_cdc_lag_metric():
-    lag_metric = None
-
-    # Oracle CDC Lag Time metric name for the new Oracle CDC Origin
-    new_oracle_cdc_lag_metric_key = 'custom.OracleCDC_1.Summary 02 - Latency.0.gauge'
-
-    # Oracle CDC Lag Time metric name for the old Oracle CDC Client Origin
-    old_oracle_cdc_lag_metric_key = 'custom.OracleCDCClient_1.Work State A: RedoLog Archives.0.gauge'
-
+# Patterns that match the lag gauge of the new Oracle CDC Origin and of the old
+# Oracle CDC Client Origin for any stage instance, with the gauge value to read
+oracle_cdc_lag_gauge_patterns = [
+    (re.compile(r'^custom\.(OracleCDC_\d+)\.Summary 02 - Latency\.0\.gauge$'), 'Server Instant Latency'),
+    (re.compile(r'^custom\.(OracleCDCClient_\d+)\.Work State A: RedoLog Archives\.0\.gauge$'), 'Read lag (seconds)')
+]
+
+# Resolved lag gauge keys per Job ID, stored as (run_count, [(stage_instance, gauge_key, value_key), ...])
+lag_gauge_key_cache = {}
+
+# Returns the lag gauges of every Oracle CDC origin in the gauges dict
+def resolve_oracle_cdc_lag_gauge_keys(gauges):
+    lag_gauge_keys = []
+    for gauge_key in gauges.keys():
+        for pattern, value_key in oracle_cdc_lag_gauge_patterns:
+            match = pattern.match(gauge_key)
+            if match:
+                lag_gauge_keys.append((match.group(1), gauge_key, value_key))
+                break
+    return sorted(lag_gauge_keys)
+
+# Returns the gauges of the Job's realtime summary, or None if the summary can't be read
+# (for example because the Job is no longer running). This is one Control Hub API call.
+def get_realtime_gauges(job):
     try:
         # noinspection PyProtectedMember
-        gauges = job.realtime_summary._data['gauges']
+        return job.realtime_summary._data['gauges']
+    except Exception:
+        return None
+
+# Returns the cached lag gauge keys for the Job if they were resolved during the given
+# run and are all present in the gauges, otherwise None
+def get_cached_lag_gauge_keys(job_id, gauges, run_count):
+    cached = lag_gauge_key_cache.get(job_id)
+    if cached is None or cached[0] != run_count or any(key not in gauges for _, key, _ in cached[1]):
+        return None
+    return cached[1]
+
+# Returns a dict of Oracle CDC origin stage instance names to lag values from the gauges.
+# The gauge keys are resolved once per Job run and are looked up directly on later ticks.
+def get_oracle_cdc_lag_metrics(job_id, gauges, run_count):
+    lag_metrics = {}
+    try:
+        lag_gauge_keys = get_cached_lag_gauge_keys(job_id, gauges, run_count)
+        if lag_gauge_keys is None:
+            lag_gauge_keys = resolve_oracle_cdc_lag_gauge_keys(gauges)
 
-        # Get the appropriate lag metric for the old or new Oracle CDC origin
-        if new_oracle_cdc_lag_metric_key in gauges.keys():
-            lag_metric = gauges[new_oracle_cdc_lag_metric_key]['value']['Server Instant Latency']
-        elif old_oracle_cdc_lag_metric_key in gauges.keys():
-            lag_metric = gauges[old_oracle_cdc_lag_metric_key]['value']['Read lag (seconds)']
+            # Gauges may not be reported yet right after a Job starts; try again next tick
+            if len(lag_gauge_keys) > 0:
+                lag_gauge_key_cache[job_id] = (run_count, lag_gauge_keys)
+
+        for stage_instance, gauge_key, value_key in lag_gauge_keys:
+            lag_metrics[stage_instance] = gauges[gauge_key]['value'].get(value_key)
 
     except Exception as ex:
         print_message('Error getting Oracle CDC lag metric: ' + str(ex))
 
-    return lag_metric
-
-
+    return lag_metrics
+
+# Units of the lag gauge values, in seconds
+lag_units_seconds = {'ms': 0.001, 'millisecond': 0.001, 's': 1, 'sec': 1, 'second': 1,
+                     'm': 60, 'min': 60, 'minute': 60, 'h': 3600, 'hour': 3600}
+
+# Returns a lag gauge value, such as 59 or '59 seconds', in seconds, or None if it can't be parsed
+def parse_lag_seconds(lag):
+    if isinstance(lag, (int, float)):
+        return float(lag)
+    match = re.match(r'^\s*(-?\d+(?:\.\d+)?)\s*([a-zA-Z]*)\s*$', str(lag))
+    if match is None:
+        return None
+    unit = match.group(2).lower()
+    if unit not in lag_units_seconds and unit.endswith('s') and unit[:-1] in lag_units_seconds:
+        unit = unit[:-1]
+    if unit == '':
+        return float(match.group(1))
+    if unit not in lag_units_seconds:
+        return None
+    return float(match.group(1)) * lag_units_seconds[unit]
+
+# Returns the lag of the Job, which is the lag of its slowest Oracle CDC origin,
+# compared in seconds
+def get_job_lag(lag_metrics):
+    lag_values = [lag for lag in lag_metrics.values() if parse_lag_seconds(lag) is not None]
+    return max(lag_values, key=parse_lag_seconds) if len(lag_values) > 0 else None
+
+# Formats the lag of one or more Oracle CDC origins; multi-origin pipelines
+# also list the lag of each origin
+def format_oracle_cdc_lag_metrics(lag_metrics, lag_metric):
+    if len(lag_metrics) <= 1:
+        return 'Oracle CDC Lag metric: {}'.format(lag_metric)
+    return 'Oracle CDC Lag metric: {} ({})'.format(
+        lag_metric, ', '.join('{}: {}'.format(stage, lag) for stage, lag in lag_metrics.items()))
+
+
+# A histogram of lag values over a sliding time window, in the style of an HDR histogram.
+# Values are counted in fixed log-linear buckets (each bucket is about 9% wider than the
+# one before it), and counts are kept in a ring of one-minute slots covering the longest
+# window. Old slots are reused as time moves on, so the memory used per Job is constant
+# no matter how long the monitor runs, and percentiles for any window up to the ring's
+# length are computed by merging the slots that fall inside the window.
+class SlidingWindowHistogram:
+
+    # Bucket upper bounds: 0, then 8 buckets per power of two from 1 second up to ~36 hours
+    bucket_upper_bounds = [0.0] + [2 ** (i / 8) for i in range(0, 17 * 8 + 1)]
+
+    def __init__(self, window_seconds, slot_seconds=60):
+        self.slot_seconds = slot_seconds
+        self.num_slots = -(-window_seconds // slot_seconds)
+        self.slot_ids = [None] * self.num_slots
+        self.slot_counts = [[0] * (len(self.bucket_upper_bounds) + 1) for _ in range(self.num_slots)]
+
+    # Records a value; values above the last bucket are counted in an overflow bucket
+    def record(self, value, now):
+        slot_id = int(now // self.slot_seconds)
+        slot = slot_id % self.num_slots
+        if self.slot_ids[slot] != slot_id:
+            self.slot_ids[slot] = slot_id
+            self.slot_counts[slot] = [0] * len(self.slot_counts[slot])
+        self.slot_counts[slot][bisect.bisect_left(self.bucket_upper_bounds, value)] += 1
+
+    # Returns a list of the given percentiles over the most recent window_seconds,
+    # or None if there are no values in the window. Each percentile is reported as
+    # the upper bound of the bucket it falls in.
+    def get_percentiles(self, window_seconds, percentiles, now):
+        current_slot_id = int(now // self.slot_seconds)
+        window_slots = -(-window_seconds // self.slot_seconds)
+        counts = [0] * len(self.bucket_upper_bounds + [None])
+        for slot_id, slot_counts in zip(self.slot_ids, self.slot_counts):
+            if slot_id is not None and current_slot_id - slot_id < window_slots:
+                counts = [a + b for a, b in zip(counts, slot_counts)]
+        total = sum(counts)
+        if total == 0:
+            return None
+        results = []
+        for percentile in percentiles:
+            rank = max(1, -(-total * percentile // 100))
+            seen = 0
+            for bucket, count in enumerate(counts):
+                seen += count
+                if seen >= rank:
+                    break
+            if bucket < len(self.bucket_upper_bounds):
+                results.append(round(self.bucket_upper_bounds[bucket], 1))
+            else:
+                results.append(float('inf'))
+        return results
+
+# Sliding-window lag histograms per Job ID
+lag_histograms = {}
+
+# Formats the lag percentiles for each summary window of a Job's histogram
+def format_lag_percentiles(histogram, now):
+    summaries = []
+    for window_minutes in percentile_windows_minutes:
+        values = histogram.get_percentiles(window_minutes * 60, lag_percentiles, now)
+        if values is not None:
+            summaries.append('{}m p{}: {}'.format(
+                window_minutes, '/p'.join(str(p) for p in lag_percentiles), '/'.join(str(v) for v in values)))
+    return ' | '.join(summaries)
+
+# The last known status, run count, batch count, and polls since the run was checked, per Job ID
+job_states = {}
+
+# Returns the pipeline's batch count from the gauges, or None if it isn't reported.
+# The batch count starts again from zero when the pipeline is restarted
+def get_batch_count(gauges):
+    try:
+        return gauges['RuntimeStatsGauge.gauge']['value']['batchCount']
+    except Exception:
+        return None
+
+# Polls one Job and returns the line to print for it and the number of Control Hub
+# API calls made.
+#
+# While a Job is ACTIVE, each tick reads only the Job's realtime summary (one API call):
+# if the summary can be read and still contains the lag gauges resolved for the Job's
+# current run, and the pipeline's batch count has not gone down, the Job is inferred to
+# still be ACTIVE in that run. Otherwise, or every run_check_interval_polls polls, the
+# state may have changed, and the Job is fully refreshed (job.refresh() and job.history,
+# two more API calls) before its realtime summary is read again if it is ACTIVE.
+def poll_job(job):
+    api_calls = 0
+    lag_metrics = None
+    state = job_states.get(job.job_id)
+    if (state is not None and state['status'] == 'ACTIVE' and job.job_id in lag_gauge_key_cache
+            and state['polls_since_check'] < run_check_interval_polls):
+        gauges = get_realtime_gauges(job)
+        api_calls += 1
+        batch_count = get_batch_count(gauges)
+        restarted = batch_count is not None and state['batch_count'] is not None and batch_count < state['batch_count']
+        if gauges is not None and not restarted and get_cached_lag_gauge_keys(job.job_id, gauges, state['run_count']) is not None:
+            state['polls_since_check'] += 1
+            state['batch_count'] = batch_count
+            lag_metrics = get_oracle_cdc_lag_metrics(job.job_id, gauges, state['run_count'])
+
+    if lag_metrics is None:
+        try:
+            api_calls += 1
+            job.refresh()
+            api_calls += 1
+            job_status = job.history[0]
+        except Exception as ex:
+            return 'Error getting Job status: ' + str(ex), api_calls
+        state = {'status': job_status.status, 'run_count': job_status.run_count, 'batch_count': None, 'polls_since_check': 0}
+        job_states[job.job_id] = state
+        if job_status.status != 'ACTIVE':
+            return 'Job status is \'{}\'. Oracle CDC lag metrics will be gathered once the Job is ACTIVE'.format(job_status.status), api_calls
+        gauges = get_realtime_gauges(job)
+        api_calls += 1
+        if gauges is None:
+            print_message('Error getting Oracle CDC lag metric: could not read the realtime summary for Job \'{}\''.format(job.job_name))
+            gauges = {}
+        state['batch_count'] = get_batch_count(gauges)
+        lag_metrics = get_oracle_cdc_lag_metrics(job.job_id, gauges, job_status.run_count)
+    lag_metric = get_job_lag(lag_metrics)
+
+    # Update the Job's histogram and report the percentiles alongside the raw value
+    now = time.time()
+    histogram = lag_histograms.get(job.job_id)
+    if histogram is None:
+        histogram = SlidingWindowHistogram(max(percentile_windows_minutes) * 60)
+        lag_histograms[job.job_id] = histogram
+    lag_seconds = parse_lag_seconds(lag_metric) if lag_metric is not None else None
+    if lag_seconds is not None:
+        histogram.record(lag_seconds, now)
+    message = format_oracle_cdc_lag_metrics(lag_metrics, lag_metric)
+    percentiles = format_lag_percentiles(histogram, now)
+    if len(percentiles) > 0:
+        message += ' | ' + percentiles
+    return message, api_calls
+
+
+# Polls one Job, reporting an error for the Job rather than stopping the monitor if the poll fails
+def poll_job_safely(job):
+    try:
+        return poll_job(job)
+    except Exception as ex:
+        return 'Error getting Oracle CDC lag metric: ' + str(ex), 0
 
 # Get Control Hub Credentials from the environment
 cred_id = os.getenv('CRED_ID')
@@ -103,12 +385,17 @@ if cred_token is None or len(cred_token) == 0:
     exit(1)
 
 # Check the number of command line args
-if len(sys.argv) != 2:
+if len(sys.argv) < 2 or (sys.argv[1] == '--label' and len(sys.argv) != 3):
     print('Error: Wrong number of arguments')
     print_usage_and_exit()
 
-# Get the Job ID from the command line
-job_id = sys.argv[1]
+# Get the Job IDs or the Job label from the command line
+job_label = None
+job_ids = []
+if sys.argv[1] == '--label':
+    job_label = sys.argv[2]
+else:
+    job_ids = sys.argv[1:]
 
 # Connect to Control Hub
 sch = None
@@ -122,24 +409,44 @@ print('-------------------------------------')
 print('Connected to Control Hub')
 print('-------------------------------------')
 
-# Find the Job
-try:
-    job = sch.jobs.get(job_id=job_id)
-except:
-    print('Error: Could not find Job for Job ID \'{}\''.format(job_id))
-    exit(1)
-print('Found Job \'{}\''.format(job.job_name))
+# Find the Jobs
+jobs = []
+if job_label is not None:
+    jobs = [job for job in sch.jobs if job_label in job.data_collector_labels]
+    if len(jobs) == 0:
+        print('Error: Could not find any Jobs with the label \'{}\''.format(job_label))
+        exit(1)
+else:
+    for job_id in job_ids:
+        try:
+            jobs.append(sch.jobs.get(job_id=job_id))
+        except:
+            print('Error: Could not find Job for Job ID \'{}\''.format(job_id))
+            exit(1)
+for job in jobs:
+    print('Found Job \'{}\''.format(job.job_name))
 print('-------------------------------------')
 
+# Only prefix each record with the Job name when there is more than one Job
+multi_job = len(jobs) > 1
 
 # Check metrics in an infinite loop until this script is stopped
+executor = ThreadPoolExecutor(max_workers=max_concurrent_requests)
 while True:
-    job.refresh()
-    job_status = job.history[0].status
-    if job_status != 'ACTIVE':
-        print_message('Job status is \'{}\'. Oracle CDC lag metrics will be gathered once the Job is ACTIVE'.format(job_status))
-    else:
-        print_message('Oracle CDC Lag metric: {}'.format(get_oracle_cdc_lag_metric()))
-    sleep(sleep_time_seconds)
-
-
+    start_time_seconds = time.time()
+
+    # Poll all of the Jobs concurrently and print one record per Job
+    api_calls = 0
+    for job, (message, job_api_calls) in zip(jobs, executor.map(poll_job_safely, jobs)):
+        if multi_job:
+            message = 'Job \'{}\' {}'.format(job.job_name, message)
+        print_message(message)
+        api_calls += job_api_calls
+
+    if report_api_calls_per_tick:
+        print_message('Polled {} Job(s) with {} Control Hub API calls'.format(len(jobs), api_calls))
+
+    # Sleep for the rest of the tick
+    remaining_seconds = sleep_time_seconds - (time.time() - start_time_seconds)
+    if remaining_seconds > 0:
+        time.sleep(remaining_seconds)
@@ -1,15 +1,33 @@
 #!/usr/bin/python3
 
 """
-FILE: export_job.py
+FILE: import_job.py
 
-DESCRIPTION: A script to import a StreamSets Job
+DESCRIPTION: A script to import StreamSets Job archives
 
-ARGS:  job_archive_file
+ARGS:  job_archives (a Job archive file, a directory of Job archives, or a glob pattern)
+       --ledger <ledger_file> (optional)
 
-USAGE: $ python3 import_job.py <job_archive_file>
+USAGE: $ python3 import_job.py <job_archive_file> [--ledger <ledger_file>]
+       $ python3 import_job.py <job_archive_dir> [--ledger <ledger_file>]
+       $ python3 import_job.py '<glob_pattern>' [--ledger <ledger_file>]
 
 EXAMPLE USAGE: $ python3 import_job.py /Users/mark/data/jobs/Job_for_Weather_to_Snowflake.zip
+               $ python3 import_job.py /Users/mark/data/jobs --ledger /Users/mark/data/import.ledger
+
+- Each archive is validated before it is imported by reading its zip directory and
+  checking the CRCs of its entries, which streams through the archive without loading it
+  into memory. Invalid archives are reported and skipped.
+
+- Up to MAX_CONCURRENT_IMPORTS archives are imported in parallel, each passed to
+  sch.import_jobs as an open file rather than read into memory first. Imports wait while
+  the archives being imported add up to more than MAX_IN_FLIGHT_MB, so memory use stays
+  bounded however many archives there are (a larger archive is imported on its own).
+
+- With --ledger, the result of each archive is appended to the ledger file as one JSON
+  record per line. Running the script again with the same ledger resumes a partially
+  completed migration: archives that were already imported, and have not changed since,
+  are skipped.
 
 PREREQUISITES:
 
@@ -34,20 +52,156 @@ PREREQUISITES:
           Connecting to Control Hub
           Importing archive '/Users/mark/data/jobs/Job_for_Weather_to_Snowflake.zip'
           Done
+
+        $ python3 import_job.py /Users/mark/data/jobs --ledger /Users/mark/data/import.ledger
+          Connecting to Control Hub
+          Found 312 archives; 140 already imported according to the ledger
+          Error: archive '/Users/mark/data/jobs/Orders_CDC.zip' is not valid: Bad CRC-32 for file 'jobs.json'
+          Importing archive '/Users/mark/data/jobs/Job_for_Weather_to_ADLS.zip'
+          ...
+          Imported 171 archives in 48.2 seconds; 1 invalid, 0 failed
+          Done
 """
 
+import datetime
+import glob
+import json
 import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from streamsets.sdk import ControlHub
 import sys
 
-# Check the number of command line args
-if len(sys.argv) != 2:
+# How many archives to import in parallel
+MAX_CONCURRENT_IMPORTS = 4
+
+# How many MB of archives may be imported at the same time
+MAX_IN_FLIGHT_MB = 256
+
+
+# Method that returns the archive files for a file, directory or glob pattern
+def get_archive_files(path):
+    if os.path.isdir(path):
+        return sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.zip'))
+    if os.path.isfile(path):
+        return [path]
+    return sorted(glob.glob(path))
+
+
+# Method that validates an archive without loading it into memory;
+# returns None or an error message
+def validate_archive(archive_file):
+    try:
+        with zipfile.ZipFile(archive_file) as archive:
+            if len(archive.infolist()) == 0:
+                return 'the archive is empty'
+            bad_entry = archive.testzip()
+            if bad_entry is not None:
+                return 'Bad CRC-32 for file \'{}\''.format(bad_entry)
+    except Exception as e:
+        return str(e)
+    return None
+
+
+# Method that returns a key that changes when an archive file changes
+def get_archive_key(archive_file):
+    stat = os.stat(archive_file)
+    return '{}:{}'.format(stat.st_size, int(stat.st_mtime))
+
+
+# Method that reads the ledger and returns the latest record for each archive
+def read_ledger(ledger_file):
+    records = {}
+    if ledger_file is not None and os.path.exists(ledger_file):
+        with open(ledger_file) as file:
+            for line in file:
+                if line.strip():
+                    record = json.loads(line)
+                    records[record['archive']] = record
+    return records
+
+
+# Method that appends a record to the ledger
+def write_ledger(record):
+    if ledger is None:
+        return
+    record['timestamp'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    with ledger_lock:
+        ledger.write(json.dumps(record) + '\n')
+        ledger.flush()
+
+
+# Budget of in-flight bytes, so the archives being imported at once stay within MAX_IN_FLIGHT_MB
+class ByteBudget:
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, size):
+        with self.condition:
+            # An archive larger than the budget waits until nothing else is in flight
+            while self.in_flight > 0 and self.in_flight + size > self.max_bytes:
+                self.condition.wait()
+            self.in_flight += size
+
+    def release(self, size):
+        with self.condition:
+            self.in_flight -= size
+            self.condition.notify_all()
+
+
+# Method that validates and imports one archive and returns its ledger record
+def import_archive(archive_file):
+    record = {'archive': archive_file, 'key': get_archive_key(archive_file)}
+    error = validate_archive(archive_file)
+    if error is not None:
+        print('Error: archive \'{}\' is not valid: {}'.format(archive_file, error))
+        record['status'] = 'INVALID'
+        record['message'] = error
+        write_ledger(record)
+        return record
+
+    size = os.path.getsize(archive_file)
+    budget.acquire(size)
+    try:
+        print('Importing archive \'{}\''.format(archive_file))
+        start_time_seconds = time.time()
+        with open(archive_file, 'rb') as file:
+            jobs = sch.import_jobs(archive=file, pipeline=True, number_of_instances=True, labels=True,
+                                   runtime_parameters=True)
+        record['status'] = 'IMPORTED'
+        record['jobs'] = [job.job_name for job in jobs] if jobs is not None else []
+        record['seconds'] = round(time.time() - start_time_seconds, 2)
+    except Exception as e:
+        print('Error importing archive \'{}\': {}'.format(archive_file, str(e)))
+        record['status'] = 'ERROR'
+        record['message'] = str(e)
+    finally:
+        budget.release(size)
+    write_ledger(record)
+    return record
+
+
+# Check the command line args
+args = sys.argv[1:]
+ledger_file = None
+if len(args) == 3 and args[1] == '--ledger':
+    ledger_file = args[2]
+    args = args[:1]
+if len(args) != 1:
     print('Error: Wrong number of arguments')
-    print('Usage: $ python3 import_job.py <job_archive_file>')
+    print('Usage: $ python3 import_job.py <job_archive_file | job_archive_dir | glob_pattern> [--ledger <ledger_file>]')
     sys.exit(1)
 
 # Get command line args
-archive_file = sys.argv[1]
+archive_files = get_archive_files(args[0])
+if len(archive_files) == 0:
+    print('Error: no archives found for \'{}\''.format(args[0]))
+    sys.exit(1)
 
 # Get Control Hub Credentials from the environment
 cred_id = os.getenv('CRED_ID')
@@ -63,11 +217,33 @@ except Exception as e:
     print(str(e))
     sys.exit(1)
 
-# Import the archive
-print('Importing archive \'{}\''.format(archive_file))
-with open(archive_file, 'rb') as file:
-    content = file.read()
-
-sch.import_jobs(archive=content, pipeline=True, number_of_instances=True, labels=True, runtime_parameters=True)
-
-print('Done')
\ No newline at end of file
+# Skip the archives the ledger records as imported, unless they have changed since
+ledger_records = read_ledger(ledger_file)
+archives_to_import = [archive_file for archive_file in archive_files
+                      if ledger_records.get(archive_file, {}).get('status') != 'IMPORTED'
+                      or ledger_records[archive_file].get('key') != get_archive_key(archive_file)]
+if len(archive_files) > 1 or ledger_file is not None:
+    print('Found {} archives; {} already imported according to the ledger'.format(
+        len(archive_files), len(archive_files) - len(archives_to_import)))
+
+# Import the archives in parallel
+ledger_lock = threading.Lock()
+ledger = open(ledger_file, 'a') if ledger_file is not None else None
+budget = ByteBudget(MAX_IN_FLIGHT_MB * 1024 * 1024)
+start_time_seconds = time.time()
+with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_IMPORTS) as executor:
+    records = list(executor.map(import_archive, archives_to_import))
+if ledger is not None:
+    ledger.close()
+
+status_counts = {}
+for record in records:
+    status_counts[record['status']] = status_counts.get(record['status'], 0) + 1
+if len(archive_files) > 1 or ledger_file is not None:
+    print('Imported {} archives in {:.1f} seconds; {} invalid, {} failed'.format(
+        status_counts.get('IMPORTED', 0), time.time() - start_time_seconds,
+        status_counts.get('INVALID', 0), status_counts.get('ERROR', 0)))
+
+print('Done')
+if status_counts.get('INVALID', 0) + status_counts.get('ERROR', 0) > 0:
+    sys.exit(1)
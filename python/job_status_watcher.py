@@ -0,0 +1,219 @@
+'''
+FILE: job_status_watcher.py
+
+DESCRIPTION: A watcher that waits for many Control Hub Jobs to reach a target status,
+             shared by the scripts that start, stop and restart Jobs.
+
+             Each call to watch() returns a concurrent.futures.Future that resolves
+             when the Job reaches one of its target statuses, or fails with a
+             JobStatusTimeout if the Job's deadline passes first (or with a
+             JobStatusFailure if the Job reaches one of its failure statuses).
+
+             A single background thread polls the status of all of the Jobs being
+             watched. When more than batch_threshold Jobs are pending, their
+             statuses are read from a listing of the Jobs (the status of every
+             Job is included in the listing) rather than by refreshing each Job, as
+             long as the listing is estimated to take fewer calls than there are
+             pending Jobs; in a large organization with few pending Jobs, each Job is
+             refreshed instead. The SDK pages through the listing internally and
+             doesn't report its page size, so the number of calls a listing takes is
+             an estimate, of one call per listing_page_size Jobs in the organization
+             (set it to the page size of the SDK version in use). api_calls counts
+             each refresh exactly and each listing by that estimate. The polling
+             interval starts at initial_interval_seconds and backs off by
+             backoff_factor, up to max_interval_seconds, while no watched Job
+             changes status; it drops back to the initial interval whenever a
+             Job's status changes or a new Job is watched. Deadlines are checked on
+             every tick, and the watcher never sleeps past the earliest deadline.
+
+USAGE:
+
+    from job_status_watcher import JobStatusWatcher, JobStatusTimeout
+
+    watcher = JobStatusWatcher(sch)
+    futures = [watcher.watch(job, 'ACTIVE', deadline_seconds=120) for job in jobs]
+    for future in futures:
+        try:
+            result = future.result()
+            print(result.job.job_name, result.status, result.elapsed_seconds)
+        except JobStatusTimeout as e:
+            print(str(e))
+    watcher.stop()
+
+PREREQUISITES:
+
+ - Python 3.9+
+
+ - StreamSets Platform SDK for Python v5 or v6
+   See: https://docs.streamsets.com/platform-sdk/latest/learn/installation.html
+
+'''
+
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future
+
+# The result of a watched Job reaching its target status
+JobStatusResult = namedtuple('JobStatusResult', ['job', 'status', 'elapsed_seconds'])
+
+
+class JobStatusTimeout(Exception):
+    pass
+
+
+class JobStatusFailure(Exception):
+    pass
+
+
+class JobStatusWatcher:
+
+    def __init__(self, sch, initial_interval_seconds=2, max_interval_seconds=30,
+                 backoff_factor=1.5, batch_threshold=3, listing_page_size=50):
+        self.sch = sch
+        self.initial_interval_seconds = initial_interval_seconds
+        self.max_interval_seconds = max_interval_seconds
+        self.backoff_factor = backoff_factor
+        self.batch_threshold = batch_threshold
+        self.listing_page_size = listing_page_size
+
+        # The number of Control Hub API calls made to read Job statuses; listings are counted
+        # by the estimate of _listing_calls()
+        self.api_calls = 0
+
+        # Pending watches: list of dicts with the Job, its targets, deadline and Future
+        self._watches = []
+        self._last_statuses = {}
+
+        # The number of Jobs in the organization, from the last listing of the Jobs
+        self._org_job_count = None
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    # Starts watching a Job. target_statuses and failure_statuses may be a single
+    # status or a collection of statuses. Returns a Future for a JobStatusResult.
+    def watch(self, job, target_statuses, deadline_seconds, failure_statuses=()):
+        if isinstance(target_statuses, str):
+            target_statuses = (target_statuses,)
+        if isinstance(failure_statuses, str):
+            failure_statuses = (failure_statuses,)
+        future = Future()
+        now = time.time()
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError('The watcher has been stopped')
+            self._watches.append({'job': job, 'targets': set(target_statuses), 'failures': set(failure_statuses),
+                                  'started': now, 'deadline': now + deadline_seconds, 'future': future})
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='job-status-watcher', daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return future
+
+    # Stops the watcher; pending Futures are cancelled
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            for watch in self._watches:
+                if not watch['future'].done():
+                    watch['future'].cancel()
+            self._watches = []
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    # Returns the estimated number of calls a listing of job_count Jobs takes, assuming the
+    # SDK reads listing_page_size Jobs per call
+    def _listing_calls(self, job_count=None):
+        return (self._org_job_count if job_count is None else job_count) // self.listing_page_size + 1
+
+    # Returns a dict of Job ID to status for the given Jobs
+    def _fetch_statuses(self, jobs):
+        if len(jobs) <= self.batch_threshold or (
+                self._org_job_count is not None and self._listing_calls() >= len(jobs)):
+            statuses = {}
+            for job in jobs:
+                self.api_calls += 1
+                job.refresh()
+                statuses[job.job_id] = job.currentJobStatus['status']
+            return statuses
+
+        # A listing of the Jobs includes the status of every Job; the SDK reads it a page at a time
+        job_ids = {job.job_id for job in jobs}
+        statuses = {}
+        job_count = 0
+        try:
+            for job in self.sch.jobs:
+                job_count += 1
+                if job.job_id in job_ids:
+                    statuses[job.job_id] = job.currentJobStatus['status']
+        finally:
+            self.api_calls += self._listing_calls(job_count)
+        self._org_job_count = job_count
+        return statuses
+
+    def _run(self):
+        interval = self.initial_interval_seconds
+        while True:
+            with self._condition:
+                if self._stopped:
+                    return
+                watches = list(self._watches)
+            if len(watches) == 0:
+                with self._condition:
+                    if len(self._watches) == 0 and not self._stopped:
+                        self._condition.wait()
+                interval = self.initial_interval_seconds
+                continue
+
+            # Read the status of every watched Job
+            jobs = list({watch['job'].job_id: watch['job'] for watch in watches}.values())
+            try:
+                statuses = self._fetch_statuses(jobs)
+            except Exception:
+                statuses = {}
+
+            changed = False
+            for job_id, status in statuses.items():
+                if self._last_statuses.get(job_id) != status:
+                    self._last_statuses[job_id] = status
+                    changed = True
+
+            # Resolve the Futures of Jobs that reached a target or failure status,
+            # and fail the Futures of Jobs that missed their deadlines
+            # (under the lock, so stop() can't cancel a Future while it is being resolved)
+            now = time.time()
+            done = []
+            with self._condition:
+                if self._stopped:
+                    return
+                for watch in watches:
+                    status = statuses.get(watch['job'].job_id)
+                    elapsed_seconds = now - watch['started']
+                    if watch['future'].done():
+                        # Cancelled by the caller
+                        pass
+                    elif status in watch['targets']:
+                        watch['future'].set_result(JobStatusResult(watch['job'], status, elapsed_seconds))
+                    elif status in watch['failures']:
+                        watch['future'].set_exception(JobStatusFailure(
+                            'Job \'{}\' has status \'{}\''.format(watch['job'].job_name, status)))
+                    elif now >= watch['deadline']:
+                        watch['future'].set_exception(JobStatusTimeout(
+                            'Timeout waiting for Job \'{}\' to become {}; last status was \'{}\''.format(
+                                watch['job'].job_name, ' or '.join(sorted(watch['targets'])),
+                                self._last_statuses.get(watch['job'].job_id))))
+                    else:
+                        continue
+                    done.append(watch)
+
+                self._watches = [watch for watch in self._watches if watch not in done]
+                if len(self._watches) == 0:
+                    continue
+
+                # Back off while nothing changes, but never sleep past the earliest deadline
+                interval = self.initial_interval_seconds if changed else min(
+                    interval * self.backoff_factor, self.max_interval_seconds)
+                earliest_deadline = min(watch['deadline'] for watch in self._watches)
+                self._condition.wait(timeout=max(0, min(interval, earliest_deadline - time.time())))
@@ -0,0 +1,220 @@
+'''
+FILE: label_selector.py
+
+DESCRIPTION: A label selector language evaluated over an in-memory inventory of
+             Control Hub Jobs or engines, so that bulk operations can target
+             resources by their labels instead of by hard-coded names or IDs.
+
+             A selector is a comma-separated list of requirements, all of which
+             must match:
+
+                 canary                  has the label canary (or a canary=... label)
+                 !canary                 does not have it
+                 env=prod                has the label env=prod (or env:prod)
+                 env!=prod               does not have it
+                 region in (us,eu)       has region=us or region=eu
+                 region notin (us,eu)    has neither
+
+             For example: env=prod,region in (us,eu),!canary
+
+             Labels of the form key=value or key:value are indexed by key and
+             value as well as by the whole label. The inventory keeps inverted
+             indexes from labels to resource IDs, so a selector resolves to its
+             matching IDs with set operations instead of by scanning every
+             resource.
+
+USAGE:
+
+    from label_selector import LabelInventory
+
+    inventory = LabelInventory.from_jobs(sch.jobs)
+    for job_id in inventory.select('env=prod,region in (us,eu),!canary'):
+        job = inventory.get(job_id)
+
+PREREQUISITES:
+
+ - Python 3.9+
+
+ - StreamSets Platform SDK for Python v5 or v6
+   See: https://docs.streamsets.com/platform-sdk/latest/learn/installation.html
+
+'''
+
+import re
+from collections import namedtuple
+
+# A requirement of a selector; values is a frozenset, empty for the exists operators
+Requirement = namedtuple('Requirement', ['key', 'operator', 'values'])
+
+# The separators between the key and the value of a key/value label
+KEY_VALUE_SEPARATORS = ('=', ':')
+
+_requirement_patterns = [
+    (re.compile(r'^(?P<key>[^\s=!(),]+)\s+(?P<op>in|notin)\s*\((?P<values>[^()]*)\)$'), None),
+    (re.compile(r'^(?P<key>[^\s=!(),]+)\s*(?P<op>!=|==|=)\s*(?P<value>[^\s=!(),]+)$'), None),
+    (re.compile(r'^!\s*(?P<key>[^\s=!(),]+)$'), '!exists'),
+    (re.compile(r'^(?P<key>[^\s=!(),]+)$'), 'exists'),
+]
+
+
+class LabelSelectorError(ValueError):
+    pass
+
+
+# Splits a selector on the commas that are not inside parentheses
+def _split_requirements(selector):
+    parts = []
+    depth = 0
+    current = ''
+    for char in selector:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth < 0:
+                raise LabelSelectorError('Unbalanced parentheses in selector: ' + selector)
+        if char == ',' and depth == 0:
+            parts.append(current)
+            current = ''
+        else:
+            current += char
+    if depth != 0:
+        raise LabelSelectorError('Unbalanced parentheses in selector: ' + selector)
+    parts.append(current)
+    return [part.strip() for part in parts]
+
+
+# Parses a selector into a list of Requirements
+def parse_selector(selector):
+    requirements = []
+    for part in _split_requirements(selector):
+        if part == '':
+            raise LabelSelectorError('Empty requirement in selector: ' + selector)
+        for pattern, operator in _requirement_patterns:
+            match = pattern.match(part)
+            if match is None:
+                continue
+            groups = match.groupdict()
+            if operator is not None:
+                requirements.append(Requirement(groups['key'], operator, frozenset()))
+            elif 'values' in groups:
+                values = frozenset(value.strip() for value in groups['values'].split(',') if value.strip())
+                if len(values) == 0:
+                    raise LabelSelectorError('Empty value list in requirement: ' + part)
+                requirements.append(Requirement(groups['key'], groups['op'], values))
+            else:
+                operator = 'in' if groups['op'] in ('=', '==') else 'notin'
+                requirements.append(Requirement(groups['key'], operator, frozenset([groups['value']])))
+            break
+        else:
+            raise LabelSelectorError('Invalid requirement in selector: ' + part)
+    return requirements
+
+
+# Splits a label into (key, value), or (label, None) if it is not a key/value label
+def split_label(label):
+    for separator in KEY_VALUE_SEPARATORS:
+        if separator in label:
+            key, value = label.split(separator, 1)
+            return key, value
+    return label, None
+
+
+class LabelInventory:
+
+    def __init__(self):
+        # Resources by ID
+        self.resources = {}
+
+        # The labels of each resource, by ID
+        self.labels = {}
+
+        # Inverted indexes: label -> set of IDs, and key -> value -> set of IDs
+        self.label_index = {}
+        self.key_index = {}
+
+    # Returns an inventory of Jobs, indexed by their data_collector_labels
+    @classmethod
+    def from_jobs(cls, jobs):
+        inventory = cls()
+        for job in jobs:
+            inventory.add(job.job_id, job.data_collector_labels or [], job)
+        return inventory
+
+    # Returns an inventory of engines, indexed by their labels
+    @classmethod
+    def from_engines(cls, engines):
+        inventory = cls()
+        for engine in engines:
+            inventory.add(engine.id, getattr(engine, 'labels', None) or [], engine)
+        return inventory
+
+    # Adds a resource with its labels, replacing the resource if it is already present
+    def add(self, resource_id, labels, resource=None):
+        if resource_id in self.resources:
+            self.remove(resource_id)
+        self.resources[resource_id] = resource
+        self.labels[resource_id] = frozenset(labels)
+        for label in self.labels[resource_id]:
+            self.label_index.setdefault(label, set()).add(resource_id)
+            key, value = split_label(label)
+            if value is not None:
+                self.key_index.setdefault(key, {}).setdefault(value, set()).add(resource_id)
+
+    # Removes a resource
+    def remove(self, resource_id):
+        for label in self.labels.pop(resource_id, ()):
+            self.label_index[label].discard(resource_id)
+            key, value = split_label(label)
+            if value is not None:
+                self.key_index[key][value].discard(resource_id)
+        self.resources.pop(resource_id, None)
+
+    # Returns the resource for an ID
+    def get(self, resource_id):
+        return self.resources.get(resource_id)
+
+    # Returns the set of IDs that have any of the values for a key, or the label itself
+    def _ids_with(self, key, values):
+        ids = set()
+        values_by_key = self.key_index.get(key, {})
+        if len(values) == 0:
+            # Exists: the bare label, or a key/value label with the key
+            ids.update(self.label_index.get(key, ()))
+            for value_ids in values_by_key.values():
+                ids.update(value_ids)
+            return ids
+        for value in values:
+            ids.update(values_by_key.get(value, ()))
+        return ids
+
+    # Returns the set of IDs of the resources that match a selector
+    def select(self, selector):
+        requirements = parse_selector(selector) if isinstance(selector, str) else selector
+
+        # Intersect the positive requirements, smallest first, then subtract the negative ones
+        positive = []
+        negative = []
+        for requirement in requirements:
+            ids = self._ids_with(requirement.key, requirement.values)
+            if requirement.operator in ('in', 'exists'):
+                positive.append(ids)
+            else:
+                negative.append(ids)
+
+        if positive:
+            positive.sort(key=len)
+            matches = set(positive[0])
+            for ids in positive[1:]:
+                matches &= ids
+                if not matches:
+                    break
+        else:
+            matches = set(self.resources)
+        for ids in negative:
+            matches -= ids
+        return matches
+
+    # Returns the number of resources in the inventory
+    def __len__(self):
+        return len(self.resources)
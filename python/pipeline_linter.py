@@ -0,0 +1,264 @@
+'''
+FILE: pipeline_linter.py
+
+DESCRIPTION: An offline linter for StreamSets pipeline definitions, to catch common
+             problems before a pipeline is published to Control Hub rather than on a
+             round trip to Control Hub or when its Job starts.
+
+             The rules are:
+
+                 dangling-lane          an output or event lane that no stage reads,
+                                        an input lane that no stage writes, or a
+                                        stage that is not connected at all
+                 missing-error-stage    the pipeline has no error stage
+                 plain-text-credential  a password, secret, token or key set to a
+                                        literal value rather than an expression such
+                                        as ${credential:get(...)} or ${runtime:conf(...)}
+
+             Fragments are only checked for plain-text credentials, as their lanes
+             are connected, and their errors handled, by the pipelines that use them.
+
+             The linter reads pipeline JSON exported from Control Hub or Data Collector
+             (a .json file or a .zip archive of them, like the ones written by
+             dataops-backup.py), and the definition of a pipeline built with the SDK.
+
+             Run as a script, it lints files and directories (recursively) in
+             parallel, one process per CPU, and exits with status 1 if it finds any
+             problems.
+
+USAGE:
+
+    $ python3 pipeline_linter.py <file_or_dir> [<file_or_dir> ...]
+
+    $ python3 pipeline_linter.py /Users/mark/backup
+      Error: /Users/mark/backup/pipelines/Oracle_CDC.zip: Pipeline 'Oracle CDC': [plain-text-credential] stage 'OracleCDCClient_01' config 'hikariConf.password' has a plain-text value
+      Error: /Users/mark/backup/pipelines/Weather.zip: Pipeline 'Weather': [dangling-lane] output lane 'HTTPClient_01OutputLane16788' of stage 'HTTPClient_01' is not read by any stage
+      Linted 1480 pipelines in 1522 files in 3.1 seconds; 2 problems, 0 unreadable files
+
+    from pipeline_linter import lint_pipeline
+
+    pipeline = pipeline_builder.build('SDK-Pipeline')
+    for problem in lint_pipeline(pipeline._pipeline_definition):
+        print(problem.rule, problem.message)
+
+PREREQUISITES:
+
+ - Python 3.9+
+
+'''
+
+import json
+import os
+import re
+import sys
+import time
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+# A problem found by a rule; stage is the instance name of the stage, or None for the pipeline
+Problem = namedtuple('Problem', ['rule', 'stage', 'message'])
+
+# Config names that hold credentials, matched against the last part of the config name
+CREDENTIAL_NAME_PATTERN = re.compile(r'(password|passwd|secret|token|apikey|api_key|accesskey|privatekey|credential)',
+                                     re.IGNORECASE)
+
+# Config names that match CREDENTIAL_NAME_PATTERN but don't hold a credential
+NOT_CREDENTIAL_NAME_PATTERN = re.compile(r'(type|mode|provider|format|enabled|url|uri|file|path|header|name|source)$',
+                                         re.IGNORECASE)
+
+# How many files to lint per task of a worker process
+FILES_PER_TASK = 16
+
+
+# Returns the stages of a pipeline definition
+def _get_stages(definition):
+    return definition.get('stages') or []
+
+
+# Rule: lanes that are written but not read, read but not written, and unconnected stages
+def check_dangling_lanes(definition):
+    problems = []
+    writers = {}
+    readers = set()
+    for stage in _get_stages(definition):
+        for lane in stage.get('outputLanes') or []:
+            writers[lane] = (stage['instanceName'], 'output')
+        for lane in stage.get('eventLanes') or []:
+            writers[lane] = (stage['instanceName'], 'event')
+        readers.update(stage.get('inputLanes') or [])
+
+    for stage in _get_stages(definition):
+        name = stage['instanceName']
+        lanes = (stage.get('inputLanes') or []) + (stage.get('outputLanes') or []) + (stage.get('eventLanes') or [])
+        if len(lanes) == 0:
+            problems.append(Problem('dangling-lane', name, 'stage \'{}\' is not connected to any stage'.format(name)))
+        for lane in stage.get('inputLanes') or []:
+            if lane not in writers:
+                problems.append(Problem('dangling-lane', name,
+                                        'input lane \'{}\' of stage \'{}\' is not written by any stage'.format(lane, name)))
+    for lane, (name, kind) in writers.items():
+        if lane not in readers:
+            problems.append(Problem('dangling-lane', name,
+                                    '{} lane \'{}\' of stage \'{}\' is not read by any stage'.format(kind, lane, name)))
+    return problems
+
+
+# Rule: the pipeline has an error stage
+def check_error_stage(definition):
+    if not definition.get('errorStage'):
+        return [Problem('missing-error-stage', None, 'the pipeline has no error stage')]
+    return []
+
+
+# Returns True if a config name looks like it holds a credential
+def _is_credential_name(name):
+    last_part = name.split('.')[-1]
+    return CREDENTIAL_NAME_PATTERN.search(last_part) is not None and NOT_CREDENTIAL_NAME_PATTERN.search(last_part) is None
+
+
+# Adds the names of the credentials with literal values in a config value to found
+def _find_plain_text_credentials(name, value, found):
+    if isinstance(value, str):
+        if value.strip() and '${' not in value and _is_credential_name(name):
+            found.append(name)
+    elif isinstance(value, list):
+        for item in value:
+            if isinstance(item, dict) and 'key' in item and 'value' in item:
+                # A list of key/value pairs, such as HTTP headers or pipeline constants
+                _find_plain_text_credentials(name + '.' + str(item['key']), item['value'], found)
+            else:
+                _find_plain_text_credentials(name, item, found)
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            _find_plain_text_credentials(name + '.' + key, item, found)
+
+
+# Returns the names of the credentials with literal values in a list of configs
+def _get_plain_text_credentials(configuration):
+    found = []
+    for config in configuration or []:
+        _find_plain_text_credentials(config.get('name', ''), config.get('value'), found)
+    return found
+
+
+# Rule: credentials in the pipeline and stage configs are expressions, not literal values
+def check_plain_text_credentials(definition):
+    problems = []
+    for name in _get_plain_text_credentials(definition.get('configuration')):
+        problems.append(Problem('plain-text-credential', None,
+                                'pipeline config \'{}\' has a plain-text value'.format(name)))
+    stages = list(_get_stages(definition))
+    for key in ('errorStage', 'statsAggregatorStage'):
+        if definition.get(key):
+            stages.append(definition[key])
+    for key in ('startEventStages', 'stopEventStages'):
+        stages.extend(definition.get(key) or [])
+    for stage in stages:
+        for name in _get_plain_text_credentials(stage.get('configuration')):
+            problems.append(Problem('plain-text-credential', stage.get('instanceName'),
+                                    'stage \'{}\' config \'{}\' has a plain-text value'.format(stage.get('instanceName'), name)))
+    return problems
+
+
+# The rules for pipelines, and for fragments
+PIPELINE_RULES = [check_dangling_lanes, check_error_stage, check_plain_text_credentials]
+FRAGMENT_RULES = [check_plain_text_credentials]
+
+
+# Returns the problems in a pipeline definition (the pipelineConfig of an export)
+def lint_pipeline(definition, fragment=False):
+    problems = []
+    for rule in FRAGMENT_RULES if fragment else PIPELINE_RULES:
+        problems.extend(rule(definition))
+    return problems
+
+
+# Returns a list of (definition, is_fragment) for the pipelines in exported JSON
+def get_pipeline_definitions(data):
+    if isinstance(data, list):
+        return [definition for item in data for definition in get_pipeline_definitions(item)]
+    if not isinstance(data, dict):
+        return []
+    if isinstance(data.get('pipelineConfig'), dict):
+        return [(data['pipelineConfig'], False)]
+    if isinstance(data.get('pipelineFragmentConfig'), dict):
+        return [(data['pipelineFragmentConfig'], True)]
+    if data.get('pipelineDefinition'):
+        definition = data['pipelineDefinition']
+        if isinstance(definition, str):
+            definition = json.loads(definition)
+        return [(definition, bool(data.get('fragment')))]
+    if isinstance(data.get('stages'), list) and 'instanceName' not in data:
+        return [(data, bool(data.get('fragment')))]
+    return []
+
+
+# Returns a list of (definition, is_fragment) for the pipelines in a .json or .zip file
+def read_file(file_name):
+    definitions = []
+    if file_name.endswith('.zip'):
+        with zipfile.ZipFile(file_name) as archive:
+            for entry in archive.namelist():
+                if entry.endswith('.json'):
+                    definitions.extend(get_pipeline_definitions(json.loads(archive.read(entry))))
+    else:
+        with open(file_name) as file:
+            definitions.extend(get_pipeline_definitions(json.load(file)))
+    return definitions
+
+
+# Lints the pipelines in a file; returns (file_name, pipeline count, list of (title, problem), error message or None)
+def lint_file(file_name):
+    try:
+        definitions = read_file(file_name)
+    except Exception as e:
+        return file_name, 0, [], str(e)
+    results = []
+    for definition, fragment in definitions:
+        title = definition.get('title') or definition.get('pipelineId') or definition.get('fragmentId') or file_name
+        for problem in lint_pipeline(definition, fragment):
+            results.append((('Fragment \'' if fragment else 'Pipeline \'') + title + '\'', problem))
+    return file_name, len(definitions), results, None
+
+
+# Returns the .json and .zip files for a list of files and directories
+def get_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dir_path, _, file_names in os.walk(path):
+                files.extend(os.path.join(dir_path, file_name) for file_name in sorted(file_names)
+                             if file_name.endswith('.json') or file_name.endswith('.zip'))
+        else:
+            files.append(path)
+    return files
+
+
+if __name__ == '__main__':
+
+    if len(sys.argv) < 2:
+        print('Usage: $ python3 pipeline_linter.py <file_or_dir> [<file_or_dir> ...]')
+        sys.exit(1)
+
+    start_time_seconds = time.time()
+    files = get_files(sys.argv[1:])
+    pipeline_count = 0
+    problem_count = 0
+    error_count = 0
+
+    # Parsing JSON is CPU bound, so lint the files in worker processes rather than threads
+    with ProcessPoolExecutor() as executor:
+        for file_name, count, results, error in executor.map(lint_file, files, chunksize=FILES_PER_TASK):
+            pipeline_count += count
+            if error is not None:
+                error_count += 1
+                print('Error: could not read \'{}\': {}'.format(file_name, error))
+            for title, problem in results:
+                problem_count += 1
+                print('Error: {}: {}: [{}] {}'.format(file_name, title, problem.rule, problem.message))
+
+    print('Linted {} pipelines in {} files in {:.1f} seconds; {} problems, {} unreadable files'.format(
+        pipeline_count, len(files), time.time() - start_time_seconds, problem_count, error_count))
+    if problem_count + error_count > 0:
+        sys.exit(1)
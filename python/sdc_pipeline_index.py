@@ -0,0 +1,173 @@
+'''
+FILE: sdc_pipeline_index.py
+
+DESCRIPTION: An index that maps Control Hub Job IDs to the Data Collectors and
+             engine-side pipelines that run them, across every Data Collector
+             registered with StreamSets Platform.
+
+             Pipelines started by Control Hub Jobs carry the Job's ID in their
+             JOB_ID parameter. Instead of searching the pipelines of one known
+             Data Collector for that parameter, the index lists the pipelines of
+             every Data Collector once, in parallel, so finding the pipeline(s)
+             of a Job is a dictionary lookup.
+
+             Calling refresh() again re-lists only the Data Collectors whose
+             running pipelines, as reported by Control Hub, have changed since
+             the previous refresh, as well as Data Collectors that have been
+             added; Data Collectors that are gone are dropped from the index.
+
+             A Data Collector keeps the stopped pipelines of Jobs that ran on it
+             before, and they carry the Job's ID too. get_running() returns only
+             the pipelines that their Data Collector reports as running (or, if
+             its running pipelines can't be read, whose status is RUNNING).
+
+USAGE:
+
+    from sdc_pipeline_index import SdcPipelineIndex
+
+    index = SdcPipelineIndex(sch)
+    index.refresh()
+    for entry in index.get_running(job.job_id):
+        metrics = entry.sdc.get_pipeline_metrics(entry.pipeline)
+
+PREREQUISITES:
+
+ - Python 3.9+
+
+ - StreamSets Platform SDK for Python v5 or v6
+   See: https://docs.streamsets.com/platform-sdk/latest/learn/installation.html
+
+'''
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# A pipeline running on a Data Collector for a Job
+IndexEntry = namedtuple('IndexEntry', ['sdc_id', 'sdc_url', 'sdc', 'pipeline'])
+
+
+class SdcPipelineIndex:
+
+    def __init__(self, sch, max_concurrent_requests=16):
+        self.sch = sch
+        self.max_concurrent_requests = max_concurrent_requests
+
+        # Data Collector instances by engine ID
+        self.sdcs = {}
+
+        # The running pipelines Control Hub reported for each engine at the last refresh
+        self.engine_signatures = {}
+
+        # The index entries found on each engine, by engine ID
+        self.engine_entries = {}
+
+        # The index: JOB_ID -> list of IndexEntry
+        self.entries = {}
+
+        # The titles and IDs of the running pipelines Control Hub reported for each engine at
+        # the last refresh, by engine ID; None for an engine whose running pipelines can't be read
+        self.engine_running_pipelines = {}
+
+    # Returns a value that changes when the running pipelines of an engine change
+    @staticmethod
+    def get_engine_signature(engine):
+        try:
+            running_pipelines = engine.running_pipelines or []
+            return tuple(sorted((str(p.get('pipeline')), str(p.get('status'))) for p in running_pipelines))
+        except Exception:
+            # Always re-list an engine whose running pipelines can't be read
+            return None
+
+    # Returns the titles and IDs of the running pipelines of an engine, or None if they can't be read
+    @staticmethod
+    def get_running_pipeline_keys(engine):
+        try:
+            running_pipelines = engine.running_pipelines or []
+            return ({p.get('pipeline') for p in running_pipelines} | {p.get('pipelineId') for p in running_pipelines}) - {None}
+        except Exception:
+            return None
+
+    # Lists the pipelines of one engine and returns its index entries
+    def list_engine_entries(self, engine):
+        sdc = self.sdcs.get(engine.id)
+        if sdc is None:
+            sdc = engine._instance
+            self.sdcs[engine.id] = sdc
+        entries = []
+        for pipeline in sdc.pipelines:
+            job_id = (pipeline.parameters or {}).get('JOB_ID')
+            if job_id:
+                entries.append(IndexEntry(engine.id, engine.engine_url, sdc, pipeline))
+        return entries
+
+    # Lists the engines once and re-lists the pipelines of new and changed engines
+    # in parallel. Returns the number of engines whose pipelines were listed.
+    def refresh(self):
+        engines = {engine.id: engine for engine in self.sch.data_collectors}
+
+        # Drop engines that are gone
+        for engine_id in list(self.engine_entries.keys()):
+            if engine_id not in engines:
+                self.engine_entries.pop(engine_id, None)
+                self.engine_signatures.pop(engine_id, None)
+                self.sdcs.pop(engine_id, None)
+
+        # Find the engines that are new or whose running pipelines have changed
+        signatures = {}
+        stale_engine_ids = []
+        self.engine_running_pipelines = {}
+        for engine_id, engine in engines.items():
+            signatures[engine_id] = self.get_engine_signature(engine)
+            self.engine_running_pipelines[engine_id] = self.get_running_pipeline_keys(engine)
+            if (engine_id not in self.engine_entries
+                    or signatures[engine_id] is None
+                    or signatures[engine_id] != self.engine_signatures.get(engine_id)):
+                stale_engine_ids.append(engine_id)
+
+        # List the pipelines of the stale engines in parallel
+        def list_entries(engine_id):
+            try:
+                return engine_id, self.list_engine_entries(engines[engine_id])
+            except Exception as e:
+                print('Error listing pipelines on Data Collector ' + engines[engine_id].engine_url + ': ' + str(e))
+                return engine_id, None
+
+        if len(stale_engine_ids) > 0:
+            with ThreadPoolExecutor(max_workers=self.max_concurrent_requests) as executor:
+                for engine_id, entries in executor.map(list_entries, stale_engine_ids):
+                    if entries is None:
+                        # Keep the previous entries and retry on the next refresh
+                        self.engine_signatures.pop(engine_id, None)
+                        continue
+                    self.engine_entries[engine_id] = entries
+                    self.engine_signatures[engine_id] = signatures[engine_id]
+
+        # Rebuild the Job ID lookup from the per-engine entries
+        index = {}
+        for entries in self.engine_entries.values():
+            for entry in entries:
+                index.setdefault(entry.pipeline.parameters['JOB_ID'], []).append(entry)
+        self.entries = index
+        return len(stale_engine_ids)
+
+    # Returns the list of IndexEntry for the Job ID; empty if the Job has no pipelines
+    def get(self, job_id):
+        return self.entries.get(job_id, [])
+
+    # Returns True if the pipeline of an index entry is running on its engine
+    def is_running(self, entry):
+        running_pipeline_keys = self.engine_running_pipelines.get(entry.sdc_id)
+        if running_pipeline_keys is not None:
+            return entry.pipeline.title in running_pipeline_keys or getattr(entry.pipeline, 'id', None) in running_pipeline_keys
+        try:
+            return entry.sdc.get_pipeline_status(entry.pipeline).response.json().get('status') == 'RUNNING'
+        except Exception:
+            return False
+
+    # Returns the list of IndexEntry for the Job ID whose pipelines are running
+    def get_running(self, job_id):
+        return [entry for entry in self.get(job_id) if self.is_running(entry)]
+
+    # Returns the number of engine-side pipelines in the index
+    def __len__(self):
+        return sum(len(entries) for entries in self.entries.values())
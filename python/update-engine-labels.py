@@ -28,11 +28,23 @@ Set these variables in the script with your own values:
     # List of deployment names to update engine labels for
     deployment_names = ['rancher-1', 'rancher-2']
 
+    # Label selector for more engines to update labels for, or None
+    engine_selector = None
+
     # Lists of labels to add and remove
     labels_to_add = ['new_label_1', 'new_label_2']
     labels_to_remove = ['old_label_1', 'old_label_2']
 
 
+The deployments and the engines are each listed once, rather than listing every
+engine for each deployment. Engine labels are updated in parallel, up to max_concurrent_updates at a
+time, and a failed update is retried up to max_retries times. At the end the engines
+are listed again to check which of them have converged to the new labels.
+
+Engines can also be selected by their labels with engine_selector (see
+label_selector.py), for example 'env=prod,!canary'; the labels of the selected engines
+are updated at the engine level only.
+
 The script prints output to the console like this, grouping together
 the deployments and their associated engine(s):
 
@@ -41,17 +53,24 @@ the deployments and their associated engine(s):
 Connecting to Control Hub
 ---
 Updating labels for Deployment: rancher-1
-Updating labels for Engine with URL: http://streamsets-deployment-4c58a2e2-3d47-4c92-a934-9808a6b97727p64mx:18630
----
 Updating labels for Deployment: rancher-2
-Updating labels for Engine with URL: http://streamsets-deployment-dec74a8f-961d-49b9-a8fd-f14030010feds92zn:18630
+---
+Updating labels for 2 Engines
+Updated labels for Engine with URL: http://streamsets-deployment-4c58a2e2-3d47-4c92-a934-9808a6b97727p64mx:18630
+Updated labels for Engine with URL: http://streamsets-deployment-dec74a8f-961d-49b9-a8fd-f14030010feds92zn:18630
+---
+Deployment rancher-1: 1 of 1 Engines converged
+Deployment rancher-2: 1 of 1 Engines converged
+Updated 2 Engines in 0.8 seconds (slowest update 0.6 seconds, 0 retries)
 ---
 Done
 
 '''
 
-import os
+import os, time
+from concurrent.futures import ThreadPoolExecutor
 from streamsets.sdk import ControlHub
+from label_selector import LabelInventory
 
 # Control Hub creds
 cred_id = '' 
@@ -60,17 +79,51 @@ cred_token = ''
 # List of deployment names to update engine labels for
 deployment_names = ['rancher-1', 'rancher-2']
 
+# Label selector for more engines to update labels for, or None
+engine_selector = None
+
 # Lists of labels to add and remove
 labels_to_add = ['new_label_1', 'new_label_2']
 labels_to_remove = ['old_label_1', 'old_label_2']
 
-# Method that returns a deployment for a deployment name
-def get_deployment_by_name(sch, deployment_name):
-    for deployment in sch.deployments:
-        if deployment.deployment_name == deployment_name:
-            return deployment
-    print("Error: No Deployment found with the name " + deployment_name)
-    return None
+# How many engines to update at the same time
+max_concurrent_updates = 10
+
+# How many times to retry a failed engine update
+max_retries = 3
+
+# Method that adds and removes labels in a list of labels
+def apply_label_changes(labels):
+
+    # Remove old labels
+    for label in labels_to_remove:
+        if label in labels:
+            labels.remove(label)
+
+    # Add new labels
+    for label in labels_to_add:
+        if label not in labels:
+            labels.append(label)
+
+# Method that returns True if a list of labels has all of the changes
+def has_label_changes(labels):
+    return all(label in labels for label in labels_to_add) and not any(label in labels for label in labels_to_remove)
+
+# Method that updates the labels of one engine, with retries
+# Returns a tuple of (error message or None, seconds taken, retries)
+def update_engine(engine):
+    start_time_seconds = time.time()
+    apply_label_changes(engine.labels)
+    for attempt in range(max_retries + 1):
+        try:
+            # Push the updates back to Control Hub
+            sch.update_engine_labels(engine)
+            return None, time.time() - start_time_seconds, attempt
+        except Exception as e:
+            error = str(e)
+            if attempt < max_retries:
+                time.sleep(2 ** attempt)
+    return error, time.time() - start_time_seconds, max_retries
 
 # Connect to Control Hub
 print('---')
@@ -80,52 +133,66 @@ sch = ControlHub(
     credential_id=cred_id,
     token=cred_token)
 
-# Get the deployments to set labels for
+# Get the deployments to set labels for, from a single listing
+deployments_by_name = {deployment.deployment_name: deployment for deployment in sch.deployments}
 deployments_to_set_labels_for = {}
 for deployment_name in deployment_names:
-    deployment = get_deployment_by_name(sch, deployment_name)
-    if deployment is not None:
+    if deployment_name in deployments_by_name:
+        deployment = deployments_by_name[deployment_name]
         deployments_to_set_labels_for[deployment.deployment_id] = deployment
-
+    else:
+        print("Error: No Deployment found with the name " + deployment_name)
 
 # Update labels for deployments
-for deployment_id in deployments_to_set_labels_for.keys():
-
-    deployment = deployments_to_set_labels_for[deployment_id]
-    labels = deployment.engine_configuration.engine_labels
-
+for deployment in deployments_to_set_labels_for.values():
     print('Updating labels for Deployment: ' + deployment.deployment_name)
-
-    # Remove old labels
-    for label in labels_to_remove:
-        if label in labels:
-            labels.remove(label)
-
-    # Add new labels
-    for label in labels_to_add:
-        if label not in labels:
-            labels.append(label)
+    apply_label_changes(deployment.engine_configuration.engine_labels)
 
     # Push the updates back to Control Hub
     sch.update_deployment(deployment)
+print('---')
 
-    # Get the engines that belong to the deployment
-    for engine in sch.engines:
-        if engine.deployment_id == deployment_id:
-            print('Updating labels for Engine with URL: ' + engine.engine_url)
-
-            # Remove old labels
-            for label in labels_to_remove:
-                if label in engine.labels:
-                    engine.labels.remove(label)
-
-            # Add new labels
-            for label in labels_to_add:
-                if label not in engine.labels:
-                    engine.labels.append(label)
+# Get the engines that belong to the deployments, from a single listing
+all_engines = list(sch.engines)
+engines = [engine for engine in all_engines if engine.deployment_id in deployments_to_set_labels_for]
+
+# Add the engines that match the selector
+if engine_selector is not None:
+    inventory = LabelInventory.from_engines(all_engines)
+    selected_engine_ids = inventory.select(engine_selector) - {engine.id for engine in engines}
+    print('Selector \'' + engine_selector + '\' matches ' + str(len(selected_engine_ids)) + ' more Engines')
+    engines.extend(inventory.get(engine_id) for engine_id in sorted(selected_engine_ids))
+
+# Update labels for engines in parallel
+print('Updating labels for ' + str(len(engines)) + ' Engines')
+start_time_seconds = time.time()
+update_seconds = []
+retry_count = 0
+with ThreadPoolExecutor(max_workers=max_concurrent_updates) as executor:
+    for engine, (error, seconds, retries) in zip(engines, executor.map(update_engine, engines)):
+        update_seconds.append(seconds)
+        retry_count += retries
+        if error is None:
+            print('Updated labels for Engine with URL: ' + engine.engine_url)
+        else:
+            print('Error updating labels for Engine with URL: ' + engine.engine_url + ': ' + error)
+elapsed_seconds = time.time() - start_time_seconds
+print('---')
 
-            # Push the updates back to Control Hub
-            sch.update_engine_labels(engine)
-    print('---')
+# List the engines again to check which ones converged to the new labels
+updated_engine_ids = {engine.id for engine in engines}
+converged_engine_ids = {engine.id for engine in sch.engines
+                        if engine.id in updated_engine_ids and has_label_changes(engine.labels)}
+deployment_names_by_id = {deployment.deployment_id: name for name, deployment in deployments_by_name.items()}
+engines_by_deployment = {}
+for engine in engines:
+    engines_by_deployment.setdefault(engine.deployment_id, []).append(engine)
+for deployment_id, deployment_engines in engines_by_deployment.items():
+    converged_count = len([engine for engine in deployment_engines if engine.id in converged_engine_ids])
+    print('Deployment {}: {} of {} Engines converged'.format(
+        deployment_names_by_id.get(deployment_id, deployment_id), converged_count, len(deployment_engines)))
+print('Updated {} Engines in {:.1f} seconds (slowest update {:.1f} seconds, {} retries)'.format(
+    len(engines), elapsed_seconds, max(update_seconds, default=0), retry_count))
+print('---')
 
 print('Done')
@@ -1,34 +1,76 @@
 #!/usr/bin/env python
 
 '''
-This script updates Job labels. 
+This script updates Job labels.
 
 Note that only Jobs with INACTIVE status can be updated
 
+The Jobs are looked up in an index of Job names and Job IDs built from a single listing
+of the Jobs, so the entries in job_names may be either Job names or Job IDs. Jobs that
+are not INACTIVE are reported up front and skipped, and the labels of the other Jobs are
+updated in parallel.
+
+Jobs can also be selected by their labels with job_selector (see label_selector.py),
+for example 'env=prod,region in (us,eu),!canary'.
+
 '''
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 from streamsets.sdk import ControlHub
+from label_selector import LabelInventory
 
 # Control Hub creds
-cred_id = '' 
+cred_id = ''
 cred_token = ''
 
 
-# List of Job names to update labels for
+# List of Job names (or Job IDs) to update labels for
 job_names = ['Job 1', 'Job 2']
 
+# Label selector for more Jobs to update labels for, or None
+job_selector = None
+
 # Lists of labels to add and remove
 labels_to_add = ['new_label_1', 'new_label_2']
 labels_to_remove = ['old_label_1', 'old_label_2']
 
-# Method that returns a Job for a Job name
-def get_job_by_name(sch, job_name):
-    for job in sch.jobs:
-        if job.job_name == job_name:
-            return job
-    print("Error: No Job found with the name " + job_name)
-    return None
+# How many Jobs to update at the same time
+max_concurrent_updates = 10
+
+# Method that returns the Job for a Job name or Job ID, from the indexes
+def get_job(job_name):
+    if job_name in jobs_by_id:
+        return jobs_by_id[job_name]
+    jobs = jobs_by_name.get(job_name, [])
+    if len(jobs) == 0:
+        print("Error: No Job found with the name " + job_name)
+        return None
+    if len(jobs) > 1:
+        print("Error: " + str(len(jobs)) + " Jobs found with the name " + job_name + "; use the Job ID instead")
+        return None
+    return jobs[0]
+
+# Method that updates the labels of one Job; returns None or an error message
+def update_job_labels(job):
+    labels = job.data_collector_labels
+
+    # Remove old labels
+    for label in labels_to_remove:
+        if label in labels:
+            labels.remove(label)
+
+    # Add new labels
+    for label in labels_to_add:
+        if label not in labels:
+            labels.append(label)
+
+    # Push the updates back to Control Hub
+    try:
+        sch.update_job(job)
+        return None
+    except Exception as e:
+        return str(e)
 
 # Connect to Control Hub
 print('---')
@@ -38,40 +80,42 @@ sch = ControlHub(
     credential_id=cred_id,
     token=cred_token)
 
+# Index the Jobs by name and by ID from a single listing
+jobs_by_name = {}
+jobs_by_id = {}
+for job in sch.jobs:
+    jobs_by_name.setdefault(job.job_name, []).append(job)
+    jobs_by_id[job.job_id] = job
+
 # Get the Jobs to set labels for
 jobs_to_set_labels_for = []
 for job_name in job_names:
-    job = get_job_by_name(sch, job_name)
+    job = get_job(job_name)
     if job is not None:
         jobs_to_set_labels_for.append(job)
 
-# Update labels for Jobs
-for job in jobs_to_set_labels_for:
-
-    # Get the Job status
-    job.refresh()
-    job_status = job.status.status
-
-    # Make sure Job has INACTIVE status
-    if job_status == 'INACTIVE':
-
-        print('Updating labels for Job: \'' + job.job_name + '\'')
-
-        labels = job.data_collector_labels
-
-        # Remove old labels
-        for label in labels_to_remove:
-            if label in labels:
-                labels.remove(label)
-
-        # Add new labels
-        for label in labels_to_add:
-            if label not in labels:
-                labels.append(label)
-
-        # Push the updates back to Control Hub
-        sch.update_job(job)
-    else:
-        print('Error: Job \'' + job.job_name + '\' does not have the status of \'INACTIVE\', so its labels can\'t be updated')   
+# Add the Jobs that match the selector
+if job_selector is not None:
+    inventory = LabelInventory.from_jobs(jobs_by_id.values())
+    selected_job_ids = inventory.select(job_selector) - {job.job_id for job in jobs_to_set_labels_for}
+    print('Selector \'' + job_selector + '\' matches ' + str(len(selected_job_ids)) + ' more Jobs')
+    jobs_to_set_labels_for.extend(inventory.get(job_id) for job_id in sorted(selected_job_ids))
+
+# Make sure Jobs have INACTIVE status; report the ones that don't up front
+inactive_jobs = [job for job in jobs_to_set_labels_for if job.currentJobStatus['status'] == 'INACTIVE']
+other_jobs = [job for job in jobs_to_set_labels_for if job.currentJobStatus['status'] != 'INACTIVE']
+if len(other_jobs) > 0:
+    print('Error: These Jobs do not have the status of \'INACTIVE\', so their labels can\'t be updated:')
+    for job in other_jobs:
+        print('    \'' + job.job_name + '\' (' + job.currentJobStatus['status'] + ')')
+    print('---')
+
+# Update labels for Jobs in parallel
+with ThreadPoolExecutor(max_workers=max_concurrent_updates) as executor:
+    for job, error in zip(inactive_jobs, executor.map(update_job_labels, inactive_jobs)):
+        if error is None:
+            print('Updated labels for Job: \'' + job.job_name + '\'')
+        else:
+            print('Error updating labels for Job \'' + job.job_name + '\': ' + error)
 
 print('Done')